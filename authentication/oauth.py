@@ -5,14 +5,21 @@ This module uses a single central Spotify account for all API operations.
 Instead of each user authenticating, we use ONE stored refresh token 
 that belongs to the app owner's Spotify account.
 """
+import re
 import time
 import logging
 import random
+import threading
+from collections import defaultdict, deque
+from contextvars import copy_context
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, TimeoutError as FuturesTimeout, wait
+import requests
 from spotipy.cache_handler import CacheHandler
 from spotipy.oauth2 import SpotifyOAuth
 from spotipy import Spotify
 import spotipy
 from decouple import config
+from tasks import accounting, metrics, scheduling, tracing
 
 logger = logging.getLogger(__name__)
 
@@ -112,7 +119,6 @@ def create_raw_spotify_client(index=0):
     
     # Add response hook to log HTTP responses for debugging
     def log_response(response, *args, **kwargs):
-        url_short = response.request.url[:80] if response.request.url else "?"
         # Only log 429s prominently, debug others
         if response.status_code == 429:
             retry_after = response.headers.get('Retry-After', 'unknown')
@@ -120,22 +126,118 @@ def create_raw_spotify_client(index=0):
         elif response.status_code >= 400:
             logger.warning(f"[HTTP][Client {index}] Error response: {response.status_code} - {response.text[:200] if response.text else 'no body'}")
         else:
-            logger.debug(f"[HTTP][Client {index}] {response.request.method} {url_short}... -> {response.status_code}")
+            logger.debug("[HTTP][Client %s] %s %.80s... -> %s", index, response.request.method, response.request.url, response.status_code)
         return response
     
     client._session.hooks['response'].append(log_response)
     return client
 
 
+# Reads that are safe to send twice: these are hedged and retried on transient errors
+IDEMPOTENT_METHODS = frozenset(
+    {"search", "track", "tracks", "albums", "artist_albums", "playlist", "playlist_items", "me"}
+)
+HEDGE_REQUESTS = config("SPOTIFY_HEDGE_REQUESTS", default=True, cast=bool)
+HEDGE_DEFAULT_DELAY = 2.0  # used until a method has HEDGE_MIN_SAMPLES latencies
+HEDGE_MIN_DELAY = 0.3  # never hedge sooner than this, whatever the p95
+HEDGE_MIN_SAMPLES = 20
+TRANSIENT_STATUSES = frozenset({500, 502, 503, 504})
+MAX_TRANSIENT_RETRIES = 2
+RETRY_BUDGET_RATIO = 0.1  # retries may add at most 10% to recent calls...
+RETRY_BUDGET_MIN = 10  # ...plus a few per window so quiet periods can still retry
+RETRY_BUDGET_WINDOW = 60
+
+# With retries disabled, urllib3 turns a bad status into "too many 500 error
+# responses" and spotipy reports that as a 429 with code -1.
+_RETRY_ERROR_STATUS = re.compile(r"too many (\d{3}) error responses")
+
+
+def response_status(e):
+    """The real HTTP status behind a SpotifyException."""
+    if e.http_status == 429 and e.code == -1:
+        match = _RETRY_ERROR_STATUS.search(str(getattr(e, "reason", "") or ""))
+        if match:
+            return int(match.group(1))
+    return e.http_status
+
+
+class LatencyTracker:
+    """Recent successful call latencies per method, for the adaptive hedging delay."""
+
+    def __init__(self, size=200):
+        self._samples = defaultdict(lambda: deque(maxlen=size))
+        self._lock = threading.Lock()
+
+    def record(self, method_name, seconds):
+        with self._lock:
+            self._samples[method_name].append(seconds)
+
+    def hedge_delay(self, method_name):
+        """Seconds to wait before hedging a call: the method's recent p95 latency."""
+        with self._lock:
+            samples = sorted(self._samples[method_name])
+        if len(samples) < HEDGE_MIN_SAMPLES:
+            return HEDGE_DEFAULT_DELAY
+        p95 = samples[min(len(samples) - 1, int(len(samples) * 0.95))]
+        return max(HEDGE_MIN_DELAY, p95)
+
+
+class RetryBudget:
+    """
+    Caps transient-error retries at a fraction of recent calls, so retries
+    can't multiply the load while Spotify is having an outage.
+    """
+
+    def __init__(self, ratio=RETRY_BUDGET_RATIO, minimum=RETRY_BUDGET_MIN, window=RETRY_BUDGET_WINDOW):
+        self.ratio = ratio
+        self.minimum = minimum
+        self.window = window
+        self._lock = threading.Lock()
+        self._window_start = time.monotonic()
+        self._calls = 0
+        self._retries = 0
+
+    def _roll(self):
+        if time.monotonic() - self._window_start >= self.window:
+            self._window_start = time.monotonic()
+            self._calls = 0
+            self._retries = 0
+
+    def record_call(self):
+        with self._lock:
+            self._roll()
+            self._calls += 1
+
+    def try_spend(self):
+        """Take one retry from the budget. Returns False when it's used up."""
+        with self._lock:
+            self._roll()
+            if self._retries >= self.minimum + self.ratio * self._calls:
+                return False
+            self._retries += 1
+            return True
+
+
 class RotatingSpotifyClient:
     """
     A wrapper around spotipy.Spotify that automatically rotates through
     available credentials when a 429 Rate Limit error is encountered.
+
+    Idempotent reads are also hedged: if one takes longer than the method's
+    recent p95 latency, a duplicate goes out on another credential and the
+    first successful response wins. Transient 5xx and connection errors on
+    those reads are retried within a process-wide RetryBudget.
     """
+    _user_ids = {}  # Class-level cache of `me()` user IDs keyed by credential index
+    _latency = LatencyTracker()
+    _retry_budget = RetryBudget()
+    _hedge_executor = ThreadPoolExecutor(max_workers=16, thread_name_prefix="spotify-hedge")
+
     def __init__(self):
         self.current_index = 0
         self.max_clients = 10
         self._current_client_instance = None
+        self._hedge_clients = {}
         self._available_indices = self._discover_available_indices()
 
     def _discover_available_indices(self):
@@ -155,6 +257,7 @@ class RotatingSpotifyClient:
                  self._rotate_client()
         return self._current_client_instance
 
+    @tracing.traced("rotate")
     def _rotate_client(self):
         """Switch to the next available client index."""
         logger.warning(f"[ROTATION] Rotating client from index {self.current_index}...")
@@ -174,6 +277,8 @@ class RotatingSpotifyClient:
                 
             self.current_index = next_index
             self._current_client_instance = create_raw_spotify_client(self.current_index)
+            metrics.inc("spotify_rotations_total")
+            accounting.record_rotation()
             return True
         except ValueError:
             # Current index not in available? Should not happen. reset to 0
@@ -183,6 +288,93 @@ class RotatingSpotifyClient:
                 return True
             return False
 
+    def current_user_id(self):
+        """Return the Spotify user ID behind the current credential, cached per credential."""
+        self._get_client()
+        user_id = RotatingSpotifyClient._user_ids.get(self.current_index)
+        if user_id is None:
+            user_id = self._call_with_retry("me")["id"]
+            # me() may have rotated, so cache under the credential that answered
+            RotatingSpotifyClient._user_ids[self.current_index] = user_id
+        return user_id
+
+    def _hedge_client(self):
+        """(index, client) on another credential to send a hedged duplicate on, or (None, None)."""
+        others = [i for i in self._available_indices if i != self.current_index]
+        if not others:
+            return None, None
+        index = random.choice(others)
+        if index not in self._hedge_clients:
+            self._hedge_clients[index] = create_raw_spotify_client(index)
+        return index, self._hedge_clients[index]
+
+    def _timed_call(self, client, index, method_name, args, kwargs):
+        """Call `method_name` on `client`, recording its latency and outcome."""
+        started = time.monotonic()
+        status = 200
+        with tracing.span(f"spotify.{method_name}", client=index) as span_attrs:
+            try:
+                result = getattr(client, method_name)(*args, **kwargs)
+            except spotipy.exceptions.SpotifyException as e:
+                status = response_status(e)
+                raise
+            except Exception as e:
+                status = type(e).__name__
+                raise
+            finally:
+                elapsed = time.monotonic() - started
+                span_attrs["status"] = status
+                metrics.inc("spotify_calls_total", method=method_name, client=index, status=status)
+                accounting.record_call(method_name, status)
+                metrics.observe("spotify_call_duration_seconds", elapsed, method=method_name)
+        self._latency.record(method_name, elapsed)
+        return result
+
+    def _hedged_call(self, client, method_name, args, kwargs):
+        """Call `method_name`, sending a duplicate on another credential if it is slow."""
+        # Calls run in a copy of this context so their spans join the current trace
+        primary = self._hedge_executor.submit(
+            copy_context().run, self._timed_call, client, self.current_index, method_name, args, kwargs
+        )
+        try:
+            return primary.result(timeout=self._latency.hedge_delay(method_name))
+        except FuturesTimeout:
+            pass
+
+        hedge_index, hedge_client = self._hedge_client()
+        if hedge_client is None:
+            return primary.result()
+        # The hedge is a second request, so it needs its own rate budget slot
+        if not scheduling.try_acquire_extra_call():
+            metrics.inc("spotify_hedges_skipped_total")
+            return primary.result()
+        logger.info(f"[HEDGE] {method_name} slower than p95 on client {self.current_index}, sending a hedged request")
+        metrics.inc("spotify_hedged_requests_total")
+        hedge = self._hedge_executor.submit(
+            copy_context().run, self._timed_call, hedge_client, hedge_index, method_name, args, kwargs
+        )
+
+        pending = {primary, hedge}
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    if future is hedge:
+                        metrics.inc("spotify_hedge_wins_total")
+                    return future.result()
+        # Both failed: surface the original call's error
+        return primary.result()
+
+    def _may_retry_transient(self, method_name, retries):
+        if method_name not in IDEMPOTENT_METHODS or retries >= MAX_TRANSIENT_RETRIES:
+            return False
+        if not self._retry_budget.try_spend():
+            logger.warning(f"[RETRY] Retry budget exhausted, not retrying {method_name}")
+            metrics.inc("spotify_retries_denied_total")
+            return False
+        metrics.inc("spotify_retries_total")
+        return True
+
     def __getattr__(self, name):
         """Proxy method calls to the underlying Spotify client with retry logic."""
         
@@ -192,8 +384,9 @@ class RotatingSpotifyClient:
         return wrapper
 
     def _call_with_retry(self, method_name, *args, **kwargs):
-        """Execute method with automatic rotation on 429."""
+        """Execute method with automatic rotation on 429 and retries of transient errors."""
         attempts = 0
+        transient_retries = 0
         max_attempts = len(self._available_indices) * 2 # Allow one full rotation + safety
         
         while attempts < max_attempts:
@@ -201,17 +394,31 @@ class RotatingSpotifyClient:
             if not client:
                  raise Exception("No available Spotify clients configured.")
 
-            method = getattr(client, method_name)
-            
+            self._retry_budget.record_call()
             try:
-                return method(*args, **kwargs)
+                if HEDGE_REQUESTS and method_name in IDEMPOTENT_METHODS:
+                    return self._hedged_call(client, method_name, args, kwargs)
+                return self._timed_call(client, self.current_index, method_name, args, kwargs)
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+                if self._may_retry_transient(method_name, transient_retries):
+                    transient_retries += 1
+                    logger.warning(f"[RETRY] {type(e).__name__} during {method_name}, retrying ({transient_retries}/{MAX_TRANSIENT_RETRIES})")
+                    accounting.sleep(0.3 * 2 ** transient_retries, reason="transient_retry")
+                    continue
+                raise e
             except spotipy.exceptions.SpotifyException as e:
-                if e.http_status == 429:
+                status = response_status(e)
+                if status in TRANSIENT_STATUSES and self._may_retry_transient(method_name, transient_retries):
+                    transient_retries += 1
+                    logger.warning(f"[RETRY] {status} during {method_name}, retrying ({transient_retries}/{MAX_TRANSIENT_RETRIES})")
+                    accounting.sleep(0.3 * 2 ** transient_retries, reason="transient_retry")
+                    continue
+                if status == 429:
                     logger.warning(f"[ROTATION] 429 Rate Limit detected during {method_name}. Attempting rotation...")
                     rotated = self._rotate_client()
                     if rotated:
                         attempts += 1
-                        time.sleep(1) # Brief pause before retry
+                        accounting.sleep(1, reason="rate_limited") # Brief pause before retry
                         continue
                     else:
                         # No options left
@@ -235,6 +442,23 @@ def get_spotify_client():
     return RotatingSpotifyClient()
 
 
+_shared_client = None
+_shared_client_lock = threading.Lock()
+
+
+def get_shared_spotify_client():
+    """
+    Get this process's shared Spotify client, for short web requests.
+    Reusing it keeps the token and HTTP connections warm between requests.
+    """
+    global _shared_client
+    if _shared_client is None:
+        with _shared_client_lock:
+            if _shared_client is None:
+                _shared_client = RotatingSpotifyClient()
+    return _shared_client
+
+
 # Legacy functions for backwards compatibility during migration
 def oauth_factory(user_id=None):
     """Legacy wrapper - now ignores user_id and returns central OAuth for default client."""
@@ -1,3 +1,76 @@
+import time
+from unittest import mock
+
 from django.test import TestCase
+from spotipy.exceptions import SpotifyException
+
+from authentication.oauth import LatencyTracker, RetryBudget, RotatingSpotifyClient, response_status
+
+
+class ResponseStatusTestCase(TestCase):
+    def test_unwraps_status_from_exhausted_retries(self):
+        e = SpotifyException(429, -1, "/v1/search:\n Max Retries", reason="too many 502 error responses")
+        self.assertEqual(response_status(e), 502)
+
+    def test_keeps_real_status(self):
+        self.assertEqual(response_status(SpotifyException(404, -1, "not found")), 404)
+        e = SpotifyException(429, -1, "/v1/search:\n Max Retries", reason="too many 429 error responses")
+        self.assertEqual(response_status(e), 429)
+
+
+class LatencyTrackerTestCase(TestCase):
+    def test_default_until_enough_samples(self):
+        tracker = LatencyTracker()
+        tracker.record("search", 5.0)
+        self.assertEqual(tracker.hedge_delay("search"), 2.0)
+
+    def test_p95_of_recent_latencies(self):
+        tracker = LatencyTracker()
+        for i in range(100):
+            tracker.record("search", (i + 1) / 100)
+        self.assertAlmostEqual(tracker.hedge_delay("search"), 0.96)
+
+
+class RetryBudgetTestCase(TestCase):
+    def test_retries_limited_to_share_of_calls(self):
+        budget = RetryBudget(ratio=0.1, minimum=1, window=60)
+        for _ in range(10):
+            budget.record_call()
+        self.assertTrue(budget.try_spend())
+        self.assertTrue(budget.try_spend())
+        self.assertFalse(budget.try_spend())
+
+
+class HedgedCallTestCase(TestCase):
+    def test_fast_hedge_wins_over_slow_call(self):
+        def slow_search(*args, **kwargs):
+            time.sleep(0.5)
+            return "slow"
+
+        slow, fast = mock.Mock(), mock.Mock()
+        slow.search.side_effect = slow_search
+        fast.search.return_value = "fast"
+
+        with mock.patch.object(RotatingSpotifyClient, "_discover_available_indices", return_value=[0, 1]):
+            client = RotatingSpotifyClient()
+        client._hedge_clients[1] = fast
+        with mock.patch.object(client._latency, "hedge_delay", return_value=0.05), \
+                mock.patch("authentication.oauth.metrics"):
+            self.assertEqual(client._hedged_call(slow, "search", ("q",), {}), "fast")
+
+    def test_no_hedge_without_a_budget_slot(self):
+        def slow_search(*args, **kwargs):
+            time.sleep(0.2)
+            return "slow"
+
+        slow, fast = mock.Mock(), mock.Mock()
+        slow.search.side_effect = slow_search
 
-# Create your tests here.
+        with mock.patch.object(RotatingSpotifyClient, "_discover_available_indices", return_value=[0, 1]):
+            client = RotatingSpotifyClient()
+        client._hedge_clients[1] = fast
+        with mock.patch.object(client._latency, "hedge_delay", return_value=0.05), \
+                mock.patch("authentication.oauth.metrics"), \
+                mock.patch("authentication.oauth.scheduling.try_acquire_extra_call", return_value=False):
+            self.assertEqual(client._hedged_call(slow, "search", ("q",), {}), "slow")
+        fast.search.assert_not_called()
@@ -1,5 +1,18 @@
+import logging
+
 from django.shortcuts import render
 
+from tasks.homepage import homepage_data
+
+logger = logging.getLogger(__name__)
+
 
 def home(request):
-    return render(request, "index.html")
\ No newline at end of file
+    # Count and recent playlists are embedded so the page needs no extra requests;
+    # without them, index.js falls back to fetching both endpoints.
+    try:
+        bootstrap = homepage_data()
+    except Exception as e:
+        logger.warning(f"Homepage data unavailable: {type(e).__name__}: {str(e)[:100]}")
+        bootstrap = None
+    return render(request, "index.html", {"bootstrap": bootstrap})
@@ -3,6 +3,7 @@ import os
 from celery import Celery
 from django.conf import settings
 from decouple import config
+from kombu import Queue
 
 # Use prod_settings as fallback for production deployments (Fly.io sets REMIXIFY=prod)
 # In development, explicitly set DJANGO_SETTINGS_MODULE=main.settings.dev_settings
@@ -11,6 +12,43 @@ app = Celery("main" ,)
 #app = Celery("main" , broker= settings.CELERY_BROKER_URL , backend=settings.CELERY_RESULT_BACKEND)
 app.config_from_object("django.conf.settings", namespace="CELERY")
 
+# Queue topology: previews run for minutes and make hundreds of API calls,
+# playlist creation takes seconds. They get separate queues (and separate
+# worker process groups in fly.toml) so short create jobs never wait behind
+# long previews. Anything unrouted goes to the default queue.
+PREVIEW_QUEUE = "preview"
+CREATE_QUEUE = "create"
+DEFAULT_QUEUE = "celery"
+
+app.conf.task_queues = (
+    Queue(PREVIEW_QUEUE, routing_key=PREVIEW_QUEUE),
+    Queue(CREATE_QUEUE, routing_key=CREATE_QUEUE),
+    Queue(DEFAULT_QUEUE, routing_key=DEFAULT_QUEUE),
+)
+app.conf.task_default_queue = DEFAULT_QUEUE
+app.conf.task_routes = {
+    # Parent previews jump ahead of fanned-out chunks, which are prioritized
+    # by position (see tasks.scheduling.chunk_priority)
+    "tasks.tasks.preview_remixes": {"queue": PREVIEW_QUEUE, "priority": 0},
+    "tasks.tasks.find_remix_candidates_chunk": {"queue": PREVIEW_QUEUE},
+    "tasks.tasks.merge_preview_chunks": {"queue": PREVIEW_QUEUE},
+    "tasks.tasks.create_remix_playlist": {"queue": CREATE_QUEUE, "priority": 0},
+}
+
+# Redis emulates priorities with one list per step; 0 is the highest priority.
+app.conf.task_default_priority = 5
+app.conf.broker_transport_options = {
+    "priority_steps": list(range(10)),
+    "sep": ":",
+    "queue_order_strategy": "priority",
+    # Late-acked previews are redelivered after this, so it must exceed the longest preview.
+    "visibility_timeout": 2 * 60 * 60,
+}
+
+# Reserve one message per process by default; each worker group can raise it
+# with --prefetch-multiplier (see fly.toml).
+app.conf.worker_prefetch_multiplier = 1
+
 app.autodiscover_tasks()
 
 @app.task(bind=True)
@@ -128,10 +128,96 @@ CELERY_TRACK_STARTED = True
 CELERY_BROKER_URL = config("REDIS_URL")
 CELERY_RESULT_BACKEND = config("REDIS_URL")
 
+# Connection pool shared by all app Redis access in a process (tasks.redis_utils).
+# Idle connections are pinged before reuse if unused for this many seconds.
+REDIS_MAX_CONNECTIONS = config("REDIS_MAX_CONNECTIONS", default=50, cast=int)
+REDIS_HEALTH_CHECK_INTERVAL = config("REDIS_HEALTH_CHECK_INTERVAL", default=30, cast=int)
+
+# The recent playlists feed lives in Redis. Created playlists are also queued
+# for the CreatedPlaylist table and written there in bulk, this many at a time.
+PLAYLIST_ARCHIVE_ENABLED = config("PLAYLIST_ARCHIVE_ENABLED", default=True, cast=bool)
+PLAYLIST_ARCHIVE_BATCH_SIZE = config("PLAYLIST_ARCHIVE_BATCH_SIZE", default=20, cast=int)
+
+# Seconds the homepage data (count and recent playlists) is cached in Redis and
+# may be cached by browsers/CDNs for the JSON endpoints. Creating a playlist
+# drops the Redis copy.
+HOMEPAGE_CACHE_TTL = config("HOMEPAGE_CACHE_TTL", default=30, cast=int)
+
+# Preview fan-out: large playlists are split into chunks that are searched by
+# separate Celery subtasks, so preview latency scales with worker count.
+PREVIEW_FANOUT_ENABLED = config("PREVIEW_FANOUT_ENABLED", default=False, cast=bool)
+PREVIEW_FANOUT_MIN_TRACKS = config("PREVIEW_FANOUT_MIN_TRACKS", default=200, cast=int)
+PREVIEW_FANOUT_CHUNK_SIZE = config("PREVIEW_FANOUT_CHUNK_SIZE", default=50, cast=int)
+
+# Fair share of the Spotify rate budget for preview searches: calls per 30s
+# window across all workers (0 disables), split evenly between active requests
+# and never more than PREVIEW_MAX_RATE_SHARE of the budget per request. Slots
+# are taken from Redis a few at a time, not one round-trip per call.
+SPOTIFY_RATE_BUDGET = config("SPOTIFY_RATE_BUDGET", default=240, cast=int)
+PREVIEW_MAX_RATE_SHARE = config("PREVIEW_MAX_RATE_SHARE", default=1.0, cast=float)
+
+# Admission control for new previews (0 disables each check): maximum queued
+# preview messages, maximum wait in seconds for the backlog ahead of a new
+# preview, previews per minute per client IP, and tracks per preview.
+PREVIEW_MAX_QUEUE_DEPTH = config("PREVIEW_MAX_QUEUE_DEPTH", default=50, cast=int)
+PREVIEW_MAX_ESTIMATED_WAIT = config("PREVIEW_MAX_ESTIMATED_WAIT", default=900, cast=int)
+PREVIEW_CLIENT_RATE_LIMIT = config("PREVIEW_CLIENT_RATE_LIMIT", default=10, cast=int)
+PREVIEW_MAX_TRACKS = config("PREVIEW_MAX_TRACKS", default=5000, cast=int)
+
+# A running preview stops early (returning partial results) when nobody has
+# polled its progress for this many seconds (0 disables).
+PREVIEW_ABANDON_AFTER = config("PREVIEW_ABANDON_AFTER", default=60, cast=int)
+
+# Seconds a preview may take before it returns best-effort partial results:
+# cached answers first, then one query per track, then full searches (0 disables).
+PREVIEW_LATENCY_BUDGET = config("PREVIEW_LATENCY_BUDGET", default=0, cast=int)
+
+# Number of tracks (the first screen of the selection UI) that get a quick
+# one-query pass and are shown before the full search runs (0 disables).
+PREVIEW_VIEWPORT_TRACKS = config("PREVIEW_VIEWPORT_TRACKS", default=20, cast=int)
+
+# Once a playlist has this many tracks by one artist, a shared "{artist} remix"
+# search is scored for each of them before their own searches (0 disables).
+PREVIEW_SHARED_ARTIST_MIN_TRACKS = config("PREVIEW_SHARED_ARTIST_MIN_TRACKS", default=3, cast=int)
+# With this many tracks by one artist, the artist's releases are crawled once
+# into a cached remix index that answers all of their tracks (0 disables).
+# Both thresholds are checked up front against the chunk (fan-out) or the
+# first page of 100 tracks (streamed previews); an artist whose tracks only
+# pile up further down a streamed playlist switches over once enough of them
+# have arrived, so its earlier tracks are searched one by one.
+PREVIEW_CATALOG_MIN_TRACKS = config("PREVIEW_CATALOG_MIN_TRACKS", default=8, cast=int)
+
+# Preview progress updates (each one a Redis write) are coalesced: at most one
+# per interval (seconds), and only once the percentage has moved this much.
+PREVIEW_PROGRESS_INTERVAL = config("PREVIEW_PROGRESS_INTERVAL", default=0.5, cast=float)
+PREVIEW_PROGRESS_MIN_PERCENT = config("PREVIEW_PROGRESS_MIN_PERCENT", default=1.0, cast=float)
+
+# Bearer token required to scrape /metrics (empty disables it unless DEBUG is on)
+METRICS_TOKEN = config("METRICS_TOKEN", default="")
+
+# Record per-task trace spans in Redis for the staff-only waterfall view (/traces/)
+TRACING_ENABLED = config("TRACING_ENABLED", default=True, cast=bool)
+
+# Profile every preview/create task with cProfile (see `manage.py task_profiles`).
+# Staff can profile a single request instead by sending an X-Remixify-Profile header.
+TASK_PROFILING = config("TASK_PROFILING", default=False, cast=bool)
+
+# "json" logs one JSON object per line (with task_id and structured extras) instead of text
+LOG_FORMAT = config("LOG_FORMAT", default="text")
+# Share of preview tasks whose per-track detail records are logged as they happen.
+# The rest keep them in a ring buffer of LOG_RING_BUFFER_SIZE records, logged only if the task fails.
+LOG_DETAIL_SAMPLE_RATE = config("LOG_DETAIL_SAMPLE_RATE", default=0.01, cast=float)
+LOG_RING_BUFFER_SIZE = config("LOG_RING_BUFFER_SIZE", default=200, cast=int)
+
 # Logging configuration
 LOGGING = {
     'version': 1,
     'disable_existing_loggers': False,
+    'filters': {
+        'task_context': {
+            '()': 'tasks.task_logging.TaskContextFilter',
+        },
+    },
     'formatters': {
         'verbose': {
             'format': '{levelname} {asctime} {module} {process:d} {thread:d} {message}',
@@ -141,18 +227,23 @@ LOGGING = {
             'format': '{levelname} {asctime} {message}',
             'style': '{',
         },
+        'json': {
+            '()': 'tasks.task_logging.JsonFormatter',
+        },
     },
     'handlers': {
         'console': {
             'class': 'logging.StreamHandler',
-            'formatter': 'verbose',
+            'formatter': 'json' if LOG_FORMAT == 'json' else 'verbose',
+            'filters': ['task_context'],
         },
         'file': {
             'class': 'logging.handlers.RotatingFileHandler',
             'filename': os.path.join(BASE_DIR, 'logs/app.log'),
             'maxBytes': 1024 * 1024 * 15,  # 15MB
             'backupCount': 10,
-            'formatter': 'verbose',
+            'formatter': 'json' if LOG_FORMAT == 'json' else 'verbose',
+            'filters': ['task_context'],
         },
     },
     'loggers': {
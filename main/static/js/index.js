@@ -23,7 +23,13 @@ const state = {
     // Audio preview
     audioPlayer: null,
     currentlyPlayingBtn: null,
-    previewTimeout: null
+    previewTimeout: null,
+    // Preview task lifecycle
+    previewInFlight: false,
+    // Tracks the deadline left incomplete, and the follow-up pass searching them
+    incompleteTrackIds: [],
+    followUpTaskId: null,
+    earlyResultShown: false
 };
 
 const MANUAL_CONFIDENCE_LEVEL = 'manual';
@@ -66,6 +72,8 @@ document.addEventListener('DOMContentLoaded', () => {
         trackList: document.getElementById('track-list'),
         showMoreWrapper: document.getElementById('show-more-wrapper'),
         showMoreBtn: document.getElementById('show-more-btn'),
+        followUpWrapper: document.getElementById('follow-up-wrapper'),
+        followUpBtn: document.getElementById('follow-up-btn'),
         createBtn: document.getElementById('create-btn'),
         stickyBar: document.getElementById('sticky-bar'),
         stickySelectedCount: document.getElementById('sticky-selected-count'),
@@ -78,10 +86,37 @@ document.addEventListener('DOMContentLoaded', () => {
 
     state.csrfToken = document.querySelector('[name=csrfmiddlewaretoken]').value;
     setupEventListeners();
-    loadRecentPlaylists();
-    loadPlaylistCount();
+
+    // Stop the preview task if the user leaves while it's running
+    window.addEventListener('pagehide', () => {
+        if (state.previewInFlight && state.currentTaskId) {
+            cancelPreviewTask(state.currentTaskId, { beacon: true });
+        }
+        if (state.followUpTaskId) {
+            cancelPreviewTask(state.followUpTaskId, { beacon: true });
+        }
+    });
+    const bootstrap = readBootstrap();
+    if (bootstrap) {
+        showRecentPlaylists(bootstrap.playlists);
+        showPlaylistCount(bootstrap.count);
+    } else {
+        loadRecentPlaylists();
+        loadPlaylistCount();
+    }
 });
 
+// Homepage data embedded by the server render, or null
+function readBootstrap() {
+    const el = document.getElementById('homepage-bootstrap');
+    if (!el) return null;
+    try {
+        return JSON.parse(el.textContent);
+    } catch (error) {
+        return null;
+    }
+}
+
 // Animated counter with rolling effect
 function animateCounter(element, targetValue, duration = 1500) {
     const startValue = 0;
@@ -107,38 +142,46 @@ function animateCounter(element, targetValue, duration = 1500) {
     requestAnimationFrame(update);
 }
 
+// Show the playlist count
+function showPlaylistCount(count) {
+    if (count > 0) {
+        const counterEl = document.getElementById('playlist-counter');
+        const numberEl = document.getElementById('counter-number');
+
+        counterEl.style.display = 'inline-flex';
+
+        // Start the rolling animation
+        animateCounter(numberEl, count);
+    }
+}
+
 // Load playlist count
 async function loadPlaylistCount() {
     try {
         const response = await fetch('/playlist-count/');
         const data = await response.json();
-
-        if (data.count > 0) {
-            const counterEl = document.getElementById('playlist-counter');
-            const numberEl = document.getElementById('counter-number');
-
-            counterEl.style.display = 'inline-flex';
-
-            // Start the rolling animation
-            animateCounter(numberEl, data.count);
-        }
+        showPlaylistCount(data.count);
     } catch (error) {
         console.log('Could not load playlist count:', error);
     }
 }
 
+// Show recent playlists
+function showRecentPlaylists(playlists) {
+    if (playlists && playlists.length > 0) {
+        renderRecentPlaylists(playlists);
+    } else {
+        // Hide section if no playlists
+        elements.recentPlaylists.style.display = 'none';
+    }
+}
+
 // Load recent playlists
 async function loadRecentPlaylists() {
     try {
         const response = await fetch('/recent-playlists/');
         const data = await response.json();
-
-        if (data.playlists && data.playlists.length > 0) {
-            renderRecentPlaylists(data.playlists);
-        } else {
-            // Hide section if no playlists
-            elements.recentPlaylists.style.display = 'none';
-        }
+        showRecentPlaylists(data.playlists);
     } catch (error) {
         console.log('Could not load recent playlists:', error);
         // Hide section on error
@@ -195,6 +238,9 @@ function setupEventListeners() {
     if (elements.showMoreBtn) {
         elements.showMoreBtn.addEventListener('click', loadMoreTracks);
     }
+    if (elements.followUpBtn) {
+        elements.followUpBtn.addEventListener('click', startFollowUp);
+    }
 
     // Phase 3: New playlist
     elements.newPlaylistBtn.addEventListener('click', goToPhase1);
@@ -260,9 +306,14 @@ async function handleFormSubmit(e) {
             body: formData
         });
 
+        // Busy (503) and rate-limited (429) responses carry a user-facing error
         const data = await response.json();
         if (data.error) throw new Error(data.error);
 
+        if (data.queue_position > 1) {
+            elements.progressMessage.textContent = `Queued behind ${data.queue_position - 1} other playlist${data.queue_position > 2 ? 's' : ''}...`;
+        }
+
         state.currentTaskId = data.task_id;
         pollPreviewResult(data.task_id);
 
@@ -272,16 +323,52 @@ async function handleFormSubmit(e) {
     }
 }
 
+function cancelPreviewTask(taskId, { beacon = false } = {}) {
+    const url = `/preview/${taskId}/cancel/`;
+    const formData = new FormData();
+    formData.append('csrfmiddlewaretoken', state.csrfToken);
+
+    // sendBeacon survives page unload; fetch may be cut off
+    if (beacon && navigator.sendBeacon) {
+        navigator.sendBeacon(url, formData);
+        return;
+    }
+    fetch(url, { method: 'POST', body: formData }).catch(() => {});
+}
+
+function finishPreviewPolling() {
+    state.previewInFlight = false;
+}
+
 async function pollPreviewResult(taskId) {
-    const progressUrl = `/celery-progress/${taskId}/`;
+    // Polling this endpoint also keeps the task alive (heartbeat)
+    const progressUrl = `/preview/${taskId}/progress/`;
+
+    state.previewInFlight = true;
+    state.earlyResultShown = false;
 
     // Use CeleryProgressBar for visual progress
     CeleryProgressBar.initProgressBar(progressUrl, {
         onProgress: function (progressBarElement, progressBarMessageElement, progress) {
+            if (state.currentTaskId !== taskId) return;
             elements.progressBar.style.width = `${progress.percent}%`;
             elements.progressMessage.textContent = `Finding remixes... ${progress.current}/${progress.total} tracks`;
+
+            // The first screen of tracks arrives once, before the full search is done
+            if (progress.early_result && !state.earlyResultShown) {
+                state.earlyResultShown = true;
+                state.playlistName = progress.early_result.playlist_name;
+                state.playlistImage = progress.early_result.playlist_image;
+                renderTrackSelection(progress.early_result);
+                goToPhase2();
+            }
+            if (state.earlyResultShown) {
+                elements.trackCount.textContent = `Still searching... ${progress.current}/${progress.total} tracks`;
+            }
         },
         onSuccess: async function () {
+            finishPreviewPolling();
+            if (state.currentTaskId !== taskId) return;
             // Fetch the actual result
             try {
                 const response = await fetch(`/preview/${taskId}/`);
@@ -292,8 +379,15 @@ async function pollPreviewResult(taskId) {
                     state.playlistImage = data.result.playlist_image;
                     state.tracks = data.result.tracks;
 
-                    renderTrackSelection(data.result);
+                    // Keep whatever the user already picked from the early results
+                    renderTrackSelection(data.result, { keepSelection: state.earlyResultShown });
                     goToPhase2();
+                    state.incompleteTrackIds = data.result.incomplete_track_ids || [];
+                    updateFollowUpButton();
+
+                    if (data.result.cancelled) {
+                        showSuccess(`Showing the first ${data.result.total_tracks} of ${data.result.playlist_total_tracks} tracks`);
+                    }
                 } else if (data.status === 'error') {
                     throw new Error(data.error);
                 }
@@ -303,6 +397,9 @@ async function pollPreviewResult(taskId) {
             }
         },
         onTaskError: function (progressBarElement, progressBarMessageElement, excMessage) {
+            finishPreviewPolling();
+            if (state.currentTaskId !== taskId) return;
+            if (state.earlyResultShown) updateSelectedCount();
             // Extract the clean error message from backend exceptions
             let errorMessage = 'Failed to find remixes. Please try again.';
 
@@ -338,6 +435,9 @@ async function pollPreviewResult(taskId) {
             resetPhase1();
         },
         onError: function (progressBarElement, progressBarMessageElement, excMessage) {
+            finishPreviewPolling();
+            if (state.currentTaskId !== taskId) return;
+            if (state.earlyResultShown) updateSelectedCount();
             // Generic error handler for network/parsing errors
             showError('Failed to find remixes. Please try again.');
             resetPhase1();
@@ -369,7 +469,7 @@ function resetCreateButton() {
 
 // ============ PHASE 2: Selection ============
 
-function renderTrackSelection(result) {
+function renderTrackSelection(result, { keepSelection = false } = {}) {
     // Update header
     if (elements.playlistImage) {
         if (result.playlist_image) {
@@ -388,7 +488,7 @@ function renderTrackSelection(result) {
     elements.statNone.textContent = result.summary.no_match;
 
     // Store tracks and auto-select high confidence
-    state.selectedTracks.clear();
+    if (!keepSelection) state.selectedTracks.clear();
     state.tracks = result.tracks || [];
     result.tracks.forEach((track) => {
         if (track.best_match && track.best_match.confidence_level === 'high') {
@@ -411,6 +511,97 @@ function renderTrackSelection(result) {
     updateSelectedCount();
 }
 
+// ============ Follow-up pass ============
+
+function updateFollowUpButton() {
+    if (!elements.followUpWrapper) return;
+    const remaining = state.incompleteTrackIds.length;
+    elements.followUpWrapper.style.display = remaining > 0 ? 'flex' : 'none';
+    elements.followUpBtn.disabled = Boolean(state.followUpTaskId);
+    elements.followUpBtn.querySelector('.show-more-text').textContent = state.followUpTaskId
+        ? 'Searching deeper...'
+        : 'Search deeper';
+    elements.followUpBtn.querySelector('.show-more-count').textContent =
+        `(${remaining} track${remaining !== 1 ? 's' : ''} not fully searched)`;
+}
+
+async function startFollowUp() {
+    if (state.followUpTaskId || state.incompleteTrackIds.length === 0) return;
+
+    try {
+        const formData = new FormData();
+        formData.append('url', state.originalUrl);
+        formData.append('track_ids', state.incompleteTrackIds.join(','));
+        formData.append('csrfmiddlewaretoken', state.csrfToken);
+
+        const response = await fetch('/preview/', { method: 'POST', body: formData });
+        const data = await response.json();
+        if (data.error) throw new Error(data.error);
+
+        state.followUpTaskId = data.task_id;
+        updateFollowUpButton();
+        pollFollowUpResult(data.task_id);
+    } catch (error) {
+        showError(error.message);
+    }
+}
+
+async function pollFollowUpResult(taskId) {
+    const checkResult = async () => {
+        // Navigated away or started over: drop the result
+        if (state.followUpTaskId !== taskId) return;
+        try {
+            // Polling this endpoint also keeps the task alive (heartbeat)
+            const response = await fetch(`/preview/${taskId}/`);
+            const data = await response.json();
+
+            if (data.status === 'complete') {
+                if (state.followUpTaskId !== taskId) return;
+                state.followUpTaskId = null;
+                mergeFollowUpResult(data.result);
+            } else if (data.status === 'error') {
+                throw new Error(data.error);
+            } else {
+                setTimeout(checkResult, 2000);
+            }
+        } catch (error) {
+            if (state.followUpTaskId !== taskId) return;
+            state.followUpTaskId = null;
+            updateFollowUpButton();
+            showError('Could not search deeper. Please try again.');
+        }
+    };
+
+    checkResult();
+}
+
+function mergeFollowUpResult(result) {
+    // Replace the re-searched tracks in place; everything else stays as it was
+    const updated = new Map((result.tracks || []).map(track => [track.original.id, track]));
+    state.tracks = state.tracks.map((track) => {
+        const replacement = updated.get(track.original.id);
+        if (!replacement) return track;
+
+        // Auto-select new high-confidence matches, unless the user already picked something for this track
+        const alreadyPicked = track.candidates.some(c => state.selectedTracks.has(c.id));
+        if (!alreadyPicked && replacement.best_match && replacement.best_match.confidence_level === 'high') {
+            state.selectedTracks.set(replacement.best_match.id, replacement.best_match);
+        }
+        return replacement;
+    });
+
+    const levels = state.tracks.map(track => track.best_match ? track.best_match.confidence_level : null);
+    elements.statHigh.textContent = levels.filter(level => level === 'high').length;
+    elements.statMedium.textContent = levels.filter(level => level === 'medium').length;
+    elements.statNone.textContent = levels.filter(level => level === null).length;
+
+    state.incompleteTrackIds = result.incomplete_track_ids || [];
+    updateFollowUpButton();
+    filterTracks();
+    updateSelectedCount();
+    showSuccess(`Searched ${updated.size} more track${updated.size !== 1 ? 's' : ''}`);
+}
+
 function filterTracks() {
     const query = state.searchQuery.toLowerCase().trim();
 
@@ -989,7 +1180,8 @@ function updateVisibleTracksSelection() {
 function updateSelectedCount() {
     const count = state.selectedTracks.size;
     elements.selectedCount.textContent = count;
-    elements.createBtn.disabled = count === 0;
+    // Creating waits for the full search when early results are on screen
+    elements.createBtn.disabled = count === 0 || state.previewInFlight;
     elements.createBtn.querySelector('span').textContent = count === 0
         ? 'Select tracks'
         : `Create Playlist (${count})`;
@@ -1041,6 +1233,12 @@ async function handleCreatePlaylist() {
         const data = await response.json();
         if (data.error) throw new Error(data.error);
 
+        // Identical selections come back with the existing playlist right away
+        if (data.status === 'complete') {
+            showPhase3Success(data.result);
+            return;
+        }
+
         // Poll for completion
         pollCreateResult(data.task_id);
 
@@ -1159,6 +1357,18 @@ function stopPreview() {
 
 function goToPhase1() {
     stopPreview(); // Stop any playing audio
+    // Leaving while early results are shown: stop the search still running behind them
+    if (state.previewInFlight && state.currentTaskId) {
+        cancelPreviewTask(state.currentTaskId);
+        finishPreviewPolling();
+    }
+    if (state.followUpTaskId) {
+        cancelPreviewTask(state.followUpTaskId);
+    }
+    state.currentTaskId = null;
+    state.followUpTaskId = null;
+    state.incompleteTrackIds = [];
+    updateFollowUpButton();
     if (elements.phaseInput) elements.phaseInput.style.display = 'flex';
     if (elements.phaseSelection) elements.phaseSelection.style.display = 'none';
     if (elements.phaseSuccess) elements.phaseSuccess.style.display = 'none';
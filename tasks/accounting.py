@@ -0,0 +1,153 @@
+"""
+Per-task resource accounting for preview tasks.
+
+accounted_task measures what one task run cost: Spotify calls by method,
+429s, credential rotations, time slept, tracks searched, cache hits and
+misses, wall and CPU time, and how much the run raised the worker's peak
+RSS. The numbers are attached to the task's result under "usage" and added
+to hourly totals in Redis (see `manage.py task_usage`).
+
+Like tracing, the current usage lives in a context variable, so calls made
+from helper threads that carry the context are counted too.
+"""
+import logging
+import resource
+import threading
+import time
+from collections import Counter
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from functools import wraps
+
+from tasks import tracing
+from tasks.redis_utils import get_redis_client
+
+logger = logging.getLogger(__name__)
+
+USAGE_KEY = "remixify:usage:{hour}"
+USAGE_TTL = 60 * 60 * 24 * 30
+
+_usage = ContextVar("remixify_usage", default=None)
+
+
+class TaskUsage:
+    """Counters for one task run. Safe to update from several threads."""
+
+    def __init__(self):
+        self.counts = Counter()
+        self._lock = threading.Lock()
+
+    def add(self, field, by=1):
+        with self._lock:
+            self.counts[field] += by
+
+    def as_dict(self):
+        with self._lock:
+            return {field: round(value, 3) if isinstance(value, float) else value
+                    for field, value in sorted(self.counts.items())}
+
+
+def _add(field, by=1):
+    usage = _usage.get()
+    if usage is not None:
+        usage.add(field, by)
+
+
+def record_call(method_name, status):
+    """Count one Spotify call (and a 429 if that's what it got)."""
+    _add("calls")
+    _add(f"calls:{method_name}")
+    if status == 429:
+        _add("rate_limited")
+
+
+def record_rotation():
+    _add("rotations")
+
+
+def record_tracks(count=1):
+    _add("tracks", count)
+
+
+def record_cache(cache, hit):
+    _add(f"cache:{cache}:{'hit' if hit else 'miss'}")
+
+
+def sleep(seconds, reason):
+    """time.sleep that shows up as a traced span and in the task's sleep time."""
+    with tracing.span("sleep", reason=reason):
+        time.sleep(seconds)
+    _add("sleep_seconds", seconds)
+
+
+def current_usage():
+    """Usage recorded so far by the current task, or None outside one."""
+    usage = _usage.get()
+    return usage.as_dict() if usage is not None else None
+
+
+def merge_usage(*usages):
+    """Sum several usage dicts (e.g. of fan-out chunks). Times become task-seconds."""
+    total = Counter()
+    for usage in usages:
+        total.update(usage or {})
+    return {field: round(value, 3) if isinstance(value, float) else value for field, value in sorted(total.items())}
+
+
+def aggregate_hourly(task_name, usage, at=None):
+    """Add one task run's usage to the Redis totals of the current hour."""
+    hour = datetime.fromtimestamp(at or time.time(), tz=timezone.utc).strftime("%Y%m%d%H")
+    key = USAGE_KEY.format(hour=hour)
+    pipe = get_redis_client().pipeline()
+    pipe.hincrby(key, f"runs:{task_name}", 1)
+    for field, value in usage.items():
+        pipe.hincrbyfloat(key, field, value)
+    pipe.expire(key, USAGE_TTL)
+    pipe.execute()
+
+
+def hourly_usage(hours=24):
+    """[(hour, {field: total})] for the last `hours` hours, oldest first."""
+    now = time.time()
+    hours_back = [
+        datetime.fromtimestamp(now - 3600 * i, tz=timezone.utc).strftime("%Y%m%d%H") for i in reversed(range(hours))
+    ]
+    pipe = get_redis_client().pipeline()
+    for hour in hours_back:
+        pipe.hgetall(USAGE_KEY.format(hour=hour))
+    return [
+        (hour, {k.decode(): float(v) for k, v in raw.items()})
+        for hour, raw in zip(hours_back, pipe.execute())
+    ]
+
+
+def accounted_task(func):
+    """Decorator for bound Celery tasks: account the run and attach it to a dict result as "usage".
+
+    If the result already carries usage (a chord callback merging its
+    chunks), this run's usage is added to it. Only this run's own usage goes
+    into the hourly totals, so nothing is counted twice.
+    """
+    @wraps(func)
+    def wrapper(self, *args, **kwargs):
+        usage = TaskUsage()
+        token = _usage.set(usage)
+        wall_started = time.perf_counter()
+        cpu_started = time.process_time()
+        rss_started = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        try:
+            result = func(self, *args, **kwargs)
+        finally:
+            _usage.reset(token)
+            usage.add("wall_seconds", time.perf_counter() - wall_started)
+            usage.add("cpu_seconds", time.process_time() - cpu_started)
+            usage.add("peak_rss_delta_kb", resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - rss_started)
+            try:
+                aggregate_hourly(self.name, usage.as_dict())
+            except Exception as e:
+                logger.warning(f"Failed to aggregate usage for {self.request.id}: {type(e).__name__}: {str(e)[:100]}")
+
+        if isinstance(result, dict):
+            result["usage"] = merge_usage(result.get("usage"), usage.as_dict())
+        return result
+    return wrapper
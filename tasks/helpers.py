@@ -1,7 +1,12 @@
+import contextvars
+import hashlib
+import json
+import queue
 import re
+import threading
 
-def chunker(array):
-    return [array[i:i+100] for i in range(len(array))[::100]]
+def chunker(array, size=100):
+    return [array[i:i+size] for i in range(len(array))[::size]]
     
 
 def get_playlist_id(url):
@@ -15,4 +20,54 @@ def get_playlist_id(url):
     if mo is None:
         raise ValueError("Please paste a Spotify playlist link")
     
-    return mo.group(1)
\ No newline at end of file
+    return mo.group(1)
+
+
+def selection_key(playlist_name, selected_tracks):
+    """Content hash of a remix request: the playlist name plus the ordered track IDs."""
+    payload = json.dumps([playlist_name, list(selected_tracks)], separators=(",", ":"))
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def prefetch(iterable, maxsize):
+    """Iterate `iterable` in a background thread, handing items over through a bounded queue.
+
+    Lets a slow consumer overlap with a slow producer while capping how far the
+    producer can run ahead. Exceptions raised by the producer are re-raised in
+    the consumer. If the consumer stops early, the producer stops at its next item.
+    """
+    buffer = queue.Queue(maxsize=maxsize)
+    stop = threading.Event()
+
+    def put(entry):
+        while not stop.is_set():
+            try:
+                buffer.put(entry, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def produce():
+        try:
+            for item in iterable:
+                if not put((True, item)):
+                    return
+        except BaseException as e:
+            put((False, e))
+            return
+        put((False, None))
+
+    # The producer runs in a copy of the caller's context, so context-bound
+    # state such as the current trace follows the work into the thread.
+    threading.Thread(target=contextvars.copy_context().run, args=(produce,), daemon=True).start()
+    try:
+        while True:
+            ok, value = buffer.get()
+            if not ok:
+                if value is not None:
+                    raise value
+                return
+            yield value
+    finally:
+        stop.set()
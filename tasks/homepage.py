@@ -0,0 +1,89 @@
+"""
+Homepage data: the playlist count and the recent playlists feed.
+
+authentication.views.home embeds it in the index.html render, and the
+/playlist-count/ and /recent-playlists/ endpoints serve it as JSON. It is
+cached in Redis for HOMEPAGE_CACHE_TTL seconds (record_created_playlist
+drops that copy in the same transaction that adds a playlist) and in each
+process's memory for up to LOCAL_TTL seconds on top, so most page loads
+make no Redis call at all.
+"""
+import logging
+import threading
+import time
+
+from django.conf import settings
+
+from tasks.models import CreatedPlaylist
+from tasks.redis_utils import (
+    RECENT_PLAYLISTS_MAX,
+    cache_homepage,
+    get_cached_homepage,
+    get_homepage_stats,
+    seed_recent_playlists,
+)
+
+logger = logging.getLogger(__name__)
+
+RECENT_LIMIT = 3
+# How stale another process's copy may be after a playlist is created
+LOCAL_TTL = 5
+
+_local = {"data": None, "expires_at": 0.0}
+_local_lock = threading.Lock()
+
+
+def cache_ttl():
+    return getattr(settings, "HOMEPAGE_CACHE_TTL", 30)
+
+
+def homepage_data():
+    """{"count": n, "playlists": [...]} for the homepage, from the nearest cache."""
+    now = time.monotonic()
+    with _local_lock:
+        if _local["data"] is not None and now < _local["expires_at"]:
+            return _local["data"]
+
+    data = get_cached_homepage()
+    if data is None:
+        data = _build()
+        cache_homepage(data, cache_ttl())
+    with _local_lock:
+        _local["data"] = data
+        _local["expires_at"] = now + min(LOCAL_TTL, cache_ttl())
+    return data
+
+
+def _build():
+    count, playlists = get_homepage_stats(RECENT_LIMIT)
+    if not playlists:
+        # Empty feed (a fresh Redis): seed it from the archive once
+        archived = archived_playlists(RECENT_PLAYLISTS_MAX)
+        seed_recent_playlists(archived)
+        playlists = archived[:RECENT_LIMIT]
+    return {"count": count, "playlists": [public_playlist(p) for p in playlists]}
+
+
+def public_playlist(playlist):
+    """A recent feed entry as the front end shows it."""
+    return {
+        "name": playlist["name"],
+        "url": playlist["url"],
+        "image": playlist["image"],
+        "original_author": playlist["original_author"] or "Unknown",
+    }
+
+
+def archived_playlists(limit):
+    """The newest archived playlists, in the recent feed's format."""
+    return [
+        {
+            "name": p.name,
+            "url": p.spotify_url,
+            "image": p.image_url,
+            "original_author": p.original_author,
+            "track_count": p.track_count,
+            "created_at": p.created_at.timestamp(),
+        }
+        for p in CreatedPlaylist.objects.all()[:limit]
+    ]
@@ -0,0 +1,23 @@
+"""
+Write created playlists queued in Redis to the CreatedPlaylist archive.
+
+Playlist creation drains the queue itself once a batch is full; run this to
+flush a partial batch, e.g. before a Redis maintenance window.
+
+Usage:
+    python manage.py archive_playlists [--batch-size 20]
+"""
+from django.core.management.base import BaseCommand
+
+from tasks.tasks import archive_created_playlists
+
+
+class Command(BaseCommand):
+    help = 'Bulk-insert created playlists queued in Redis into the CreatedPlaylist archive'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=None, help='Playlists per INSERT')
+
+    def handle(self, *args, **options):
+        archived = archive_created_playlists(options['batch_size'])
+        self.stdout.write(f"Archived {archived} playlists")
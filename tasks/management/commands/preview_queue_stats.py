@@ -0,0 +1,18 @@
+"""
+Show how long preview work waits in the queue, by playlist size.
+
+Usage:
+    python manage.py preview_queue_stats
+"""
+from django.core.management.base import BaseCommand
+
+from tasks.scheduling import get_queue_wait_stats
+
+
+class Command(BaseCommand):
+    help = 'Show average preview queue wait per request size'
+
+    def handle(self, *args, **options):
+        self.stdout.write(f"{'tracks':>8}  {'waits':>8}  {'avg wait (s)':>12}")
+        for bucket, stats in get_queue_wait_stats().items():
+            self.stdout.write(f"{bucket:>8}  {stats['count']:>8}  {stats['avg_seconds']:>12.2f}")
@@ -0,0 +1,27 @@
+"""
+Show how often Spotify calls were hedged or retried, across all processes.
+
+Usage:
+    python manage.py spotify_call_stats
+"""
+from django.core.management.base import BaseCommand
+
+from tasks import metrics
+
+
+class Command(BaseCommand):
+    help = 'Show Spotify call, hedging and retry counts'
+
+    def handle(self, *args, **options):
+        calls = metrics.get_totals("spotify_calls_total")
+        for name in (
+            "spotify_calls_total",
+            "spotify_hedged_requests_total",
+            "spotify_hedge_wins_total",
+            "spotify_hedges_skipped_total",
+            "spotify_retries_total",
+            "spotify_retries_denied_total",
+        ):
+            value = calls if name == "spotify_calls_total" else metrics.get_totals(name)
+            share = f"{100 * value / calls:6.2f}%" if calls and name != "spotify_calls_total" else ""
+            self.stdout.write(f"{name:>30}  {int(value):>10}  {share}")
@@ -0,0 +1,36 @@
+"""
+List recent task profiles, or print the top functions of one.
+
+Usage:
+    python manage.py task_profiles
+    python manage.py task_profiles <task_id> [--sort cumulative|tottime|calls] [--limit 30]
+"""
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+
+from tasks.profiling import load_stats, recent_profiles
+
+
+class Command(BaseCommand):
+    help = 'List recent task profiles or show the top functions of one'
+
+    def add_arguments(self, parser):
+        parser.add_argument('task_id', nargs='?', help='Task ID of the profile to show')
+        parser.add_argument('--sort', default='cumulative', choices=['cumulative', 'tottime', 'calls'],
+                            help='Sort order for the function table')
+        parser.add_argument('--limit', type=int, default=30, help='Number of functions to print')
+
+    def handle(self, *args, **options):
+        task_id = options['task_id']
+        if not task_id:
+            self.stdout.write(f"{'started':<20}  {'duration (s)':>12}  {'task':<36}  task id")
+            for meta in recent_profiles():
+                started = datetime.fromtimestamp(meta['started_at']).strftime('%Y-%m-%d %H:%M:%S')
+                self.stdout.write(f"{started:<20}  {meta['duration']:>12.2f}  {meta['task']:<36}  {meta['task_id']}")
+            return
+
+        stats = load_stats(task_id, stream=self.stdout)
+        if stats is None:
+            raise CommandError(f"No profile stored for task {task_id}")
+        stats.sort_stats(options['sort']).print_stats(options['limit'])
@@ -0,0 +1,38 @@
+"""
+Show hourly resource usage of preview tasks, for capacity planning.
+
+Usage:
+    python manage.py task_usage [--hours 24]
+"""
+from django.core.management.base import BaseCommand
+
+from tasks.accounting import hourly_usage
+
+
+class Command(BaseCommand):
+    help = 'Show hourly preview task usage: throughput, API calls per track, 429s and cache hit rate'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--hours', type=int, default=24, help='Number of hours to show')
+
+    def handle(self, *args, **options):
+        self.stdout.write(
+            f"{'hour (UTC)':<12}  {'runs':>6}  {'tracks':>8}  {'tracks/s':>8}  {'calls/track':>11}  "
+            f"{'429s':>6}  {'sleep (s)':>9}  {'cpu (s)':>8}  {'cache hit':>9}"
+        )
+        for hour, totals in hourly_usage(options['hours']):
+            if not totals:
+                continue
+            runs = sum(v for k, v in totals.items() if k.startswith('runs:'))
+            tracks = totals.get('tracks', 0)
+            wall = totals.get('wall_seconds', 0)
+            hits = sum(v for k, v in totals.items() if k.startswith('cache:') and k.endswith(':hit'))
+            lookups = sum(v for k, v in totals.items() if k.startswith('cache:'))
+            self.stdout.write(
+                f"{hour:<12}  {int(runs):>6}  {int(tracks):>8}  "
+                f"{tracks / wall if wall else 0:>8.2f}  "
+                f"{totals.get('calls', 0) / tracks if tracks else 0:>11.2f}  "
+                f"{int(totals.get('rate_limited', 0)):>6}  {totals.get('sleep_seconds', 0):>9.1f}  "
+                f"{totals.get('cpu_seconds', 0):>8.1f}  "
+                f"{100 * hits / lookups if lookups else 0:>8.1f}%"
+            )
@@ -0,0 +1,195 @@
+"""
+Prometheus metrics for Remixify, aggregated across processes in Redis.
+
+Web and worker processes record counters and histograms locally and add
+them to one Redis hash in batches (every FLUSH_EVERY updates or
+FLUSH_INTERVAL seconds, and after every Celery task). The /metrics view
+renders that hash in the Prometheus text format, plus gauges such as queue
+depth that are read at scrape time, so every process can be scraped
+through one endpoint on any machine.
+
+Usage:
+    from tasks import metrics
+
+    metrics.inc("preview_tracks_processed_total")
+    with metrics.timer("preview_stage_duration_seconds", stage="search"):
+        ...
+"""
+import logging
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+from celery.signals import task_postrun
+
+from tasks.redis_utils import get_redis_client
+
+logger = logging.getLogger(__name__)
+
+METRICS_KEY = "remixify:metrics"
+FLUSH_EVERY = 200
+FLUSH_INTERVAL = 10.0
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# name -> (type, help)
+METRICS = {
+    "spotify_calls_total": (
+        "counter", "Spotify API calls by method, credential index and HTTP status (429 = rate limited)."),
+    "spotify_call_duration_seconds": ("histogram", "Spotify API call latency by method."),
+    "spotify_rotations_total": ("counter", "Credential rotations after a 429."),
+    "spotify_hedged_requests_total": ("counter", "Slow idempotent reads that got a hedged duplicate."),
+    "spotify_hedge_wins_total": ("counter", "Hedged duplicates that answered first."),
+    "spotify_hedges_skipped_total": ("counter", "Hedges not sent because the rate budget had no free slot."),
+    "spotify_retries_total": ("counter", "Retries of transient Spotify errors."),
+    "spotify_retries_denied_total": ("counter", "Transient errors not retried because the retry budget was spent."),
+    "preview_stage_duration_seconds": ("histogram", "Time spent per preview pipeline stage."),
+    "preview_tracks_processed_total": ("counter", "Tracks searched for remixes; rate() gives tracks per second."),
+    "preview_search_sharing_total": (
+        "counter", "Tracks answered from work shared within a preview, by kind (duplicate/shared_results/catalog)."),
+    "artist_catalog_crawls_total": ("counter", "Artist catalogs crawled to build a remix index."),
+    "cache_requests_total": ("counter", "Cache lookups by cache and result (hit/miss)."),
+    "celery_queue_depth": ("gauge", "Messages waiting in each Celery queue, across priority steps."),
+}
+
+
+def _series(name, labels):
+    """Prometheus series name with sorted, escaped labels."""
+    if not labels:
+        return name
+    parts = []
+    for key in sorted(labels):
+        value = str(labels[key]).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        parts.append(f'{key}="{value}"')
+    return f"{name}{{{','.join(parts)}}}"
+
+
+class _Buffer:
+    """Process-local metric updates waiting to be added to Redis."""
+
+    def __init__(self):
+        self._pending = Counter()
+        self._updates = 0
+        self._lock = threading.Lock()
+        self._flushed_at = time.monotonic()
+
+    def add(self, increments):
+        with self._lock:
+            self._pending.update(increments)
+            self._updates += 1
+            due = self._updates >= FLUSH_EVERY or time.monotonic() - self._flushed_at >= FLUSH_INTERVAL
+        if due:
+            self.flush()
+
+    def flush(self):
+        with self._lock:
+            pending, self._pending = self._pending, Counter()
+            self._updates = 0
+            self._flushed_at = time.monotonic()
+        if not pending:
+            return
+        try:
+            pipe = get_redis_client().pipeline()
+            for series, value in pending.items():
+                pipe.hincrbyfloat(METRICS_KEY, series, value)
+            pipe.execute()
+        except Exception as e:
+            logger.warning(f"Failed to flush metrics: {type(e).__name__}: {str(e)[:100]}")
+
+
+_buffer = _Buffer()
+
+
+def inc(name, value=1, **labels):
+    """Add `value` to a counter."""
+    _buffer.add({_series(name, labels): value})
+
+
+def observe(name, value, **labels):
+    """Record one histogram observation."""
+    increments = {
+        _series(f"{name}_sum", labels): value,
+        _series(f"{name}_count", labels): 1,
+        _series(f"{name}_bucket", {**labels, "le": "+Inf"}): 1,
+    }
+    for bound in LATENCY_BUCKETS:
+        if value <= bound:
+            increments[_series(f"{name}_bucket", {**labels, "le": str(bound)})] = 1
+    _buffer.add(increments)
+
+
+@contextmanager
+def timer(name, **labels):
+    """Observe the duration of the block in a histogram."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(name, time.perf_counter() - started, **labels)
+
+
+def flush():
+    """Send this process's pending updates to Redis now."""
+    _buffer.flush()
+
+
+@task_postrun.connect
+def _flush_after_task(**kwargs):
+    flush()
+
+
+def get_totals(name):
+    """Sum of a counter across all label values."""
+    raw = get_redis_client().hgetall(METRICS_KEY)
+    total = 0.0
+    for series, value in raw.items():
+        series = series.decode()
+        if series == name or series.startswith(f"{name}{{"):
+            total += float(value)
+    return total
+
+
+def _queue_depths():
+    from main.celery import CREATE_QUEUE, DEFAULT_QUEUE, PREVIEW_QUEUE
+    from tasks.scheduling import PREVIEW_QUEUE_PRIORITY_STEPS
+
+    queues = (PREVIEW_QUEUE, CREATE_QUEUE, DEFAULT_QUEUE)
+    pipe = get_redis_client().pipeline()
+    for queue in queues:
+        # Redis keeps one list per priority step: "preview", "preview:1", ... "preview:9"
+        for step in range(PREVIEW_QUEUE_PRIORITY_STEPS):
+            pipe.llen(f"{queue}:{step}" if step else queue)
+    lengths = pipe.execute()
+    return {
+        queue: sum(lengths[i * PREVIEW_QUEUE_PRIORITY_STEPS:(i + 1) * PREVIEW_QUEUE_PRIORITY_STEPS])
+        for i, queue in enumerate(queues)
+    }
+
+
+def _family(series):
+    """Metric family a stored series belongs to (histogram suffixes stripped)."""
+    name = series.split("{", 1)[0]
+    for suffix in ("_bucket", "_sum", "_count"):
+        base = name[:-len(suffix)]
+        if name.endswith(suffix) and METRICS.get(base, ("",))[0] == "histogram":
+            return base
+    return name
+
+
+def render():
+    """All metrics in the Prometheus text exposition format."""
+    raw = get_redis_client().hgetall(METRICS_KEY)
+    families = {}
+    for series, value in raw.items():
+        series = series.decode()
+        families.setdefault(_family(series), []).append((series, float(value)))
+    for queue, depth in _queue_depths().items():
+        families.setdefault("celery_queue_depth", []).append((_series("celery_queue_depth", {"queue": queue}), depth))
+
+    lines = []
+    for name, (kind, help_text) in METRICS.items():
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {kind}")
+        for series, value in sorted(families.get(name, [])):
+            lines.append(f"{series} {int(value) if float(value).is_integer() else value}")
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.9 on 2026-10-19 12:00
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tasks', '0002_createdplaylist_original_author'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='createdplaylist',
+            name='created_at',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+    ]
@@ -1,14 +1,19 @@
 from django.db import models
+from django.utils import timezone
 
 
 class CreatedPlaylist(models.Model):
-    """Stores recently created playlists to display on the main page."""
+    """Archive of created playlists.
+
+    The recent feed on the main page is served from Redis; rows are written
+    here in bulk from the archive queue (see archive_created_playlists).
+    """
     name = models.CharField(max_length=255)
     spotify_url = models.URLField()
     image_url = models.URLField(blank=True, null=True)
     track_count = models.PositiveIntegerField(default=0)
     original_author = models.CharField(max_length=100, blank=True)
-    created_at = models.DateTimeField(auto_now_add=True)
+    created_at = models.DateTimeField(default=timezone.now)
     
     class Meta:
         ordering = ['-created_at']
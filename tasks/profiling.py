@@ -0,0 +1,99 @@
+"""
+Opt-in cProfile profiling for Celery tasks.
+
+A task decorated with profiled_task is profiled when TASK_PROFILING is on,
+or when it was sent with a "profile" message header (views.preview and
+views.create_playlist set it for staff requests carrying the
+X-Remixify-Profile header). The profile is stored in Redis under the task
+ID; `python manage.py task_profiles` lists them and prints top functions.
+
+cProfile only sees the thread it was enabled on, so work done in helper
+threads (playlist page fetches, hedged Spotify calls) shows up as time
+spent waiting, not as the functions those threads ran.
+"""
+import cProfile
+import io
+import json
+import logging
+import marshal
+import pstats
+import time
+from functools import wraps
+
+from django.conf import settings
+
+from tasks.redis_utils import get_redis_client
+
+logger = logging.getLogger(__name__)
+
+PROFILE_KEY = "remixify:profile:{task_id}"
+PROFILE_INDEX_KEY = "remixify:profiles"
+PROFILE_TTL = 60 * 60 * 24 * 7
+MAX_INDEXED_PROFILES = 100
+PROFILE_HEADER = "profile"
+
+
+def wants_profile(request):
+    """Whether a task run (its Celery request context) should be profiled."""
+    if getattr(settings, "TASK_PROFILING", False):
+        return True
+    # Custom message headers show up as request attributes, and on newer Celery also in request.headers
+    headers = getattr(request, "headers", None) or {}
+    return bool(getattr(request, PROFILE_HEADER, None) or headers.get(PROFILE_HEADER))
+
+
+def save_profile(task_id, task_name, profiler, duration):
+    """Store a finished profile and index it as the newest one."""
+    profiler.create_stats()
+    meta = {"task_id": task_id, "task": task_name, "started_at": time.time() - duration, "duration": duration}
+    pipe = get_redis_client().pipeline()
+    pipe.set(PROFILE_KEY.format(task_id=task_id), marshal.dumps(profiler.stats), ex=PROFILE_TTL)
+    pipe.zadd(PROFILE_INDEX_KEY, {json.dumps(meta): meta["started_at"]})
+    pipe.zremrangebyrank(PROFILE_INDEX_KEY, 0, -MAX_INDEXED_PROFILES - 1)
+    pipe.execute()
+
+
+def profiled_task(func):
+    """Decorator for bound Celery tasks: profile the run if it opted in (see wants_profile)."""
+    @wraps(func)
+    def wrapper(self, *args, **kwargs):
+        if not wants_profile(self.request):
+            return func(self, *args, **kwargs)
+
+        profiler = cProfile.Profile()
+        started = time.perf_counter()
+        profiler.enable()
+        try:
+            return func(self, *args, **kwargs)
+        finally:
+            profiler.disable()
+            try:
+                save_profile(self.request.id, self.name, profiler, time.perf_counter() - started)
+                logger.info(f"Saved profile for {self.name} {self.request.id}")
+            except Exception as e:
+                logger.warning(f"Failed to save profile for {self.request.id}: {type(e).__name__}: {str(e)[:100]}")
+    return wrapper
+
+
+def recent_profiles(limit=20):
+    """Metadata of the most recently stored profiles, newest first."""
+    raw = get_redis_client().zrevrange(PROFILE_INDEX_KEY, 0, limit - 1)
+    return [json.loads(item) for item in raw]
+
+
+class _StoredProfile:
+    """Adapter so pstats.Stats can load stats unmarshalled from Redis."""
+
+    def __init__(self, stats):
+        self.stats = stats
+
+    def create_stats(self):
+        pass
+
+
+def load_stats(task_id, stream=None):
+    """pstats.Stats for a stored profile, or None if it expired or never existed."""
+    raw = get_redis_client().get(PROFILE_KEY.format(task_id=task_id))
+    if raw is None:
+        return None
+    return pstats.Stats(_StoredProfile(marshal.loads(raw)), stream=stream or io.StringIO())
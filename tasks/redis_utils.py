@@ -3,35 +3,347 @@ Redis utilities for Remixify.
 Uses the same Redis instance as Celery (Upstash).
 """
 import os
+import hashlib
+import json
+import threading
+import time
 import redis
 from decouple import config
 from django.conf import settings
+from redis.backoff import ExponentialBackoff
+from redis.retry import Retry
+
+_client = None
+_client_lock = threading.Lock()
 
 
 def get_redis_client():
-    """Get a Redis client using the same URL as Celery."""
-    redis_url = getattr(settings, 'CELERY_BROKER_URL', None) or \
-                os.environ.get('REDIS_URL') or \
-                config('REDIS_URL', default='redis://localhost:6379/0')
-    return redis.from_url(redis_url)
+    """
+    Get the process-wide Redis client, using the same URL as Celery.
+
+    Every caller shares one connection pool. Idle connections are health
+    checked before reuse (Upstash drops them), and commands that hit a
+    dropped connection or a timeout reconnect and retry with backoff. The
+    pool notices when it has been inherited by a forked worker process and
+    opens fresh connections there.
+    """
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                redis_url = getattr(settings, 'CELERY_BROKER_URL', None) or \
+                            os.environ.get('REDIS_URL') or \
+                            config('REDIS_URL', default='redis://localhost:6379/0')
+                pool = redis.ConnectionPool.from_url(
+                    redis_url,
+                    max_connections=getattr(settings, 'REDIS_MAX_CONNECTIONS', 50),
+                    health_check_interval=getattr(settings, 'REDIS_HEALTH_CHECK_INTERVAL', 30),
+                    socket_connect_timeout=5,
+                    socket_timeout=10,
+                    socket_keepalive=True,
+                    retry=Retry(ExponentialBackoff(cap=1, base=0.05), 3),
+                    retry_on_error=[redis.ConnectionError, redis.TimeoutError],
+                )
+                _client = redis.Redis(connection_pool=pool)
+    return _client
 
 
 PLAYLIST_COUNT_KEY = "remixify:playlist_count"
 
 
-def get_playlist_count():
+RECENT_PLAYLISTS_KEY = "remixify:recent_playlists"
+RECENT_PLAYLISTS_MAX = 20
+PLAYLIST_ARCHIVE_KEY = "remixify:playlist_archive"
+
+
+def record_created_playlist(playlist, archive=False):
+    """
+    Add a created playlist to the recent feed, increment the playlist count and
+    drop the cached homepage data, atomically in a single round-trip. The feed
+    is capped at RECENT_PLAYLISTS_MAX.
+    With `archive`, the playlist is also queued for the Postgres archive.
+    Returns (new_count, archive_queue_length); the length is None without `archive`.
+    """
+    entry = json.dumps(playlist)
+    pipe = get_redis_client().pipeline(transaction=True)
+    pipe.zadd(RECENT_PLAYLISTS_KEY, {entry: playlist["created_at"]})
+    pipe.zremrangebyrank(RECENT_PLAYLISTS_KEY, 0, -RECENT_PLAYLISTS_MAX - 1)
+    pipe.incr(PLAYLIST_COUNT_KEY)
+    if archive:
+        pipe.rpush(PLAYLIST_ARCHIVE_KEY, entry)
+    pipe.delete(HOMEPAGE_KEY)
+    results = pipe.execute()
+    return results[2], results[3] if archive else None
+
+
+def get_homepage_stats(limit=3):
+    """
+    Get (playlist_count, recent_playlists) in one round-trip.
+    """
+    pipe = get_redis_client().pipeline()
+    pipe.get(PLAYLIST_COUNT_KEY)
+    pipe.zrevrange(RECENT_PLAYLISTS_KEY, 0, limit - 1)
+    count, recent = pipe.execute()
+    return int(count) if count else 0, [json.loads(raw) for raw in recent]
+
+
+HOMEPAGE_KEY = "remixify:homepage"
+
+
+def get_cached_homepage():
+    """
+    Get the cached homepage data, or None if it expired or was invalidated.
+    """
+    raw = get_redis_client().get(HOMEPAGE_KEY)
+    return json.loads(raw) if raw is not None else None
+
+
+def cache_homepage(data, ttl):
+    """
+    Cache the homepage data for `ttl` seconds.
+    """
+    get_redis_client().set(HOMEPAGE_KEY, json.dumps(data), ex=ttl)
+
+
+def seed_recent_playlists(playlists):
+    """
+    Fill an empty recent feed (e.g. from the Postgres archive after a deploy).
+    """
+    if not playlists:
+        return
+    pipe = get_redis_client().pipeline(transaction=True)
+    pipe.zadd(RECENT_PLAYLISTS_KEY, {json.dumps(p): p["created_at"] for p in playlists}, nx=True)
+    pipe.zremrangebyrank(RECENT_PLAYLISTS_KEY, 0, -RECENT_PLAYLISTS_MAX - 1)
+    pipe.execute()
+
+
+def pop_playlist_archive_batch(size):
+    """
+    Take up to `size` queued playlists off the archive queue, oldest first.
+    """
+    pipe = get_redis_client().pipeline(transaction=True)
+    pipe.lrange(PLAYLIST_ARCHIVE_KEY, 0, size - 1)
+    pipe.ltrim(PLAYLIST_ARCHIVE_KEY, size, -1)
+    raw, _ = pipe.execute()
+    return [json.loads(item) for item in raw]
+
+
+def requeue_playlist_archive(playlists):
+    """
+    Put playlists that failed to archive back at the front of the queue.
+    """
+    if playlists:
+        get_redis_client().lpush(PLAYLIST_ARCHIVE_KEY, *[json.dumps(p) for p in reversed(playlists)])
+
+
+PLAYLIST_TRACKS_KEY = "remixify:playlist_tracks:{playlist_id}"
+PLAYLIST_TRACKS_TTL = 60 * 60 * 24
+
+
+def get_cached_playlist_tracks(playlist_id, snapshot_id):
+    """
+    Get the cached normalized track list for a playlist.
+    Returns None unless the cached copy was stored for the same snapshot_id.
+    """
+    client = get_redis_client()
+    raw = client.get(PLAYLIST_TRACKS_KEY.format(playlist_id=playlist_id))
+    if not raw:
+        return None
+    cached = json.loads(raw)
+    if cached.get("snapshot_id") != snapshot_id:
+        return None
+    return cached["tracks"]
+
+
+def cache_playlist_tracks(playlist_id, snapshot_id, tracks):
+    """
+    Cache the normalized track list for a playlist, tagged with its snapshot_id.
+    Any change to the playlist changes its snapshot_id, which invalidates the entry.
+    """
+    client = get_redis_client()
+    client.set(
+        PLAYLIST_TRACKS_KEY.format(playlist_id=playlist_id),
+        json.dumps({"snapshot_id": snapshot_id, "tracks": tracks}),
+        ex=PLAYLIST_TRACKS_TTL,
+    )
+
+
+CREATE_CHECKPOINT_KEY = "remixify:create_checkpoint:{task_id}"
+CREATE_CHECKPOINT_TTL = 60 * 60 * 24
+
+
+def get_create_checkpoint(task_id):
+    """
+    Get the saved progress of a playlist creation task as a dict of strings.
+    Returns an empty dict if the task has no checkpoint yet.
+    """
+    client = get_redis_client()
+    raw = client.hgetall(CREATE_CHECKPOINT_KEY.format(task_id=task_id))
+    return {k.decode(): v.decode() for k, v in raw.items()}
+
+
+def save_create_checkpoint(task_id, **fields):
+    """
+    Merge `fields` into a playlist creation task's checkpoint and refresh its TTL
+    in a single round-trip.
+    """
+    key = CREATE_CHECKPOINT_KEY.format(task_id=task_id)
+    pipe = get_redis_client().pipeline()
+    pipe.hset(key, mapping=fields)
+    pipe.expire(key, CREATE_CHECKPOINT_TTL)
+    pipe.execute()
+
+
+REMIX_INDEX_KEY = "remixify:remix_index:{selection_key}"
+REMIX_INDEX_TTL = 60 * 60 * 24 * 30
+
+
+def get_indexed_remix(selection_key):
+    """
+    Get the previously created playlist for an identical selection, or None.
+    """
+    client = get_redis_client()
+    raw = client.get(REMIX_INDEX_KEY.format(selection_key=selection_key))
+    return json.loads(raw) if raw else None
+
+
+def index_remix(selection_key, playlist):
+    """
+    Remember the playlist created for a selection so identical requests can reuse it.
+    """
+    client = get_redis_client()
+    client.set(REMIX_INDEX_KEY.format(selection_key=selection_key), json.dumps(playlist), ex=REMIX_INDEX_TTL)
+
+
+def forget_remix(selection_key):
+    """
+    Drop an index entry whose playlist no longer exists.
+    """
+    client = get_redis_client()
+    client.delete(REMIX_INDEX_KEY.format(selection_key=selection_key))
+
+
+PREVIEW_PROGRESS_KEY = "remixify:preview_progress:{task_id}"
+PREVIEW_PROGRESS_TTL = 60 * 60 * 2
+
+
+def reset_preview_progress(task_id):
+    """
+    Reset the shared track counter of a fanned-out preview task.
+    """
+    client = get_redis_client()
+    client.set(PREVIEW_PROGRESS_KEY.format(task_id=task_id), 0, ex=PREVIEW_PROGRESS_TTL)
+
+
+def incr_preview_progress(task_id, by=1):
+    """
+    Add to the number of tracks processed across all chunks of a preview task.
+    Returns the new total.
+    """
+    client = get_redis_client()
+    return client.incrby(PREVIEW_PROGRESS_KEY.format(task_id=task_id), by)
+
+
+PREVIEW_CANCEL_KEY = "remixify:preview_cancel:{task_id}"
+PREVIEW_HEARTBEAT_KEY = "remixify:preview_heartbeat:{task_id}"
+PREVIEW_SIGNAL_TTL = 60 * 60 * 2
+
+
+def cancel_preview(task_id):
+    """
+    Flag a preview task as cancelled; the task stops at its next check.
+    """
+    client = get_redis_client()
+    client.set(PREVIEW_CANCEL_KEY.format(task_id=task_id), 1, ex=PREVIEW_SIGNAL_TTL)
+
+
+def touch_preview_heartbeat(task_id):
+    """
+    Record that the front end is still polling a preview task.
+    """
+    client = get_redis_client()
+    client.set(PREVIEW_HEARTBEAT_KEY.format(task_id=task_id), time.time(), ex=PREVIEW_SIGNAL_TTL)
+
+
+def get_preview_signals(task_id):
+    """
+    Get (cancelled, last_heartbeat) for a preview task in one round-trip.
+    last_heartbeat is None if the front end never polled.
+    """
+    pipe = get_redis_client().pipeline()
+    pipe.exists(PREVIEW_CANCEL_KEY.format(task_id=task_id))
+    pipe.get(PREVIEW_HEARTBEAT_KEY.format(task_id=task_id))
+    cancelled, heartbeat = pipe.execute()
+    return bool(cancelled), float(heartbeat) if heartbeat else None
+
+
+SEARCH_RESULTS_KEY = "remixify:search:{digest}"
+SEARCH_RESULTS_TTL = 60 * 60 * 24
+
+
+def _search_key(query, limit):
+    digest = hashlib.sha1(f"{limit}:{query.lower()}".encode()).hexdigest()
+    return SEARCH_RESULTS_KEY.format(digest=digest)
+
+
+def get_cached_search(query, limit):
     """
-    Get the current playlist count from Redis.
+    Get the cached track items of a Spotify search, or None if it isn't cached.
     """
     client = get_redis_client()
-    count = client.get(PLAYLIST_COUNT_KEY)
-    return int(count) if count else 0
+    raw = client.get(_search_key(query, limit))
+    return json.loads(raw) if raw is not None else None
 
 
-def increment_playlist_count():
+def cache_search(query, limit, items):
     """
-    Increment the playlist count in Redis.
-    Returns the new count.
+    Cache the (trimmed) track items returned by a Spotify search.
     """
     client = get_redis_client()
-    return client.incr(PLAYLIST_COUNT_KEY)
+    client.set(_search_key(query, limit), json.dumps(items), ex=SEARCH_RESULTS_TTL)
+
+
+TRACK_METADATA_KEY = "remixify:track:{track_id}"
+TRACK_METADATA_TTL = 60 * 60 * 24 * 7
+
+
+def get_cached_tracks(track_ids):
+    """
+    Get cached track metadata for several track IDs in one round-trip.
+    Returns {track_id: track} for the IDs that are cached.
+    """
+    if not track_ids:
+        return {}
+    raw = get_redis_client().mget([TRACK_METADATA_KEY.format(track_id=track_id) for track_id in track_ids])
+    return {track_id: json.loads(item) for track_id, item in zip(track_ids, raw) if item is not None}
+
+
+def cache_tracks(tracks):
+    """
+    Cache track metadata (dicts with an "id") in one round-trip.
+    """
+    if not tracks:
+        return
+    pipe = get_redis_client().pipeline()
+    for track in tracks:
+        pipe.set(TRACK_METADATA_KEY.format(track_id=track["id"]), json.dumps(track), ex=TRACK_METADATA_TTL)
+    pipe.execute()
+
+
+ARTIST_INDEX_KEY = "remixify:artist_index:{artist_id}"
+ARTIST_INDEX_TTL = 60 * 60 * 24
+
+
+def get_cached_artist_index(artist_id):
+    """
+    Get an artist's cached remix index ({base_title: [items]}), or None.
+    """
+    raw = get_redis_client().get(ARTIST_INDEX_KEY.format(artist_id=artist_id))
+    return json.loads(raw) if raw is not None else None
+
+
+def cache_artist_index(artist_id, index):
+    """
+    Cache an artist's remix index built from a catalog crawl.
+    """
+    get_redis_client().set(ARTIST_INDEX_KEY.format(artist_id=artist_id), json.dumps(index), ex=ARTIST_INDEX_TTL)
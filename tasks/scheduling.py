@@ -0,0 +1,409 @@
+"""
+Fair-share scheduling for preview work.
+
+Three pieces keep one big playlist from starving everyone else:
+
+- Fanned-out chunk subtasks get a Celery priority from their position in the
+  playlist, so the first batch of every request runs before anyone's second
+  batch (round-robin over requests); small previews finish first.
+- RateBudget splits the Spotify call budget evenly between the requests that
+  are active in the current window, optionally capped further by
+  PREVIEW_MAX_RATE_SHARE.
+- Queue wait per request size is recorded in Redis so the effect is visible
+  (see the `preview_queue_stats` management command).
+
+Round-robin and small-jobs-first only apply to fanned-out previews
+(PREVIEW_FANOUT_ENABLED). Without fan-out, the default, each preview is a
+single task: workers take previews in arrival order, and the only fairness
+between running previews is their even share of the rate budget. A big
+playlist can't starve the others of Spotify calls, but it does hold its
+worker until it is done.
+
+Admission control (admit_preview) sits in front of all of this: views.preview
+refuses new previews when the queue is too deep or the estimated wait too long.
+"""
+import logging
+import threading
+import time
+from contextvars import ContextVar
+
+from django.conf import settings
+
+from tasks import accounting
+from tasks.redis_utils import get_redis_client, get_preview_signals
+
+logger = logging.getLogger(__name__)
+
+
+# Priority 0 is reserved for the preview parent tasks themselves, so new
+# requests get their playlist fetched (and small ones finished) straight away.
+def chunk_priority(chunk_index):
+    """Celery priority for the `chunk_index`-th chunk of a fanned-out preview (Redis: 0 is highest)."""
+    return min(1 + chunk_index, 9)
+
+
+RATE_WINDOW_SECONDS = 30  # Spotify enforces its limits over a rolling 30 second window
+RATE_KEY = "remixify:rate:{window}"
+RATE_REQUEST_KEY = "remixify:rate:{window}:{request_key}"
+RATE_ACTIVE_KEY = "remixify:rate:{window}:active"
+RATE_BATCH_SIZE = 5  # budget slots taken per Redis round-trip
+
+
+class RateBudget:
+    """
+    Shared Spotify call budget for preview work, split fairly between requests.
+
+    Calls are counted in fixed 30 second windows in Redis, so the budget holds
+    across every worker process. Each request may use at most its fair share
+    of the window: the budget divided by the number of requests active in it,
+    and never more than PREVIEW_MAX_RATE_SHARE of the whole. A request that
+    runs alone can use the full budget.
+
+    Slots are taken from Redis `batch_size` at a time and handed out locally,
+    so most calls cost no round-trip. Slots left over when a window ends (or
+    the task finishes) are simply not used.
+    """
+
+    def __init__(self, request_key, limit=None, max_share=None, batch_size=RATE_BATCH_SIZE):
+        self.request_key = request_key
+        self.limit = limit if limit is not None else getattr(settings, "SPOTIFY_RATE_BUDGET", 0)
+        self.max_share = max_share if max_share is not None else getattr(settings, "PREVIEW_MAX_RATE_SHARE", 1.0)
+        self.batch_size = batch_size
+        self.waited = 0.0
+        self._slots = 0
+        self._slots_window = None
+        self._lock = threading.Lock()
+
+    def _try_acquire(self, window, count):
+        """Take up to `count` calls from the current window. Returns how many fit in the budget."""
+        global_key = RATE_KEY.format(window=window)
+        request_key = RATE_REQUEST_KEY.format(window=window, request_key=self.request_key)
+        active_key = RATE_ACTIVE_KEY.format(window=window)
+
+        pipe = get_redis_client().pipeline()
+        pipe.incrby(global_key, count)
+        pipe.incrby(request_key, count)
+        pipe.sadd(active_key, self.request_key)
+        pipe.scard(active_key)
+        for key in (global_key, request_key, active_key):
+            pipe.expire(key, RATE_WINDOW_SECONDS * 2)
+        used, used_by_request, _, active = pipe.execute()[:4]
+
+        share = min(self.max_share, 1 / max(active, 1))
+        request_limit = max(1, int(self.limit * share))
+        granted = max(0, min(count, self.limit - (used - count), request_limit - (used_by_request - count)))
+        if granted < count:
+            # Give back what didn't fit so it doesn't count against anyone
+            pipe = get_redis_client().pipeline()
+            pipe.decrby(global_key, count - granted)
+            pipe.decrby(request_key, count - granted)
+            pipe.execute()
+        return granted
+
+    def _take_local_slot(self, window):
+        if self._slots and self._slots_window == window:
+            self._slots -= 1
+            return True
+        return False
+
+    def _take_slot(self, window):
+        """Take one call slot from this window, refilling from Redis if needed. Call with the lock held."""
+        if self._take_local_slot(window):
+            return True
+        try:
+            granted = self._try_acquire(window, self.batch_size)
+        except Exception as e:
+            logger.warning(f"Rate budget unavailable, continuing unthrottled: {type(e).__name__}: {str(e)[:100]}")
+            return True
+        if granted:
+            self._slots, self._slots_window = granted - 1, window
+            return True
+        return False
+
+    def acquire(self):
+        """Block until this request may make one more Spotify call.
+
+        Fails open: if Redis is unavailable, the call goes ahead unthrottled.
+        The lock is only held to take a slot, never while waiting, so other
+        threads (and try_acquire) aren't blocked for the rest of the window.
+        """
+        if not self.limit:
+            return
+        while True:
+            now = time.time()
+            window = int(now // RATE_WINDOW_SECONDS)
+            with self._lock:
+                if self._take_slot(window):
+                    return
+                # Over budget: wait for the next window
+                delay = (window + 1) * RATE_WINDOW_SECONDS - now
+                self.waited += delay
+            accounting.sleep(delay, reason="rate_budget")
+
+    def try_acquire(self):
+        """Take a call slot only if one is free right now. Never waits."""
+        if not self.limit:
+            return True
+        with self._lock:
+            return self._take_slot(int(time.time() // RATE_WINDOW_SECONDS))
+
+
+# The budget of the BudgetedSpotifyClient call in progress, for extra requests
+# (hedges) the Spotify client sends on that call's behalf
+_call_budget = ContextVar("rate_budget", default=None)
+
+
+def try_acquire_extra_call():
+    """Take a budget slot for an extra request made by the current call; True when it isn't budgeted."""
+    budget = _call_budget.get()
+    return budget is None or budget.try_acquire()
+
+
+class BudgetedSpotifyClient:
+    """Proxy around a Spotify client that takes a RateBudget slot before every call."""
+
+    def __init__(self, sp, budget):
+        self._sp = sp
+        self._budget = budget
+
+    def __getattr__(self, name):
+        method = getattr(self._sp, name)
+
+        def wrapper(*args, **kwargs):
+            self._budget.acquire()
+            token = _call_budget.set(self._budget)
+            try:
+                return method(*args, **kwargs)
+            finally:
+                _call_budget.reset(token)
+
+        return wrapper
+
+
+QUEUE_WAIT_KEY = "remixify:queue_wait"
+SIZE_BUCKETS = (50, 200, 1000)
+
+
+def size_bucket(total_tracks):
+    """Label for the request-size bucket a preview of `total_tracks` tracks falls in."""
+    for bound in SIZE_BUCKETS:
+        if total_tracks <= bound:
+            return f"<={bound}"
+    return f">{SIZE_BUCKETS[-1]}"
+
+
+def record_queue_wait(total_tracks, enqueued_at, started_at=None):
+    """Record how long a preview task (or chunk) sat in the queue, by request size."""
+    if not enqueued_at:
+        return
+    wait = max(0.0, (started_at or time.time()) - enqueued_at)
+    bucket = size_bucket(total_tracks)
+    try:
+        pipe = get_redis_client().pipeline()
+        pipe.hincrby(QUEUE_WAIT_KEY, f"{bucket}:count", 1)
+        pipe.hincrbyfloat(QUEUE_WAIT_KEY, f"{bucket}:seconds", wait)
+        pipe.execute()
+    except Exception as e:
+        logger.warning(f"Failed to record queue wait: {type(e).__name__}: {str(e)[:100]}")
+
+
+def get_queue_wait_stats():
+    """Return {bucket: {"count": n, "avg_seconds": s}} for every size bucket."""
+    raw = get_redis_client().hgetall(QUEUE_WAIT_KEY)
+    values = {k.decode(): float(v) for k, v in raw.items()}
+    stats = {}
+    for bucket in [size_bucket(bound) for bound in SIZE_BUCKETS] + [size_bucket(SIZE_BUCKETS[-1] + 1)]:
+        count = int(values.get(f"{bucket}:count", 0))
+        seconds = values.get(f"{bucket}:seconds", 0.0)
+        stats[bucket] = {"count": count, "avg_seconds": seconds / count if count else 0.0}
+    return stats
+
+
+PREVIEW_QUEUE_PRIORITY_STEPS = 10
+ADMITTED_WORK_KEY = "remixify:admitted_work"
+ADMITTED_AT_KEY = "remixify:admitted_at"
+ADMITTED_MAX_AGE = 60 * 60 * 2  # matches the broker visibility timeout
+CLIENT_RATE_KEY = "remixify:client_rate:{client}:{window}"
+CLIENT_RATE_WINDOW_SECONDS = 60
+# Rough Spotify calls per previewed track (2-3 searches, sometimes a canonical lookup)
+CALLS_PER_TRACK = 4
+UNTHROTTLED_CALLS_PER_SECOND = 5
+
+
+def _preview_queue_names():
+    from main.celery import PREVIEW_QUEUE
+
+    # Redis keeps one list per priority step: "preview", "preview:1", ... "preview:9"
+    return [PREVIEW_QUEUE] + [f"{PREVIEW_QUEUE}:{step}" for step in range(1, PREVIEW_QUEUE_PRIORITY_STEPS)]
+
+
+def check_client_rate(client):
+    """
+    Count a preview request against the client's per-minute limit.
+    Returns (allowed, retry_after_seconds).
+    """
+    limit = getattr(settings, "PREVIEW_CLIENT_RATE_LIMIT", 0)
+    if not limit:
+        return True, 0
+    now = time.time()
+    window = int(now // CLIENT_RATE_WINDOW_SECONDS)
+    key = CLIENT_RATE_KEY.format(client=client, window=window)
+    pipe = get_redis_client().pipeline()
+    pipe.incr(key)
+    pipe.expire(key, CLIENT_RATE_WINDOW_SECONDS)
+    count = pipe.execute()[0]
+    if count <= limit:
+        return True, 0
+    return False, int((window + 1) * CLIENT_RATE_WINDOW_SECONDS - now) + 1
+
+
+def admission_snapshot():
+    """
+    Read what admission control needs in one round-trip.
+
+    Returns a dict with "queue_depth" (preview messages waiting in the broker,
+    across all priority steps), "pending_tracks" (tracks admitted for preview
+    that haven't finished) and "rate_remaining" (Spotify calls left in the
+    current RateBudget window, or None when the budget is disabled).
+    Admitted entries older than ADMITTED_MAX_AGE are dropped.
+    """
+    client = get_redis_client()
+    names = _preview_queue_names()
+    limit = getattr(settings, "SPOTIFY_RATE_BUDGET", 0)
+    window = int(time.time() // RATE_WINDOW_SECONDS)
+    pipe = client.pipeline()
+    for name in names:
+        pipe.llen(name)
+    pipe.hgetall(ADMITTED_WORK_KEY)
+    pipe.zrangebyscore(ADMITTED_AT_KEY, 0, time.time() - ADMITTED_MAX_AGE)
+    pipe.get(RATE_KEY.format(window=window))
+    *lengths, admitted, stale, used = pipe.execute()
+
+    if stale:
+        pipe = client.pipeline()
+        pipe.hdel(ADMITTED_WORK_KEY, *stale)
+        pipe.zrem(ADMITTED_AT_KEY, *stale)
+        pipe.execute()
+    stale = set(stale)
+    return {
+        "queue_depth": sum(lengths),
+        "pending_tracks": sum(int(n) for task_id, n in admitted.items() if task_id not in stale),
+        "rate_remaining": max(0, limit - int(used or 0)) if limit else None,
+    }
+
+
+def _calls_per_second():
+    limit = getattr(settings, "SPOTIFY_RATE_BUDGET", 0)
+    return limit / RATE_WINDOW_SECONDS if limit else UNTHROTTLED_CALLS_PER_SECOND
+
+
+def _seconds_for(tracks, snapshot):
+    calls = tracks * CALLS_PER_TRACK
+    if snapshot["rate_remaining"] is not None:
+        calls = max(0, calls - snapshot["rate_remaining"])
+    return int(calls / _calls_per_second())
+
+
+def backlog_wait(snapshot=None):
+    """Estimate seconds until the previews already admitted are done, i.e. the wait before a new one starts."""
+    snapshot = snapshot or admission_snapshot()
+    return _seconds_for(snapshot["pending_tracks"], snapshot)
+
+
+def estimate_wait(total_tracks, snapshot=None):
+    """
+    Estimate seconds until a new preview of `total_tracks` tracks would finish,
+    from the work already admitted and the Spotify rate budget.
+    """
+    snapshot = snapshot or admission_snapshot()
+    return _seconds_for(snapshot["pending_tracks"] + total_tracks, snapshot)
+
+
+def admit_preview(task_id, total_tracks):
+    """
+    Decide whether a new preview can be queued.
+
+    Returns a dict with "admitted", "reason" ("too_large" or "busy" when not
+    admitted), "queue_position" and "estimated_wait" (seconds until the
+    preview would finish). Busy-ness is judged by the backlog ahead of the
+    request only; the request's own size is checked against
+    PREVIEW_MAX_TRACKS, so a large playlist is never reported as "busy" on an
+    idle system. Admitted previews are registered as pending work until
+    release_preview is called for them.
+    """
+    max_tracks = getattr(settings, "PREVIEW_MAX_TRACKS", 0)
+    if max_tracks and total_tracks > max_tracks:
+        return {"admitted": False, "reason": "too_large", "queue_position": None, "estimated_wait": None}
+
+    snapshot = admission_snapshot()
+    depth = snapshot["queue_depth"]
+    decision = {
+        "admitted": True,
+        "reason": None,
+        "queue_position": depth + 1,
+        "estimated_wait": estimate_wait(total_tracks, snapshot),
+    }
+
+    max_depth = getattr(settings, "PREVIEW_MAX_QUEUE_DEPTH", 0)
+    max_wait = getattr(settings, "PREVIEW_MAX_ESTIMATED_WAIT", 0)
+    backlog = backlog_wait(snapshot)
+    if (max_depth and depth >= max_depth) or (max_wait and backlog > max_wait):
+        decision["admitted"] = False
+        decision["reason"] = "busy"
+        decision["retry_after"] = backlog
+        return decision
+
+    pipe = get_redis_client().pipeline()
+    pipe.hset(ADMITTED_WORK_KEY, task_id, total_tracks)
+    pipe.zadd(ADMITTED_AT_KEY, {task_id: time.time()})
+    pipe.execute()
+    return decision
+
+
+def release_preview(task_id):
+    """Remove a finished (or failed) preview from the admitted work."""
+    try:
+        pipe = get_redis_client().pipeline()
+        pipe.hdel(ADMITTED_WORK_KEY, task_id)
+        pipe.zrem(ADMITTED_AT_KEY, task_id)
+        pipe.execute()
+    except Exception as e:
+        logger.warning(f"Failed to release preview {task_id}: {type(e).__name__}: {str(e)[:100]}")
+
+
+class PreviewCancellation:
+    """
+    Cooperative cancellation for a preview task.
+
+    The task loop calls should_stop() between tracks. It turns True once the
+    front end cancels the preview, or stops polling for longer than
+    PREVIEW_ABANDON_AFTER seconds. Redis is consulted at most once per
+    CHECK_INTERVAL, so calling it per track stays cheap.
+    """
+    CHECK_INTERVAL = 1.0
+
+    def __init__(self, task_id):
+        self.task_id = task_id
+        self.abandon_after = getattr(settings, "PREVIEW_ABANDON_AFTER", 60)
+        self.reason = None
+        self._checked_at = 0.0
+
+    def should_stop(self):
+        if self.reason:
+            return True
+        now = time.time()
+        if now - self._checked_at < self.CHECK_INTERVAL:
+            return False
+        self._checked_at = now
+
+        try:
+            cancelled, heartbeat = get_preview_signals(self.task_id)
+        except Exception as e:
+            logger.warning(f"Cancellation check failed for {self.task_id}: {type(e).__name__}: {str(e)[:100]}")
+            return False
+
+        if cancelled:
+            self.reason = "cancelled"
+        elif heartbeat and self.abandon_after and now - heartbeat > self.abandon_after:
+            self.reason = "abandoned"
+        return self.reason is not None
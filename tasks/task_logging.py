@@ -0,0 +1,145 @@
+"""
+Low-overhead logging for the track-processing hot loop.
+
+Per-track and per-search messages go through detail(), which never formats
+eagerly. Inside a task decorated with logged_task:
+
+- every detail record is kept unformatted in a small in-memory ring buffer,
+  which is only formatted and logged if the task fails;
+- a sample of tasks (LOG_DETAIL_SAMPLE_RATE) also logs its detail records
+  as they happen;
+- one summary record is logged when the task finishes.
+
+TaskContextFilter adds the current task ID to every record, and
+JsonFormatter renders records as one JSON object per line (LOG_FORMAT=json).
+This module is loaded by the LOGGING config, so it must not import models.
+"""
+import json
+import logging
+import random
+import time
+from collections import deque
+from contextvars import ContextVar
+from functools import wraps
+
+from celery.exceptions import Ignore, Retry
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+_task_log = ContextVar("remixify_task_log", default=None)
+
+# Attributes every LogRecord has; anything else was passed in `extra`
+_RECORD_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime"}
+
+
+class TaskLog:
+    """Detail records of one task run, kept unformatted until needed."""
+
+    def __init__(self, task_id, task_name, sampled, size):
+        self.task_id = task_id
+        self.task_name = task_name
+        self.sampled = sampled
+        self.records = deque(maxlen=size)
+
+
+def detail(log, msg, *args):
+    """Log a per-track/per-search detail message (lazy %-style args).
+
+    Outside a task this is a plain debug record.
+    """
+    task_log = _task_log.get()
+    if task_log is None:
+        log.debug(msg, *args)
+        return
+    task_log.records.append((time.time(), log.name, msg, args))
+    if task_log.sampled:
+        log.info(msg, *args)
+
+
+def flush_details(task_log, reason):
+    """Format and log a task's buffered detail records as one record."""
+    lines = []
+    for created, name, msg, args in task_log.records:
+        try:
+            text = msg % args if args else msg
+        except Exception:
+            text = f"{msg} {args!r}"
+        lines.append(f"{time.strftime('%H:%M:%S', time.localtime(created))} {name} {text}")
+    logger.warning(
+        "%s %s %s; last %d detail records:\n%s",
+        task_log.task_name, task_log.task_id, reason, len(lines), "\n".join(lines),
+        extra={"details": lines},
+    )
+
+
+def _summary(result):
+    """Fields of a task result worth putting in its summary record."""
+    if not isinstance(result, dict):
+        return {}
+    return {key: result[key] for key in ("total_tracks", "cancelled", "track_count", "usage") if key in result}
+
+
+def logged_task(func):
+    """Decorator for bound Celery tasks: detail ring buffer, sampling and one summary record."""
+    @wraps(func)
+    def wrapper(self, *args, **kwargs):
+        sample_rate = getattr(settings, "LOG_DETAIL_SAMPLE_RATE", 0.0)
+        size = getattr(settings, "LOG_RING_BUFFER_SIZE", 200)
+        task_log = TaskLog(self.request.id, self.name, random.random() < sample_rate, size)
+        token = _task_log.set(task_log)
+        started = time.perf_counter()
+        outcome, result = "failed", None
+        try:
+            result = func(self, *args, **kwargs)
+            outcome = "succeeded"
+            return result
+        except Ignore:
+            # self.replace(): the task continues as a chord
+            outcome = "replaced"
+            raise
+        except Retry:
+            outcome = "retrying"
+            flush_details(task_log, "is retrying")
+            raise
+        except BaseException:
+            flush_details(task_log, "failed")
+            raise
+        finally:
+            _task_log.reset(token)
+            duration = time.perf_counter() - started
+            summary = {"task": self.name, "outcome": outcome, "duration": round(duration, 3), **_summary(result)}
+            logger.info(
+                "%s %s %s in %.2fs %s",
+                self.name, self.request.id, outcome, duration, json.dumps(_summary(result), default=str),
+                extra={"summary": summary},
+            )
+    return wrapper
+
+
+class TaskContextFilter(logging.Filter):
+    """Adds `task_id` (or None) to every record, from the task being run."""
+
+    def filter(self, record):
+        task_log = _task_log.get()
+        record.task_id = task_log.task_id if task_log is not None else None
+        return True
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per record, including any `extra` fields."""
+
+    def format(self, record):
+        entry = {
+            "ts": round(record.created, 3),
+            "level": record.levelname,
+            "logger": record.name,
+            "process": record.process,
+            "message": record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRS and key not in entry:
+                entry[key] = value
+        if record.exc_info:
+            entry["exc_info"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
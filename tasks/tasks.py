@@ -1,12 +1,53 @@
-from celery import shared_task
+from celery import shared_task, chord
+from celery.exceptions import Ignore
+from celery.utils.time import get_exponential_backoff_interval
 import re
+import json
 import logging
+import time
+import requests
+import threading
+from collections import Counter, deque
+from datetime import datetime, timezone
+from contextvars import copy_context
+from concurrent.futures import ThreadPoolExecutor
+from itertools import chain, islice
 from difflib import SequenceMatcher
-from celery_progress.backend import ProgressRecorder
-from tasks.helpers import chunker, get_playlist_id
+from celery_progress.backend import ProgressRecorder, PROGRESS_STATE
+from django.conf import settings
+from spotipy.exceptions import SpotifyException
+from tasks.helpers import chunker, get_playlist_id, prefetch, selection_key
+from tasks import accounting, metrics, profiling, task_logging, tracing
 from tasks.models import CreatedPlaylist
-from tasks.redis_utils import increment_playlist_count
-from authentication.oauth import get_spotify_client
+from tasks.redis_utils import (
+    record_created_playlist,
+    pop_playlist_archive_batch,
+    requeue_playlist_archive,
+    get_cached_playlist_tracks,
+    cache_playlist_tracks,
+    get_create_checkpoint,
+    save_create_checkpoint,
+    get_indexed_remix,
+    index_remix,
+    forget_remix,
+    incr_preview_progress,
+    reset_preview_progress,
+    get_cached_search,
+    cache_search,
+    get_cached_tracks,
+    cache_tracks,
+    get_cached_artist_index,
+    cache_artist_index,
+)
+from tasks.scheduling import (
+    BudgetedSpotifyClient,
+    PreviewCancellation,
+    RateBudget,
+    chunk_priority,
+    record_queue_wait,
+    release_preview,
+)
+from authentication.oauth import get_shared_spotify_client, get_spotify_client, response_status
 
 logger = logging.getLogger(__name__)
 
@@ -399,11 +440,102 @@ def get_confidence_level(score):
         return "medium"  # Only scores >= 40 reach here (low scores filtered out)
 
 
-def get_playlist(url):
-    """Fetch playlist tracks from Spotify"""
-    from spotipy.exceptions import SpotifyException
-    
-    logger.info(f"get_playlist called with URL: {url}")
+# Only request the fields we actually read; full track objects are several times larger.
+PLAYLIST_PAGE_SIZE = 100
+PLAYLIST_PAGE_WORKERS = 4
+PLAYLIST_TRACK_FIELDS = "track(id,name,artists(id,name),album(images),preview_url,external_urls)"
+PLAYLIST_DETAILS_FIELDS = "snapshot_id,name,images,owner(display_name),tracks(total)"
+PLAYLIST_PAGE_FIELDS = f"items({PLAYLIST_TRACK_FIELDS})"
+# How many normalized tracks ingestion may buffer ahead of the candidate search.
+TRACK_QUEUE_SIZE = 200
+# Very large playlists aren't worth holding in Redis; they're re-fetched every time.
+PLAYLIST_CACHE_MAX_TRACKS = 5000
+# Spotify's largest search page; used for searches shared by several tracks.
+SHARED_ARTIST_SEARCH_LIMIT = 50
+# Coalesced progress updates are still sent at least this often (seconds).
+PROGRESS_HEARTBEAT = 5.0
+# The update carrying the early result is kept as the task state for at least
+# this long (seconds), a few of the front end's 500ms polls, before the next
+# update replaces it.
+EARLY_RESULT_HOLD = 2.0
+
+
+def normalize_playlist_item(item):
+    """Convert a raw playlist item into the track record used by the preview pipeline.
+
+    Returns None for local files, removed tracks and podcast episodes.
+    """
+    track = item.get("track")
+    if track is None or not track.get("id") or not track.get("external_urls"):
+        return None
+
+    name = track["name"]
+    return {
+        "id": track["id"],
+        "original_name": name,
+        "clean_name": normalize_title(name),
+        "artists": [artist["name"] for artist in track.get("artists", [])],
+        "artist_ids": [artist.get("id") for artist in track.get("artists", [])],
+        "album_art": track["album"]["images"][0]["url"] if track.get("album", {}).get("images") else None,
+        "preview_url": track.get("preview_url"),
+        "spotify_url": track["external_urls"].get("spotify", "")
+    }
+
+
+def iter_playlist_pages(playlist_id, total, start_offset):
+    """Yield the playlist item pages from `start_offset` to `total`, in playlist order.
+
+    Offsets are known up front from `total`, so pages are fetched concurrently
+    instead of walking `next` links. At most PLAYLIST_PAGE_WORKERS pages are in
+    flight or buffered at a time. Each worker thread gets its own client because
+    RotatingSpotifyClient keeps per-instance state.
+    """
+    offsets = iter(range(start_offset, total, PLAYLIST_PAGE_SIZE))
+    local = threading.local()
+
+    def fetch(offset):
+        client = getattr(local, "sp", None)
+        if client is None:
+            client = local.sp = get_spotify_client()
+        with metrics.timer("preview_stage_duration_seconds", stage="playlist_page"):
+            page = client.playlist_items(
+                playlist_id,
+                fields=PLAYLIST_PAGE_FIELDS,
+                limit=PLAYLIST_PAGE_SIZE,
+                offset=offset,
+                additional_types=("track",),
+            )
+        return page.get("items") or []
+
+    with ThreadPoolExecutor(max_workers=PLAYLIST_PAGE_WORKERS) as pool:
+        # Each fetch runs in a copy of this context so its spans join the task's trace
+        pending = deque(
+            pool.submit(copy_context().run, fetch, offset) for offset in islice(offsets, PLAYLIST_PAGE_WORKERS)
+        )
+        while pending:
+            items = pending.popleft().result()
+            next_offset = next(offsets, None)
+            if next_offset is not None:
+                pending.append(pool.submit(copy_context().run, fetch, next_offset))
+            yield items
+
+
+def iter_playlist_tracks(pages):
+    """Normalize playlist items page by page, so raw Spotify dicts are dropped as soon as they're converted."""
+    for page in pages:
+        for item in page:
+            track = normalize_playlist_item(item)
+            if track is not None:
+                yield track
+
+
+def get_playlist_details(url, sp=None):
+    """Fetch only the playlist's metadata: name, image, owner, snapshot_id and track total.
+
+    This is a single small request, so callers that don't need the track list
+    (like create_remix_playlist) should use it instead of get_playlist.
+    """
+    logger.info(f"get_playlist_details called with URL: {url}")
     
     playlist_id = get_playlist_id(url)
     
@@ -414,21 +546,20 @@ def get_playlist(url):
         logger.warning(f"Spotify-generated playlist detected: {playlist_id}")
         raise ValueError("Spotify-generated playlists (like Daily Mix, Discover Weekly, or artist \"This Is\" playlists) aren't accessible via the API. Please use a playlist you or someone else created.")
     
-    logger.info(f"About to get Spotify client...")
-    try:
-        sp = get_spotify_client()
-        logger.info(f"Spotify client obtained successfully")
-    except Exception as e:
-        logger.error(f"Failed to get Spotify client: {type(e).__name__}: {str(e)}")
-        raise
-    track_details = {}
-    tracks = []
-    items = []
+    if sp is None:
+        logger.info(f"About to get Spotify client...")
+        try:
+            sp = get_spotify_client()
+            logger.info(f"Spotify client obtained successfully")
+        except Exception as e:
+            logger.error(f"Failed to get Spotify client: {type(e).__name__}: {str(e)}")
+            raise
     
     try:
-        logger.info(f"Fetching playlist data from Spotify API...")
-        data = sp.playlist(playlist_id)
-        logger.info(f"Playlist data fetched successfully: {data.get('name', 'Unknown')}")
+        logger.info(f"Fetching playlist details from Spotify API...")
+        with metrics.timer("preview_stage_duration_seconds", stage="playlist_details"):
+            data = sp.playlist(playlist_id, fields=PLAYLIST_DETAILS_FIELDS)
+        logger.info(f"Playlist details fetched successfully: {data.get('name', 'Unknown')}")
     except SpotifyException as e:
         logger.error(f"SpotifyException for playlist {playlist_id}: {e.http_status} - {str(e)}")
         if e.http_status == 404:
@@ -445,65 +576,244 @@ def get_playlist(url):
         logger.error(f"Unexpected error fetching playlist {playlist_id}: {str(e)}", exc_info=True)
         raise ValueError("Unable to load this playlist. Please try again.")
     
-    track_details["playlist_name"] = data["name"]
-    track_details["playlist_image"] = data["images"][0]["url"] if data["images"] else None
-    track_details["playlist_owner"] = data["owner"]["display_name"]
-    items += data["tracks"]["items"]
-    next_page = data["tracks"]["next"]
-    results = data["tracks"]
-
-    while next_page is not None:
-        results = sp.next(results)
-        items.extend(results["items"])
-        next_page = results.get("next")
-
-    for item in items:
-        track = item["track"]
-        if track is None or not track.get("id") or not track.get("external_urls"):
-            continue
-            
-        name = track["name"]
-        clean_name = normalize_title(name)
-        
-        artists = [artist["name"] for artist in track.get("artists", [])]
-        tracks.append({
-            "id": track["id"],
-            "original_name": name,
-            "clean_name": clean_name,
-            "artists": artists,
-            "album_art": track["album"]["images"][0]["url"] if track.get("album", {}).get("images") else None,
-            "preview_url": track.get("preview_url"),
-            "spotify_url": track["external_urls"].get("spotify", "")
-        })
+    return {
+        "playlist_id": playlist_id,
+        "snapshot_id": data.get("snapshot_id"),
+        "playlist_name": data["name"],
+        "playlist_image": data["images"][0]["url"] if data["images"] else None,
+        "playlist_owner": data["owner"]["display_name"],
+        "total_tracks": data["tracks"]["total"],
+    }
+
+
+# Spotify's multi-get endpoint accepts up to 50 track IDs per call.
+TRACKS_BATCH_SIZE = 50
+
+
+def track_metadata(t):
+    """The fields of a Spotify track object used for manual curation."""
+    return {
+        "id": t.get("id"),
+        "name": t.get("name") or "",
+        "artists": [a.get("name", "") for a in (t.get("artists") or []) if a.get("name")],
+        "album_art": ((t.get("album") or {}).get("images") or [{}])[0].get("url"),
+        "preview_url": t.get("preview_url"),
+        "spotify_url": (t.get("external_urls") or {}).get("spotify", ""),
+        "duration_ms": t.get("duration_ms"),
+        "type": "track",
+    }
+
+
+def resolve_tracks(track_ids, sp=None):
+    """Resolve Spotify track IDs to metadata. Returns {track_id: track} for the IDs found.
+
+    IDs are deduplicated; cached tracks come from Redis and the rest are
+    fetched TRACKS_BATCH_SIZE at a time with the multi-ID tracks endpoint.
+    """
+    track_ids = list(dict.fromkeys(track_ids))
+    try:
+        resolved = get_cached_tracks(track_ids)
+    except Exception as e:
+        logger.warning(f"Track metadata cache lookup failed: {type(e).__name__}: {str(e)[:100]}")
+        resolved = {}
+    misses = [track_id for track_id in track_ids if track_id not in resolved]
+    metrics.inc("cache_requests_total", len(resolved), cache="track_metadata", result="hit")
+    metrics.inc("cache_requests_total", len(misses), cache="track_metadata", result="miss")
+    if not misses:
+        return resolved
+
+    sp = sp or get_shared_spotify_client()
+    fetched = []
+    for batch in chunker(misses, TRACKS_BATCH_SIZE):
+        # Unknown IDs come back as None
+        fetched.extend(track_metadata(t) for t in sp.tracks(batch)["tracks"] if t and t.get("id"))
+    try:
+        cache_tracks(fetched)
+    except Exception as e:
+        logger.warning(f"Failed to cache track metadata: {type(e).__name__}: {str(e)[:100]}")
+    resolved.update((track["id"], track) for track in fetched)
+    return resolved
+
+
+def cache_tracks_when_complete(tracks, playlist_id, snapshot_id):
+    """Pass `tracks` through, caching the full list under `snapshot_id` once the stream is exhausted."""
+    seen = []
+    for track in tracks:
+        seen.append(track)
+        yield track
+
+    try:
+        cache_playlist_tracks(playlist_id, snapshot_id, seen)
+    except Exception as e:
+        logger.warning(f"Failed to cache playlist {playlist_id}: {type(e).__name__}: {str(e)[:100]}")
+
+
+def get_playlist(url):
+    """Fetch playlist details from Spotify and return a lazy stream of its tracks.
+
+    Returns (track_details, tracks, sp). Details come from a cheap metadata
+    request, so access errors surface here. If the playlist's snapshot_id
+    matches the cached copy, tracks are served from the cache; otherwise pages
+    are only downloaded while `tracks` is being iterated and the cache is
+    refreshed once the stream is consumed. track_details["total_tracks"] is the
+    raw item count, an upper bound on how many tracks the stream yields.
+    """
+    logger.info(f"get_playlist called with URL: {url}")
+    
+    logger.info(f"About to get Spotify client...")
+    try:
+        sp = get_spotify_client()
+        logger.info(f"Spotify client obtained successfully")
+    except Exception as e:
+        logger.error(f"Failed to get Spotify client: {type(e).__name__}: {str(e)}")
+        raise
+    
+    track_details = get_playlist_details(url, sp)
+    playlist_id = track_details["playlist_id"]
+    snapshot_id = track_details["snapshot_id"]
+
+    try:
+        cached = get_cached_playlist_tracks(playlist_id, snapshot_id)
+    except Exception as e:
+        logger.warning(f"Playlist cache lookup failed for {playlist_id}: {type(e).__name__}: {str(e)[:100]}")
+        cached = None
+    metrics.inc("cache_requests_total", cache="playlist_tracks", result="miss" if cached is None else "hit")
+    accounting.record_cache("playlist_tracks", hit=cached is not None)
+    if cached is not None:
+        logger.info(f"Playlist cache hit for {playlist_id} at snapshot {snapshot_id}")
+        return track_details, iter(cached), sp
+
+    tracks = iter_playlist_tracks(iter_playlist_pages(playlist_id, track_details["total_tracks"], 0))
+    if snapshot_id and track_details["total_tracks"] <= PLAYLIST_CACHE_MAX_TRACKS:
+        tracks = cache_tracks_when_complete(tracks, playlist_id, snapshot_id)
     
     return track_details, tracks, sp
 
 
-def find_remix_candidates(sp, track, num_candidates=3, original_track_id=None):
-    """Search for remix candidates for a single track."""
+def trim_search_item(item):
+    """Keep only the fields of a search result item that candidate matching uses."""
+    return {
+        "id": item["id"],
+        "name": item["name"],
+        "artists": [{"name": a["name"]} for a in item.get("artists", [])],
+        "album": {"images": item.get("album", {}).get("images", [])[:1]},
+        "preview_url": item.get("preview_url"),
+        "external_urls": item.get("external_urls", {}),
+        "duration_ms": item.get("duration_ms"),
+    }
+
+
+# Words that mark a track title as a version (remix, edit, ...) of another track.
+VERSION_HINT_WORDS = (
+    "remix",
+    "remixed",
+    "rmx",
+    "edit",
+    "rework",
+    "bootleg",
+    "flip",
+    "mix",
+    "version",
+    "extended",
+    "club",
+    "radio",
+    "dub",
+    "vip",
+)
+
+
+def is_versioned(title):
+    title = title.lower()
+    return any(w in title for w in VERSION_HINT_WORDS)
+
+
+def lookup_search(query, limit):
+    """Track items of a cached Spotify search, or None if it isn't cached."""
+    tracing.annotate(query=query)
+    try:
+        items = get_cached_search(query, limit)
+    except Exception as e:
+        logger.warning(f"Search cache lookup failed: {type(e).__name__}: {str(e)[:100]}")
+        items = None
+    metrics.inc("cache_requests_total", cache="search", result="miss" if items is None else "hit")
+    accounting.record_cache("search", hit=items is not None)
+    tracing.annotate(cached=items is not None)
+    return items
+
+
+def send_search(sp, query, limit):
+    """Send a Spotify track search and cache its trimmed items. Returns the items, or None if it failed."""
+    try:
+        with metrics.timer("preview_stage_duration_seconds", stage="search"):
+            results = sp.search(query, type="track", limit=limit)
+    except Exception as e:
+        logger.warning(f"Search failed: {type(e).__name__}: {str(e)[:100]}")
+        return None
+    items = [trim_search_item(item) for item in (results.get("tracks") or {}).get("items") or [] if item]
+    try:
+        cache_search(query, limit, items)
+    except Exception as e:
+        logger.warning(f"Search cache write failed: {type(e).__name__}: {str(e)[:100]}")
+    return items
+
+
+@tracing.traced("find_remix_candidates")
+def find_remix_candidates(
+    sp,
+    track,
+    num_candidates=3,
+    original_track_id=None,
+    max_queries=None,
+    cache_only=False,
+    search_info=None,
+    shared_items=None,
+    catalog_items=None,
+):
+    """Search for remix candidates for a single track.
+
+    Search responses are cached in Redis, so repeated searches are free.
+    `max_queries` caps the number of uncached searches sent to Spotify and
+    `cache_only` sends none at all; either can leave the search incomplete.
+    If `search_info` is given it is filled with "answered" (searches that got
+    results, cached or not) and "complete" (whether every planned search ran).
+    `shared_items` are search results fetched for several tracks at once (see
+    SearchSharing); they are scored first, and if they already give confident
+    candidates the track's own searches are skipped. `catalog_items` (the
+    title's entries in a crawled artist catalog index, possibly empty) are
+    authoritative instead: they are the only items scored and nothing is
+    searched.
+    """
     track_name = track.get("original_name", "Unknown")
-    logger.info(f"find_remix_candidates START: {track_name}")
+    task_logging.detail(logger, "find_remix_candidates START: %s", track_name)
+    tracing.annotate(track=track_name, max_queries=max_queries, cache_only=cache_only)
     
     candidates = []
     seen_ids = set()
     if original_track_id:
         seen_ids.add(original_track_id)
-    version_hint_words = [
-        "remix",
-        "remixed",
-        "rmx",
-        "edit",
-        "rework",
-        "bootleg",
-        "flip",
-        "mix",
-        "version",
-        "extended",
-        "club",
-        "radio",
-        "dub",
-        "vip",
-    ]
+    if search_info is None:
+        search_info = {}
+    search_info.update(answered=0, complete=True)
+    sent_queries = 0
+
+    @tracing.traced("search")
+    def search(query, limit, allow_sending=True):
+        """Cached sp.search returning the track items, or None if the search was skipped or failed."""
+        nonlocal sent_queries
+        items = lookup_search(query, limit)
+        if items is None:
+            if cache_only or not allow_sending or (max_queries is not None and sent_queries >= max_queries):
+                search_info["complete"] = False
+                return None
+            if sent_queries:
+                accounting.sleep(0.2, reason="search_spacing")
+            sent_queries += 1
+            items = send_search(sp, query, limit)
+            if items is None:
+                search_info["complete"] = False
+                return None
+        search_info["answered"] += 1
+        return items
 
     base_title = normalize_title(track.get("original_name") or track.get("clean_name") or "")
     primary_artist = (track.get("artists") or [""])[0]
@@ -512,8 +822,9 @@ def find_remix_candidates(sp, track, num_candidates=3, original_track_id=None):
         logger.warning(f"Skipping track with empty base_title: {track.get('original_name', 'Unknown')}")
         return []
     original_name_lc = (track.get("original_name") or "").lower()
-    original_already_versioned = any(w in original_name_lc for w in version_hint_words)
+    original_already_versioned = is_versioned(original_name_lc)
 
+    @tracing.traced("resolve_canonical_track_id")
     def resolve_canonical_track_id(title: str, artist: str) -> tuple[str | None, str]:
         """Best-effort resolve of the canonical/original track for a versioned source.
 
@@ -524,12 +835,8 @@ def find_remix_candidates(sp, track, num_candidates=3, original_track_id=None):
             return None, title
 
         query = f"track:{title} artist:{artist}"
-        try:
-            res = sp.search(query, type="track", limit=20)
-        except Exception:
-            return None, title
-
-        items = (res.get("tracks") or {}).get("items") or []
+        # With a query cap, the cap goes to remix searches; the lookup only runs from cache.
+        items = search(query, 20, allow_sending=max_queries is None)
         if not items:
             return None, title
 
@@ -548,8 +855,9 @@ def find_remix_candidates(sp, track, num_candidates=3, original_track_id=None):
     # Reverse lookup: attempt to use the canonical/original track as the search seed.
     search_seed_title = base_title
     canonical_track_id = None
-    if original_already_versioned:
-        canonical_track_id, canonical_title = resolve_canonical_track_id(base_title, primary_artist)
+    if original_already_versioned and catalog_items is None:
+        with metrics.timer("preview_stage_duration_seconds", stage="canonical_resolution"):
+            canonical_track_id, canonical_title = resolve_canonical_track_id(base_title, primary_artist)
         if canonical_title:
             search_seed_title = canonical_title
         if canonical_track_id:
@@ -570,18 +878,10 @@ def find_remix_candidates(sp, track, num_candidates=3, original_track_id=None):
             ]
         )
     
-    import time as time_module
-    for query_idx, query in enumerate(search_queries):
-        if not query.strip():
-            logger.warning(f"Skipping empty query for track: {track_name}")
-            continue
-        if query_idx > 0:
-            time_module.sleep(0.2)
+    def score(items):
+        scoring_started = time.perf_counter()
         try:
-            logger.info(f"Starting search: {query[:50]}...")
-            results = sp.search(query, type="track", limit=10)
-            logger.info(f"Search completed, got {len(results.get('tracks', {}).get('items', []))} results")
-            for item in results["tracks"]["items"]:
+            for item in items:
                 if item["id"] in seen_ids:
                     continue
                     
@@ -606,44 +906,567 @@ def find_remix_candidates(sp, track, num_candidates=3, original_track_id=None):
                         "match_reasons": reasons,
                         "duration_ms": item["duration_ms"]
                     })
-
-            high_confidence_found = any(c["confidence"] >= 70 for c in candidates)
-            if high_confidence_found and len(candidates) >= num_candidates:
-                break
-                
         except Exception as e:
-            logger.warning(f"Search failed: {type(e).__name__}: {str(e)[:100]}")
+            logger.warning(f"Matching search results failed: {type(e).__name__}: {str(e)[:100]}")
+        metrics.observe("preview_stage_duration_seconds", time.perf_counter() - scoring_started, stage="scoring")
+
+    def confident():
+        return any(c["confidence"] >= 70 for c in candidates) and len(candidates) >= num_candidates
+
+    if catalog_items is not None:
+        # The artist's whole catalog was crawled: a title missing from it has no remixes
+        score(catalog_items)
+        search_queries = []
+        metrics.inc("preview_search_sharing_total", kind="catalog")
+    elif shared_items:
+        score(shared_items)
+        if confident():
+            search_queries = []
+            metrics.inc("preview_search_sharing_total", kind="shared_results")
+
+    for query in search_queries:
+        if not query.strip():
+            logger.warning(f"Skipping empty query for track: {track_name}")
+            continue
+        task_logging.detail(logger, "Starting search: %.50s...", query)
+        items = search(query, 10)
+        if items is None:
+            continue
+        task_logging.detail(logger, "Search completed, got %d results", len(items))
+        score(items)
+
+        if confident():
+            # Confident enough: the remaining searches are not needed
+            search_info["complete"] = True
+            break
 
     candidates = [c for c in candidates if c["confidence"] >= 40]
     candidates.sort(key=lambda x: x["confidence"], reverse=True)
-    logger.info(f"find_remix_candidates END: {track_name} - found {len(candidates[:num_candidates])} candidates")
+    task_logging.detail(logger, "find_remix_candidates END: %s - found %d candidates", track_name, len(candidates[:num_candidates]))
     return candidates[:num_candidates]
 
 
-@shared_task(bind=True)
-def preview_remixes(self, url):
-    """Find remix candidates for all tracks and return for user review."""
-    from spotipy.exceptions import SpotifyException
+def build_track_result(track, candidates):
+    """Build the per-track preview entry shown in the selection UI."""
+    return {
+        "original": {
+            "id": track.get("id"),
+            "name": track["original_name"],
+            "artists": track["artists"],
+            "album_art": track["album_art"],
+            "spotify_url": track["spotify_url"]
+        },
+        "candidates": candidates,
+        "best_match": candidates[0] if candidates else None,
+        "has_high_confidence": any(c["confidence_level"] == "high" for c in candidates)
+    }
+
+
+# Catalog crawl limits: releases per artist, and the albums multi-get's batch size.
+CATALOG_MAX_ALBUMS = 200
+ALBUMS_BATCH_SIZE = 20
+
+
+@tracing.traced("build_artist_index")
+def build_artist_index(sp, artist_id):
+    """Index an artist's versioned tracks (remixes, edits, ...) by normalized base title.
+
+    Crawls the artist's albums, singles and "appears on" releases once: the
+    release list is paged 50 at a time, then the releases are fetched
+    ALBUMS_BATCH_SIZE at a time with their track lists. Only tracks that
+    credit the artist are indexed. Items have the search item shape, so
+    they can be scored like search results. Albums with more than 50
+    tracks only contribute their first 50.
+    """
+    metrics.inc("artist_catalog_crawls_total")
+    album_ids = []
+    while len(album_ids) < CATALOG_MAX_ALBUMS:
+        page = sp.artist_albums(artist_id, include_groups="album,single,appears_on", limit=50, offset=len(album_ids))
+        album_ids.extend(album["id"] for album in page.get("items") or [] if album and album.get("id"))
+        if not page.get("next") or not page.get("items"):
+            break
+    album_ids = list(dict.fromkeys(album_ids))[:CATALOG_MAX_ALBUMS]
+
+    index = {}
+    seen = set()
+    for batch in chunker(album_ids, ALBUMS_BATCH_SIZE):
+        for album in sp.albums(batch).get("albums") or []:
+            if not album:
+                continue
+            images = (album.get("images") or [])[:1]
+            for item in (album.get("tracks") or {}).get("items") or []:
+                if not item or not item.get("id") or item["id"] in seen or not is_versioned(item.get("name") or ""):
+                    continue
+                if artist_id not in {a.get("id") for a in item.get("artists") or []}:
+                    continue
+                seen.add(item["id"])
+                index.setdefault(normalize_title(item["name"]), []).append(
+                    trim_search_item(dict(item, album={"images": images}))
+                )
+    return index
+
+
+def get_artist_index(sp, artist_id):
+    """An artist's remix index, from the Redis cache or a fresh catalog crawl."""
+    try:
+        index = get_cached_artist_index(artist_id)
+    except Exception as e:
+        logger.warning(f"Artist index cache lookup failed: {type(e).__name__}: {str(e)[:100]}")
+        index = None
+    metrics.inc("cache_requests_total", cache="artist_index", result="miss" if index is None else "hit")
+    accounting.record_cache("artist_index", hit=index is not None)
+    if index is not None:
+        return index
+    index = build_artist_index(sp, artist_id)
+    try:
+        cache_artist_index(artist_id, index)
+    except Exception as e:
+        logger.warning(f"Artist index cache write failed: {type(e).__name__}: {str(e)[:100]}")
+    return index
+
+
+class SearchSharing:
+    """Search work shared between the tracks of one preview.
+
+    Tracks with the same title and artists (duplicates in the playlist) are
+    searched once and reuse the first one's candidates. For the others,
+    sources() plans how the track's primary artist is covered, by how many
+    of the preview's tracks are by that artist:
+
+    - PREVIEW_CATALOG_MIN_TRACKS or more: the artist's catalog is crawled
+      once into a remix index (see build_artist_index), and each track is
+      answered from the index entries for its title alone, without searches.
+      If the crawl fails, the artist's tracks fall back to the rules below;
+    - PREVIEW_SHARED_ARTIST_MIN_TRACKS or more: one broader
+      "{artist} remix" search is sent for all of the artist's tracks and
+      scored before each track's own searches;
+    - fewer: nothing is shared.
+
+    Artist counts come from plan() for the tracks known up front (the whole
+    chunk, or the first page of a streamed playlist); tracks that arrive
+    later are counted as they come.
+    """
+
+    def __init__(self, sp):
+        self.sp = sp
+        self.min_artist_tracks = getattr(settings, "PREVIEW_SHARED_ARTIST_MIN_TRACKS", 3)
+        self.min_catalog_tracks = getattr(settings, "PREVIEW_CATALOG_MIN_TRACKS", 8)
+        self._candidates = {}
+        self._planned = Counter()
+        self._artist_tracks = Counter()
+        self._artist_items = {}
+        self._indexes = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def track_key(track):
+        title = " ".join((track.get("original_name") or "").lower().split())
+        return title, tuple(normalize_artist(a) for a in track.get("artists") or [])
+
+    @staticmethod
+    def artist_key(track):
+        return normalize_artist((track.get("artists") or [""])[0])
+
+    def plan(self, tracks):
+        """Count the tracks per artist up front, so the first tracks of a heavy artist share work too."""
+        self._planned.update(key for key in map(self.artist_key, tracks) if key)
+
+    def known_candidates(self, track):
+        """Candidates already found for an identical track, or None."""
+        with self._lock:
+            candidates = self._candidates.get(self.track_key(track))
+        if candidates is None:
+            return None
+        metrics.inc("preview_search_sharing_total", kind="duplicate")
+        # The same song can appear under several IDs; never offer a track as its own remix
+        return [c for c in candidates if c["id"] != track.get("id")]
+
+    def remember(self, track, candidates):
+        with self._lock:
+            self._candidates.setdefault(self.track_key(track), candidates)
+
+    def sources(self, track):
+        """(catalog_items, shared_items) for the track's find_remix_candidates call.
+
+        catalog_items is a list (possibly empty) when the track's artist was
+        crawled, and None otherwise; shared_items is None when nothing is shared.
+        """
+        key = self.artist_key(track)
+        if not key:
+            return None, None
+        with self._lock:
+            self._artist_tracks[key] += 1
+            count = max(self._artist_tracks[key], self._planned[key])
+
+        artist_id = (track.get("artist_ids") or [None])[0]
+        if artist_id and self.min_catalog_tracks and count >= self.min_catalog_tracks:
+            index = self.artist_index(artist_id)
+            if index is not None:
+                title = track.get("clean_name") or normalize_title(track.get("original_name") or "")
+                return index.get(title, []), None
+        if self.min_artist_tracks and count >= self.min_artist_tracks:
+            return None, self.artist_items(key, (track.get("artists") or [""])[0])
+        return None, None
+
+    def artist_index(self, artist_id):
+        """The artist's remix index, or None if the crawl failed (the tracks fall back to search)."""
+        with self._lock:
+            if artist_id not in self._indexes:
+                try:
+                    self._indexes[artist_id] = get_artist_index(self.sp, artist_id)
+                except Exception as e:
+                    logger.warning(f"Catalog crawl failed for artist {artist_id}: {type(e).__name__}: {str(e)[:100]}")
+                    self._indexes[artist_id] = None
+            return self._indexes[artist_id]
+
+    def artist_items(self, key, artist):
+        """Results of the shared "{artist} remix" search."""
+        with self._lock:
+            if key not in self._artist_items:
+                query = f"{artist} remix"
+                items = lookup_search(query, SHARED_ARTIST_SEARCH_LIMIT)
+                if items is None:
+                    items = send_search(self.sp, query, SHARED_ARTIST_SEARCH_LIMIT)
+                # A failed search isn't retried for every track of the artist
+                self._artist_items[key] = items or []
+            return self._artist_items[key]
+
+
+def search_track(sp, track, index, total_tracks, sharing=None):
+    """Search one track for remix candidates. Returns (track_result, failed)."""
+    try:
+        task_logging.detail(logger, "Processing track %d/%d: %.50s", index + 1, total_tracks, track.get("original_name", "Unknown"))
+        candidates = sharing.known_candidates(track) if sharing else None
+        if candidates is None:
+            catalog_items, shared_items = sharing.sources(track) if sharing else (None, None)
+            candidates = find_remix_candidates(
+                sp,
+                track,
+                original_track_id=track.get("id"),
+                shared_items=shared_items,
+                catalog_items=catalog_items,
+            )
+            if sharing:
+                sharing.remember(track, candidates)
+        metrics.inc("preview_tracks_processed_total")
+        accounting.record_tracks()
+        return build_track_result(track, candidates), False
+    except Exception as e:
+        logger.warning(f"Track {index} failed: {type(e).__name__}: {str(e)[:100]}")
+        return build_track_result(track, []), True
+
+
+# Deadline mode searches in passes, cheapest first: answers already in the
+# search cache, then one high-yield query per track, then the full search.
+DEADLINE_PASSES = (
+    {"cache_only": True},
+    {"max_queries": 1},
+    {},
+)
+
+
+def search_tracks_until(sp, tracks, deadline, should_stop=None, on_progress=None):
+    """Search `tracks` in passes of increasing depth until `deadline` (a time.time() value).
+
+    Returns one track result per track, in playlist order, each with a
+    "search_depth" of "full", "partial" (some searches were skipped) or "none"
+    (not searched before the deadline). `on_progress` is called with the
+    number of tracks that have at least a partial result.
+    """
+    results = [None] * len(tracks)
+    searched = 0
+
+    def out_of_time():
+        return time.time() >= deadline or (should_stop is not None and should_stop())
+
+    for options in DEADLINE_PASSES:
+        for i, track in enumerate(tracks):
+            if results[i] is not None and results[i]["search_depth"] == "full":
+                continue
+            if out_of_time():
+                break
+            info = {}
+            try:
+                candidates = find_remix_candidates(
+                    sp, track, original_track_id=track.get("id"), search_info=info, **options
+                )
+            except Exception as e:
+                logger.warning(f"Track {i} failed: {type(e).__name__}: {str(e)[:100]}")
+                continue
+            if not info["answered"] and not info["complete"]:
+                continue
+            if results[i] is None:
+                metrics.inc("preview_tracks_processed_total")
+                accounting.record_tracks()
+                searched += 1
+                if on_progress is not None:
+                    on_progress(searched)
+            results[i] = build_track_result(track, candidates)
+            results[i]["search_depth"] = "full" if info["complete"] else "partial"
+
+    for i, track in enumerate(tracks):
+        if results[i] is None:
+            results[i] = build_track_result(track, [])
+            results[i]["search_depth"] = "none"
+    return results
+
+
+def summarize_preview(track_results):
+    """Count tracks by the confidence level of their best candidate."""
+    high_confidence_count = 0
+    medium_confidence_count = 0
+    low_confidence_count = 0
+    no_match_count = 0
     
-    logger.info(f"========================================")
-    logger.info(f"Starting preview_remixes task")
-    logger.info(f"URL: {url}")
-    logger.info(f"Task ID: {self.request.id}")
-    logger.info(f"========================================")
+    for track_result in track_results:
+        candidates = track_result["candidates"]
+        if candidates:
+            best_level = candidates[0]["confidence_level"]
+            if best_level == "high":
+                high_confidence_count += 1
+            elif best_level == "medium":
+                medium_confidence_count += 1
+            else:
+                low_confidence_count += 1
+        else:
+            no_match_count += 1
+    
+    return {
+        "high_confidence": high_confidence_count,
+        "medium_confidence": medium_confidence_count,
+        "low_confidence": low_confidence_count,
+        "no_match": no_match_count
+    }
+
+
+def playlist_error(e):
+    """Map a SpotifyException raised while loading a playlist to a user-facing ValueError."""
+    if e.http_status == 404:
+        return ValueError("This playlist is private or doesn't exist. Please use a public playlist.")
+    elif e.http_status == 429:
+        return ValueError("Too many requests. Please try again in a moment.")
+    else:
+        return ValueError("Unable to load this playlist. Please check the link and try again.")
+
+
+def should_fan_out(total_tracks):
+    """Whether a preview of `total_tracks` tracks is split into chunk subtasks."""
+    return (
+        getattr(settings, "PREVIEW_FANOUT_ENABLED", False)
+        and total_tracks >= getattr(settings, "PREVIEW_FANOUT_MIN_TRACKS", 200)
+    )
+
+
+class CoalescingProgressRecorder(ProgressRecorder):
+    """ProgressRecorder that writes at most one progress update per interval.
+
+    Every update is a Redis write of the task state, so per-track updates are
+    coalesced: one is sent only once PREVIEW_PROGRESS_INTERVAL seconds have
+    passed and the percentage has moved by PREVIEW_PROGRESS_MIN_PERCENT (or
+    PROGRESS_HEARTBEAT seconds have passed, so slow previews still tick). The
+    first and the final update (current == total) are always sent, and
+    flush() sends the latest dropped one. Safe to update from several threads.
+    """
+
+    def __init__(self, task):
+        super().__init__(task)
+        self.interval = getattr(settings, "PREVIEW_PROGRESS_INTERVAL", 0.5)
+        self.min_percent = getattr(settings, "PREVIEW_PROGRESS_MIN_PERCENT", 1)
+        self._lock = threading.Lock()
+        self._sent_at = None
+        self._sent_percent = 0
+
+    def _due(self, current, total):
+        if self._sent_at is None or current >= total:
+            return True
+        elapsed = time.monotonic() - self._sent_at
+        if elapsed >= PROGRESS_HEARTBEAT:
+            return True
+        return elapsed >= self.interval and 100 * current / total - self._sent_percent >= self.min_percent
+
+    def _sent(self, current, total):
+        self._sent_at = time.monotonic()
+        self._sent_percent = 100 * current / total if total else 0
+
+
+class ParentProgressRecorder(CoalescingProgressRecorder):
+    """Report a fan-out subtask's progress on its parent preview task.
+
+    All chunks of a preview share one Redis counter, so the parent's PROGRESS
+    state always shows the combined count and the existing progress bar keeps
+    working unchanged. Increments are batched into the counter along with the
+    state updates; call flush() when the chunk is done.
+    """
+
+    def __init__(self, task, parent_id, total):
+        super().__init__(task)
+        self.parent_id = parent_id
+        self.total = total
+        self.current = 0
+        self._unsent = 0
+
+    def increment_progress(self, by=1, description=""):
+        with self._lock:
+            self._unsent += by
+            # self.current is the combined count as of the last update
+            if not self._due(self.current + self._unsent, self.total):
+                return None
+            return self._send(description)
+
+    def flush(self):
+        with self._lock:
+            if self._unsent:
+                return self._send()
+        return None
+
+    def _send(self, description=""):
+        self.current = incr_preview_progress(self.parent_id, self._unsent)
+        self._unsent = 0
+        percent = float(round(100 * self.current / self.total, 2)) if self.total else 0
+        meta = {
+            "pending": False,
+            "current": self.current,
+            "total": self.total,
+            "percent": percent,
+            "description": description
+        }
+        self.task.update_state(task_id=self.parent_id, state=PROGRESS_STATE, meta=meta)
+        self._sent(self.current, self.total)
+        return PROGRESS_STATE, meta
+
+
+class PreviewProgressRecorder(CoalescingProgressRecorder):
+    """Coalescing ProgressRecorder that also carries an early preview result in the PROGRESS meta.
+
+    The early result can be a whole screen of tracks, so it goes out once: the
+    update after `early_result` is set is always sent and carries it, and later
+    updates leave it out. That update stays the task state for EARLY_RESULT_HOLD
+    seconds (unless the preview finishes first) so a polling client sees it; a
+    client that misses it anyway just waits for the full results.
+    """
+
+    def __init__(self, task):
+        super().__init__(task)
+        self._early_result = None
+        self._early_result_sent = True
+        self._hold_until = 0
+        self._pending = None
+
+    @property
+    def early_result(self):
+        return self._early_result
+
+    @early_result.setter
+    def early_result(self, result):
+        with self._lock:
+            self._early_result = result
+            self._early_result_sent = False
+
+    def set_progress(self, current, total, description=""):
+        with self._lock:
+            if self._early_result_sent and not self._due(current, total):
+                self._pending = (current, total, description)
+                return None
+            return self._send(current, total, description)
+
+    def flush(self):
+        with self._lock:
+            if self._pending is not None:
+                return self._send(*self._pending)
+        return None
+
+    def _due(self, current, total):
+        if current < total and time.monotonic() < self._hold_until:
+            return False
+        return super()._due(current, total)
+
+    def _send(self, current, total, description):
+        self._pending = None
+        if self._early_result_sent:
+            state, meta = super().set_progress(current, total, description)
+        else:
+            percent = float(round(100 * current / total, 2)) if total else 0
+            meta = {
+                "pending": False,
+                "current": current,
+                "total": total,
+                "percent": percent,
+                "description": description,
+                "early_result": self._early_result
+            }
+            state = PROGRESS_STATE
+            self.task.update_state(state=state, meta=meta)
+            self._early_result_sent = True
+            self._hold_until = time.monotonic() + EARLY_RESULT_HOLD
+        self._sent(current, total)
+        return state, meta
+
+
+def quick_track_results(sp, tracks):
+    """Quick first pass for the tracks on the first screen: cached answers or one query each.
+
+    These results are only shown until the full search replaces them; it
+    reuses the cached query where it can, and the final results are unchanged.
+    """
+    results = []
+    for track in tracks:
+        try:
+            candidates = find_remix_candidates(sp, track, original_track_id=track.get("id"), max_queries=1)
+        except Exception as e:
+            logger.warning(f"Quick pass failed for {track.get('original_name', 'Unknown')[:50]}: {type(e).__name__}: {str(e)[:100]}")
+            candidates = []
+        results.append(build_track_result(track, candidates))
+    return results
+
+
+# Previews only read from Spotify, so redelivering one after a worker dies is safe.
+@shared_task(bind=True, acks_late=True, reject_on_worker_lost=True)
+@tracing.traced_task
+@profiling.profiled_task
+@task_logging.logged_task
+@accounting.accounted_task
+def preview_remixes(self, url, enqueued_at=None, latency_budget=None, track_ids=None):
+    """Find remix candidates for all tracks and return for user review.
+
+    With a `latency_budget` (seconds), the task returns best-effort results
+    by then instead of searching every track in full (see search_tracks_until).
+    Tracks that weren't fully searched are listed in "incomplete_track_ids";
+    passing those back as `track_ids` runs a follow-up pass over just them.
+
+    Large playlists can be fanned out (see should_fan_out): the task replaces
+    itself with a chord of find_remix_candidates_chunk subtasks whose callback,
+    merge_preview_chunks, stores the final result under this task's ID.
+    Chunks are prioritized by position so requests are served round-robin,
+    and all Spotify searches draw from a fair-share RateBudget.
+
+    However the run ends, the preview is released from admission control
+    (see release_preview); after a fan-out, merge_preview_chunks does it.
+    """
+    replaced = False
+    try:
+        return _preview_remixes(self, url, enqueued_at, latency_budget, track_ids)
+    except Ignore:
+        # Replaced by the chord of chunk subtasks, which is still running
+        replaced = True
+        raise
+    finally:
+        if not replaced:
+            release_preview(self.request.id)
+
+
+def _preview_remixes(self, url, enqueued_at, latency_budget, track_ids):
+    started_at = time.time()
+    logger.info("Starting preview_remixes task %s for %s", self.request.id, url)
     
     try:
-        logger.info(f"Creating ProgressRecorder...")
-        progress_recorder = ProgressRecorder(self)
-        logger.info(f"ProgressRecorder created successfully")
+        progress_recorder = PreviewProgressRecorder(self)
         
-        logger.info(f"Calling get_playlist...")
-        playlist_info, tracks, sp = get_playlist(url)
-        logger.info(f"get_playlist returned successfully")
+        with tracing.span("get_playlist"):
+            playlist_info, tracks, sp = get_playlist(url)
         
-        total_tracks = len(tracks)
-        logger.info(f"Playlist ingested successfully")
-        logger.info(f"Playlist name: {playlist_info['playlist_name']}")
-        logger.info(f"Total tracks: {total_tracks}")
+        total_tracks = playlist_info["total_tracks"]
+        logger.info("Playlist ingestion started: %s (%d tracks)", playlist_info["playlist_name"], total_tracks)
+        record_queue_wait(total_tracks, enqueued_at, started_at)
         
         preview_results = {
             "playlist_name": playlist_info["playlist_name"],
@@ -651,63 +1474,127 @@ def preview_remixes(self, url):
             "total_tracks": total_tracks,
             "tracks": []
         }
+
+        if track_ids:
+            wanted = set(track_ids)
+            tracks = (track for track in tracks if track["id"] in wanted)
+            total_tracks = len(wanted)
+
+        fan_out = not latency_budget and should_fan_out(total_tracks)
+        if fan_out or latency_budget:
+            tracks = list(tracks)
+            total_tracks = len(tracks)
     except ValueError as e:
         logger.error(f"ValueError in get_playlist: {str(e)}")
         raise
     except SpotifyException as e:
         logger.error(f"SpotifyException in preview_remixes: {e.http_status} - {str(e)}", exc_info=True)
-        if e.http_status == 404:
-            raise ValueError("This playlist is private or doesn't exist. Please use a public playlist.")
-        elif e.http_status == 429:
-            raise ValueError("Too many requests. Please try again in a moment.")
-        else:
-            raise ValueError("Unable to load this playlist. Please check the link and try again.")
+        raise playlist_error(e)
     except Exception as e:
         logger.error(f"Unexpected exception in preview_remixes: {type(e).__name__}: {str(e)}", exc_info=True)
         raise ValueError("Something went wrong. Please try again.")
 
-    results_dict = {}
+    if fan_out and total_tracks:
+        chunk_size = getattr(settings, "PREVIEW_FANOUT_CHUNK_SIZE", 50)
+        header = [
+            find_remix_candidates_chunk.s(
+                tracks[offset:offset + chunk_size], offset, self.request.id, total_tracks, enqueued_at=time.time()
+            ).set(priority=chunk_priority(index))
+            for index, offset in enumerate(range(0, total_tracks, chunk_size))
+        ]
+        logger.info(f"Fanning out {total_tracks} tracks into {len(header)} chunks of {chunk_size}")
+        reset_preview_progress(self.request.id)
+        progress_recorder.set_progress(0, total_tracks)
+        # What loading the playlist cost; merge_preview_chunks adds the chunks' usage
+        preview_results["usage"] = accounting.current_usage()
+        return self.replace(chord(header, merge_preview_chunks.s(preview_results)))
+
+    if latency_budget:
+        cancellation = PreviewCancellation(self.request.id)
+        track_results = search_tracks_until(
+            BudgetedSpotifyClient(get_spotify_client(), RateBudget(self.request.id)),
+            tracks,
+            started_at + latency_budget,
+            should_stop=cancellation.should_stop,
+            on_progress=lambda searched: progress_recorder.set_progress(searched, total_tracks),
+        )
+        preview_results["tracks"] = track_results
+        preview_results["total_tracks"] = total_tracks
+        preview_results["incomplete_track_ids"] = [
+            result["original"]["id"] for result in track_results if result["search_depth"] != "full"
+        ]
+        if cancellation.reason:
+            preview_results["cancelled"] = True
+        preview_results["summary"] = summarize_preview(track_results)
+        progress_recorder.set_progress(total_tracks, total_tracks)
+        logger.info(
+            "preview_remixes complete (deadline %ss): total_tracks=%s incomplete=%s",
+            latency_budget,
+            total_tracks,
+            len(preview_results["incomplete_track_ids"]),
+        )
+        return preview_results
+
     completed_count = 0
     failed_count = 0
     
-    logger.info("Starting track processing")
-    logger.info(f"Processing {total_tracks} tracks...")
+    logger.info("Processing %d tracks...", total_tracks)
 
-    sp_search = get_spotify_client()
-    for i, track in enumerate(tracks):
-        try:
-            logger.info(f"Processing track {i+1}/{total_tracks}: {track.get('original_name', 'Unknown')[:50]}")
-            candidates = find_remix_candidates(sp_search, track, original_track_id=track.get("id"))
-            results_dict[i] = {
-                "original": {
-                    "name": track["original_name"],
-                    "artists": track["artists"],
-                    "album_art": track["album_art"],
-                    "spotify_url": track["spotify_url"]
-                },
-                "candidates": candidates,
-                "best_match": candidates[0] if candidates else None,
-                "has_high_confidence": any(c["confidence_level"] == "high" for c in candidates)
-            }
-        except Exception as e:
-            logger.warning(f"Track {i} failed: {type(e).__name__}: {str(e)[:100]}")
-            failed_count += 1
-            results_dict[i] = {
-                "original": {
-                    "name": track["original_name"],
-                    "artists": track["artists"],
-                    "album_art": track["album_art"],
-                    "spotify_url": track["spotify_url"]
-                },
-                "candidates": [],
-                "best_match": None,
-                "has_high_confidence": False
-            }
-        
-        completed_count += 1
-        if completed_count % 10 == 0 or completed_count == 1:
-            logger.info(f"Progress update: {completed_count}/{total_tracks} tracks processed")
-        progress_recorder.set_progress(completed_count, total_tracks)
+    # Remaining playlist pages download in the background while earlier tracks are searched.
+    sp_search = BudgetedSpotifyClient(get_spotify_client(), RateBudget(self.request.id))
+    sharing = SearchSharing(sp_search)
+    cancellation = PreviewCancellation(self.request.id)
+    try:
+        stream = prefetch(tracks, maxsize=TRACK_QUEUE_SIZE)
+        # Plan shared work from the first page before searching anything, so a
+        # heavy artist's first tracks already use the catalog or shared search
+        first_page = list(islice(stream, PLAYLIST_PAGE_SIZE))
+        sharing.plan(first_page)
+        stream = chain(first_page, stream)
+        viewport = getattr(settings, "PREVIEW_VIEWPORT_TRACKS", 0)
+        if viewport and total_tracks > viewport:
+            # Show the first screen early, then backfill it and the rest with full searches
+            first_screen = list(islice(stream, viewport))
+            early_tracks = quick_track_results(sp_search, first_screen)
+            progress_recorder.early_result = dict(
+                preview_results, tracks=early_tracks, summary=summarize_preview(early_tracks)
+            )
+            progress_recorder.set_progress(0, total_tracks)
+            stream = chain(first_screen, stream)
+        for i, track in enumerate(stream):
+            if cancellation.should_stop():
+                logger.info(f"Preview {self.request.id} {cancellation.reason} after {completed_count} tracks, returning partial results")
+                break
+            track_result, failed = search_track(sp_search, track, i, total_tracks, sharing)
+            preview_results["tracks"].append(track_result)
+            failed_count += failed
+            
+            completed_count += 1
+            if completed_count % 10 == 0 or completed_count == 1:
+                task_logging.detail(logger, "Progress update: %d/%d tracks processed", completed_count, total_tracks)
+            progress_recorder.set_progress(completed_count, total_tracks)
+    # Later playlist pages are fetched inside this loop, so a page can fail after
+    # tracks were searched. The preview fails as a whole: partial results are
+    # only returned for a deliberate stop (cancelled/abandoned), never for errors.
+    except SpotifyException as e:
+        logger.error(f"SpotifyException while streaming playlist: {e.http_status} - {str(e)}", exc_info=True)
+        raise playlist_error(e)
+    except Exception as e:
+        logger.error(
+            f"Unexpected exception while streaming playlist after {completed_count} tracks: "
+            f"{type(e).__name__}: {str(e)}",
+            exc_info=True,
+        )
+        raise ValueError("Something went wrong. Please try again.")
+
+    if cancellation.reason:
+        preview_results["cancelled"] = True
+        preview_results["playlist_total_tracks"] = total_tracks
+
+    # Removed and local tracks are skipped by the stream, so the final count can be below the raw total.
+    total_tracks = completed_count
+    preview_results["total_tracks"] = total_tracks
+    progress_recorder.set_progress(completed_count, total_tracks)
 
     logger.info(
         "preview_remixes complete: total_tracks=%s processed=%s failed=%s",
@@ -715,100 +1602,330 @@ def preview_remixes(self, url):
         completed_count,
         failed_count,
     )
-
-    for i in range(total_tracks):
-        preview_results["tracks"].append(results_dict[i])
-    
-    high_confidence_count = 0
-    medium_confidence_count = 0
-    low_confidence_count = 0
-    no_match_count = 0
     
-    for track_result in preview_results["tracks"]:
-        candidates = track_result["candidates"]
-        if candidates:
-            best_level = candidates[0]["confidence_level"]
-            if best_level == "high":
-                high_confidence_count += 1
-            elif best_level == "medium":
-                medium_confidence_count += 1
-            else:
-                low_confidence_count += 1
-        else:
-            no_match_count += 1
-    
-    preview_results["summary"] = {
-        "high_confidence": high_confidence_count,
-        "medium_confidence": medium_confidence_count,
-        "low_confidence": low_confidence_count,
-        "no_match": no_match_count
-    }
+    with metrics.timer("preview_stage_duration_seconds", stage="assembly"):
+        preview_results["summary"] = summarize_preview(preview_results["tracks"])
     
     return preview_results
 
 
+@shared_task(bind=True, acks_late=True, reject_on_worker_lost=True)
+@task_logging.logged_task
+@accounting.accounted_task
+def find_remix_candidates_chunk(self, tracks, offset, parent_id, total_tracks, enqueued_at=None):
+    """Fan-out subtask: search one chunk of a playlist for remix candidates.
+
+    `offset` is the chunk's position in the playlist so the chord callback can
+    restore playlist order. Searches share the parent request's RateBudget.
+    """
+    record_queue_wait(total_tracks, enqueued_at)
+    progress_recorder = ParentProgressRecorder(self, parent_id, total_tracks)
+    sp = BudgetedSpotifyClient(get_spotify_client(), RateBudget(parent_id))
+    sharing = SearchSharing(sp)
+    sharing.plan(tracks)
+    cancellation = PreviewCancellation(parent_id)
+    results = []
+    failed_count = 0
+
+    # Chunks join the parent preview's trace
+    with tracing.trace(parent_id, "find_remix_candidates_chunk", offset=offset):
+        for i, track in enumerate(tracks, start=offset):
+            if cancellation.should_stop():
+                logger.info(f"Preview {parent_id} {cancellation.reason}, chunk at offset {offset} stopping early")
+                break
+            track_result, failed = search_track(sp, track, i, total_tracks, sharing)
+            results.append(track_result)
+            failed_count += failed
+            progress_recorder.increment_progress()
+        progress_recorder.flush()
+
+    return {"offset": offset, "tracks": results, "failed": failed_count, "cancelled": bool(cancellation.reason)}
+
+
 @shared_task(bind=True)
+@tracing.traced_task
+@task_logging.logged_task
+@accounting.accounted_task
+def merge_preview_chunks(self, chunk_results, preview_results):
+    """Chord callback: stitch chunk results back into playlist order and summarize.
+
+    Runs under the original preview task's ID, so the front end picks it up
+    like any other preview result.
+    """
+    release_preview(self.request.id)
+    with metrics.timer("preview_stage_duration_seconds", stage="assembly"):
+        for chunk in sorted(chunk_results, key=lambda c: c["offset"]):
+            preview_results["tracks"].extend(chunk["tracks"])
+
+        if any(c.get("cancelled") for c in chunk_results):
+            preview_results["cancelled"] = True
+            preview_results["playlist_total_tracks"] = preview_results["total_tracks"]
+
+        preview_results["total_tracks"] = len(preview_results["tracks"])
+        preview_results["summary"] = summarize_preview(preview_results["tracks"])
+        preview_results["usage"] = accounting.merge_usage(
+            preview_results.get("usage"), *[c.get("usage") for c in chunk_results]
+        )
+
+    logger.info(
+        "preview_remixes complete (fan-out): total_tracks=%s chunks=%s failed=%s",
+        preview_results["total_tracks"],
+        len(chunk_results),
+        sum(c["failed"] for c in chunk_results),
+    )
+    return preview_results
+
+
+def archive_created_playlists(batch_size=None):
+    """Write queued created playlists to Postgres, one bulk INSERT per batch.
+
+    Returns the number of playlists archived. A batch that fails to insert
+    goes back on the queue.
+    """
+    batch_size = batch_size or getattr(settings, "PLAYLIST_ARCHIVE_BATCH_SIZE", 20)
+    archived = 0
+    while True:
+        batch = pop_playlist_archive_batch(batch_size)
+        if not batch:
+            break
+        try:
+            CreatedPlaylist.objects.bulk_create([
+                CreatedPlaylist(
+                    name=p["name"][:255],
+                    spotify_url=p["url"],
+                    image_url=p["image"],
+                    track_count=p["track_count"],
+                    original_author=(p["original_author"] or "")[:100],
+                    created_at=datetime.fromtimestamp(p["created_at"], tz=timezone.utc),
+                )
+                for p in batch
+            ])
+        except Exception:
+            requeue_playlist_archive(batch)
+            raise
+        archived += len(batch)
+        if len(batch) < batch_size:
+            break
+    return archived
+
+
+def find_reusable_playlist(key, sp=None):
+    """Return the stored result for a previously created playlist with the same selection.
+
+    The playlist is checked with a single read so deleted playlists aren't
+    handed out; their index entries are dropped. Returns None when there's
+    nothing to reuse.
+    """
+    try:
+        indexed = get_indexed_remix(key)
+    except Exception as e:
+        logger.warning(f"Remix index lookup failed: {type(e).__name__}: {str(e)[:100]}")
+        return None
+    if not indexed:
+        return None
+
+    sp = sp or get_spotify_client()
+    try:
+        sp.playlist(indexed["playlist_id"], fields="id")
+    except SpotifyException as e:
+        if e.http_status != 404:
+            logger.warning(f"Could not check indexed playlist {indexed['playlist_id']}: {e.http_status}")
+            return None
+        logger.info(f"Indexed playlist {indexed['playlist_id']} no longer exists, dropping it")
+        try:
+            forget_remix(key)
+        except Exception as e:
+            logger.warning(f"Failed to drop remix index entry: {type(e).__name__}: {str(e)[:100]}")
+        return None
+    except Exception as e:
+        # Reuse is only a shortcut; any failure falls back to creating a new playlist
+        logger.warning(f"Could not check indexed playlist {indexed['playlist_id']}: {type(e).__name__}: {str(e)[:100]}")
+        return None
+
+    return {
+        "url": indexed["url"],
+        "name": indexed["name"],
+        "track_count": indexed["track_count"]
+    }
+
+
+def is_transient_spotify_error(e):
+    """Whether a SpotifyException is worth retrying: rate limiting or a server-side error."""
+    status = response_status(e)
+    return status == 429 or (status is not None and status >= 500)
+
+
+def spotify_retry_countdown(e, retries):
+    """Seconds to wait before retrying after `e`, honouring Spotify's Retry-After."""
+    retry_after = (getattr(e, "headers", None) or {}).get("Retry-After")
+    if retry_after and str(retry_after).isdigit():
+        return int(retry_after)
+    return get_exponential_backoff_interval(factor=1, retries=retries, maximum=600, full_jitter=True)
+
+
+@shared_task(
+    bind=True,
+    acks_late=True,
+    reject_on_worker_lost=True,
+    autoretry_for=(requests.exceptions.ConnectionError, requests.exceptions.Timeout),
+    retry_backoff=True,
+    max_retries=3,
+)
+@tracing.traced_task
+@profiling.profiled_task
+@task_logging.logged_task
 def create_remix_playlist(self, playlist_name, selected_tracks, original_url):
     """
     Phase 2: Create the playlist with user-selected tracks on the central account.
     selected_tracks is a list of Spotify track IDs.
     
     The playlist is created and made public so users can access it.
+
+    Progress is checkpointed in Redis under the task ID, which Celery keeps
+    across retries and redeliveries. A retried task resumes adding tracks to
+    the playlist it already created instead of creating a second one, and a
+    task that already finished returns its stored result.
+
+    Spotify errors are only retried when they are transient (429 and 5xx);
+    anything else, like a 403 or 404, fails the task straight away.
     """
+    try:
+        return _create_remix_playlist(self, playlist_name, selected_tracks, original_url)
+    except SpotifyException as e:
+        if not is_transient_spotify_error(e):
+            raise
+        raise self.retry(exc=e, countdown=spotify_retry_countdown(e, self.request.retries))
+
+
+PLAYLIST_DESCRIPTION = "Curated by Remixify with your help."
+# How far back through the central account's playlists (50 per page) a
+# redelivered task looks for the playlist its interrupted attempt created
+INTERRUPTED_SEARCH_MAX_PAGES = 20
+
+
+def playlist_tag(task_id):
+    """Marker put in a created playlist's description, unique to the creating task."""
+    return f"(ref {task_id})"
+
+
+def find_interrupted_playlist(sp, task_id):
+    """
+    Find the playlist an interrupted attempt of `task_id` created but never
+    checkpointed, by the task's tag in its description. The central
+    account's playlists are listed newest first.
+    """
+    tag = playlist_tag(task_id)
+    for page in range(INTERRUPTED_SEARCH_MAX_PAGES):
+        playlists = sp.current_user_playlists(limit=50, offset=page * 50)
+        for playlist in playlists.get("items") or []:
+            if playlist and tag in (playlist.get("description") or ""):
+                return playlist["id"]
+        if not playlists.get("next"):
+            return None
+    logger.warning(f"No playlist tagged for task {task_id} in the newest {INTERRUPTED_SEARCH_MAX_PAGES * 50} playlists")
+    return None
+
+
+def _create_remix_playlist(self, playlist_name, selected_tracks, original_url):
+    task_id = self.request.id
+    checkpoint = get_create_checkpoint(task_id)
+    if checkpoint.get("result"):
+        logger.info(f"create_remix_playlist {task_id} already completed, returning stored result")
+        return json.loads(checkpoint["result"])
+
     progress_recorder = ProgressRecorder(self)
     sp = get_spotify_client()
+    total = len(selected_tracks)
+    key = selection_key(playlist_name, selected_tracks)
     
-    # Get original playlist info for author
-    playlist_info, _, _ = get_playlist(original_url)
-    
-    user_id = sp.me()["id"]
-    
-    # Create the playlist as public so users can access it
-    playlist = sp.user_playlist_create(
-        user_id, 
-        name=f"{playlist_name} (Remixed)", 
-        public=True,
-        description="Curated by Remixify with your help."
-    )
-    
-    playlist_id = playlist["id"]
-    
-    # Add tracks in chunks of 100
-    if len(selected_tracks) > 100:
-        chunks = chunker(selected_tracks)
-        for i, chunk in enumerate(chunks):
-            sp.user_playlist_add_tracks(user_id, playlist_id, chunk)
-            progress_recorder.set_progress(i + 1, len(chunks))
+    playlist_id = checkpoint.get("playlist_id")
+    if not playlist_id and checkpoint.get("creating"):
+        # A previous attempt died between creating the playlist and checkpointing it
+        playlist_id = find_interrupted_playlist(sp, task_id)
+        if playlist_id:
+            logger.info(f"Adopting playlist {playlist_id} created by an interrupted attempt of task {task_id}")
+            save_create_checkpoint(task_id, playlist_id=playlist_id)
+    if not playlist_id:
+        # An identical request may have finished while this one was queued
+        reusable = find_reusable_playlist(key, sp)
+        if reusable:
+            logger.info(f"create_remix_playlist {task_id} reusing an existing playlist for the same selection")
+            return reusable
+
+    if playlist_id:
+        original_author = checkpoint.get("original_author", "")
+        # The checkpoint can lag one chunk behind if the worker died mid-write,
+        # so the playlist's own track count is the source of truth.
+        tracks_added = sp.playlist(playlist_id, fields="tracks(total)")["tracks"]["total"]
+        logger.info(f"Resuming playlist {playlist_id} for task {task_id} at {tracks_added}/{total} tracks")
     else:
-        sp.user_playlist_add_tracks(user_id, playlist_id, selected_tracks)
-        progress_recorder.set_progress(1, 1)
+        # Get original playlist info for author (metadata only, no track download)
+        playlist_info = get_playlist_details(original_url, sp)
+        original_author = playlist_info.get("playlist_owner") or ""
+        
+        # Mark the attempt first, so a redelivery after a crash looks for the
+        # playlist instead of creating a second one
+        save_create_checkpoint(task_id, creating=1, original_author=original_author)
+        # Create the playlist as public so users can access it
+        playlist = sp.user_playlist_create(
+            sp.current_user_id(),
+            name=f"{playlist_name} (Remixed)", 
+            public=True,
+            # The tag lets a redelivery of this task find the playlist (see find_interrupted_playlist)
+            description=f"{PLAYLIST_DESCRIPTION} {playlist_tag(task_id)}"
+        )
+        playlist_id = playlist["id"]
+        tracks_added = 0
+        save_create_checkpoint(task_id, playlist_id=playlist_id, original_author=original_author, tracks_added=0)
+    
+    # Add tracks in chunks of 100. Appends have to stay in order, so chunks go
+    # one after another; each one is checkpointed before the next is sent.
+    for chunk in chunker(selected_tracks[tracks_added:]):
+        sp.playlist_add_items(playlist_id, chunk)
+        tracks_added += len(chunk)
+        save_create_checkpoint(task_id, tracks_added=tracks_added)
+        progress_recorder.set_progress(tracks_added, total)
+    progress_recorder.set_progress(total, total)
     
-    playlist_details = sp.user_playlist(user_id, playlist_id)
+    playlist_details = sp.playlist(playlist_id, fields="name,images,external_urls")
     
     # Get playlist image (use first image if available)
     image_url = None
     if playlist_details.get("images") and len(playlist_details["images"]) > 0:
         image_url = playlist_details["images"][0]["url"]
     
-    # Save to database for recent playlists display
-    CreatedPlaylist.objects.create(
-        name=playlist_details["name"],
-        spotify_url=playlist_details["external_urls"]["spotify"],
-        image_url=image_url,
-        track_count=len(selected_tracks),
-        original_author=playlist_info.get("playlist_owner", "")
-    )
-    
-    # Increment the global playlist counter in Redis
-    increment_playlist_count()
-    
-    # Keep only the most recent 20 playlists to avoid database bloat
-    old_playlists = CreatedPlaylist.objects.all()[20:]
-    for playlist_obj in old_playlists:
-        playlist_obj.delete()
+    # Add to the recent playlists feed and bump the global counter in one Redis
+    # round-trip. The step is checkpointed first so a redelivered task never
+    # counts the playlist twice (a crash in between leaves it out of the feed).
+    archive = getattr(settings, "PLAYLIST_ARCHIVE_ENABLED", True)
+    queued = None
+    if not checkpoint.get("recorded"):
+        save_create_checkpoint(task_id, recorded=1)
+        _, queued = record_created_playlist(
+            {
+                "name": playlist_details["name"],
+                "url": playlist_details["external_urls"]["spotify"],
+                "image": image_url,
+                "original_author": original_author,
+                "track_count": total,
+                "created_at": time.time(),
+            },
+            archive=archive,
+        )
+    if queued and queued >= getattr(settings, "PLAYLIST_ARCHIVE_BATCH_SIZE", 20):
+        try:
+            archive_created_playlists()
+        except Exception as e:
+            logger.warning(f"Failed to archive created playlists: {type(e).__name__}: {str(e)[:100]}")
     
-    return {
+    result = {
         "url": playlist_details["external_urls"]["spotify"],
         "name": playlist_details["name"],
-        "track_count": len(selected_tracks)
+        "track_count": total
     }
+    save_create_checkpoint(task_id, result=json.dumps(result))
+    try:
+        index_remix(key, {**result, "playlist_id": playlist_id})
+    except Exception as e:
+        logger.warning(f"Failed to index playlist {playlist_id}: {type(e).__name__}: {str(e)[:100]}")
+    return result
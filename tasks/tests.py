@@ -1,5 +1,46 @@
+import json
+import logging
+import time
+import requests
+from unittest import mock
+from celery.exceptions import Ignore
 from django.test import TestCase
-from tasks.helpers import chunker, get_playlist_id
+from django.test import override_settings
+from tasks import accounting, homepage, metrics, profiling, task_logging, tracing, views
+from tasks.helpers import chunker, get_playlist_id, prefetch, selection_key
+from tasks.redis_utils import get_redis_client
+from tasks.scheduling import (
+    BudgetedSpotifyClient,
+    PreviewCancellation,
+    RateBudget,
+    admission_snapshot,
+    admit_preview,
+    check_client_rate,
+    chunk_priority,
+    size_bucket,
+    try_acquire_extra_call,
+)
+from tasks.models import CreatedPlaylist
+from spotipy.exceptions import SpotifyException
+from tasks.tasks import (
+    _create_remix_playlist,
+    archive_created_playlists,
+    find_reusable_playlist,
+    is_transient_spotify_error,
+    find_remix_candidates,
+    get_playlist,
+    iter_playlist_pages,
+    merge_preview_chunks,
+    normalize_playlist_item,
+    preview_remixes,
+    resolve_tracks,
+    build_artist_index,
+    search_track,
+    SearchSharing,
+    ParentProgressRecorder,
+    PreviewProgressRecorder,
+    search_tracks_until,
+)
 
 class ChunkerTestCase(TestCase):
     def test_chunker(self):
@@ -12,6 +53,1071 @@ class GetPlaylistID(TestCase):
         actual = get_playlist_id("https://open.spotify.com/playlist/0NhxPzEKlniP54ZDqDC8bR?si=cfb6e43bdd7d4aee")
         expected = "0NhxPzEKlniP54ZDqDC8bR"
         self.assertEqual(actual, expected)
+
+
+class SelectionKeyTestCase(TestCase):
+    def test_depends_on_name_and_track_order(self):
+        key = selection_key("Mix", ["a", "b"])
+        self.assertEqual(key, selection_key("Mix", ("a", "b")))
+        self.assertNotEqual(key, selection_key("Mix", ["b", "a"]))
+        self.assertNotEqual(key, selection_key("Other", ["a", "b"]))
+
+
+class PrefetchTestCase(TestCase):
+    def test_preserves_order(self):
+        self.assertEqual(list(prefetch(iter(range(50)), maxsize=4)), list(range(50)))
+
+    def test_reraises_producer_errors(self):
+        def produce():
+            yield 1
+            raise ValueError("boom")
+
+        stream = prefetch(produce(), maxsize=4)
+        self.assertEqual(next(stream), 1)
+        with self.assertRaises(ValueError):
+            next(stream)
+
+
+class IterPlaylistPagesTestCase(TestCase):
+    def test_fetches_remaining_offsets_in_order(self):
+        client = mock.Mock()
+        client.playlist_items.side_effect = lambda playlist_id, **kwargs: {"items": [kwargs["offset"]]}
+        with mock.patch("tasks.tasks.get_spotify_client", return_value=client):
+            pages = list(iter_playlist_pages("playlist", 350, 100))
+        self.assertEqual(pages, [[100], [200], [300]])
+
+    def test_single_page_playlist_makes_no_calls(self):
+        with mock.patch("tasks.tasks.get_spotify_client") as get_client:
+            self.assertEqual(list(iter_playlist_pages("playlist", 80, 80)), [])
+        get_client.assert_not_called()
+
+    def test_normalize_skips_unavailable_tracks(self):
+        self.assertIsNone(normalize_playlist_item({"track": None}))
+        track = normalize_playlist_item({"track": {
+            "id": "abc",
+            "name": "Alien (Club Remix)",
+            "artists": [{"name": "Sabrina"}],
+            "album": {"images": []},
+            "external_urls": {"spotify": "https://open.spotify.com/track/abc"},
+        }})
+        self.assertEqual(track["clean_name"], "alien")
+        self.assertIsNone(track["album_art"])
+
+
+
+class GetPlaylistCacheTestCase(TestCase):
+    URL = "https://open.spotify.com/playlist/0NhxPzEKlniP54ZDqDC8bR"
+
+    def setUp(self):
+        self.client = mock.Mock()
+        self.client.playlist.return_value = {
+            "snapshot_id": "snap-1",
+            "name": "Mix",
+            "images": [],
+            "owner": {"display_name": "kb"},
+            "tracks": {"total": 1},
+        }
+
+    def test_snapshot_hit_skips_track_download(self):
+        cached = [{"id": "abc"}]
+        with mock.patch("tasks.tasks.get_spotify_client", return_value=self.client), \
+                mock.patch("tasks.tasks.get_cached_playlist_tracks", return_value=cached) as lookup:
+            details, tracks, _ = get_playlist(self.URL)
+            self.assertEqual(list(tracks), cached)
+        lookup.assert_called_once_with("0NhxPzEKlniP54ZDqDC8bR", "snap-1")
+        self.assertEqual(details["playlist_owner"], "kb")
+        self.client.playlist_items.assert_not_called()
+
+    def test_snapshot_miss_downloads_and_caches(self):
+        self.client.playlist_items.return_value = {"items": [{"track": None}]}
+        with mock.patch("tasks.tasks.get_spotify_client", return_value=self.client), \
+                mock.patch("tasks.tasks.get_cached_playlist_tracks", return_value=None), \
+                mock.patch("tasks.tasks.cache_playlist_tracks") as store:
+            _, tracks, _ = get_playlist(self.URL)
+            self.assertEqual(list(tracks), [])
+        store.assert_called_once_with("0NhxPzEKlniP54ZDqDC8bR", "snap-1", [])
+
+
+
+class SearchSharingTestCase(TestCase):
+    def item(self, track_id, name):
+        return {
+            "id": track_id, "name": name, "artists": [{"name": "Artist"}, {"name": "DJ X"}], "album": {"images": []},
+            "preview_url": None, "external_urls": {"spotify": ""}, "duration_ms": 1,
+        }
+
+    def test_duplicate_tracks_are_searched_once(self):
+        sharing = SearchSharing(mock.Mock())
+        track = {
+            "id": "a", "original_name": "Song", "clean_name": "Song", "artists": ["Artist"],
+            "album_art": None, "spotify_url": "",
+        }
+        duplicate = dict(track, id="b", original_name="song ")
+        candidates = [{"id": "b", "confidence_level": "high"}, {"id": "r1", "confidence_level": "high"}]
+        with mock.patch("tasks.tasks.find_remix_candidates", return_value=candidates) as find:
+            search_track(mock.Mock(), track, 0, 2, sharing)
+            result, _ = search_track(mock.Mock(), duplicate, 1, 2, sharing)
+        find.assert_called_once()
+        # A duplicate never gets itself offered as a remix
+        self.assertEqual([c["id"] for c in result["candidates"]], ["r1"])
+
+    @override_settings(PREVIEW_SHARED_ARTIST_MIN_TRACKS=2)
+    def test_heavy_artist_gets_one_shared_search(self):
+        sharing = SearchSharing(mock.Mock())
+        tracks = [{"original_name": f"Song {n}", "artists": ["Artist"]} for n in range(3)]
+        with mock.patch("tasks.tasks.lookup_search", return_value=None), \
+                mock.patch("tasks.tasks.send_search", return_value=["items"]) as send:
+            pools = [sharing.sources(track) for track in tracks]
+        self.assertEqual(pools, [(None, None), (None, ["items"]), (None, ["items"])])
+        send.assert_called_once_with(sharing.sp, "Artist remix", 50)
+
+    @override_settings(PREVIEW_CATALOG_MIN_TRACKS=3)
+    def test_planned_heavy_artist_is_answered_from_the_catalog_index(self):
+        sp = mock.Mock()
+        sharing = SearchSharing(sp)
+        tracks = [
+            {"id": f"t{n}", "original_name": f"Song {n}", "clean_name": f"song {n}", "artists": ["Artist"],
+             "artist_ids": ["a1"], "album_art": None, "spotify_url": ""}
+            for n in range(3)
+        ] + [{"id": "t3", "original_name": "Song 0 (Live Mix)", "clean_name": "song 0", "artists": ["Artist"],
+              "artist_ids": ["a1"], "album_art": None, "spotify_url": ""}]
+        sharing.plan(tracks)
+        index = {"song 0": [self.item("r0", "Song 0 (DJ X Remix)")]}
+        with mock.patch("tasks.tasks.get_artist_index", return_value=index) as get_index, \
+                mock.patch("tasks.tasks.lookup_search", return_value=None):
+            results = [search_track(sp, track, n, len(tracks), sharing)[0] for n, track in enumerate(tracks)]
+        self.assertEqual([[c["id"] for c in r["candidates"]] for r in results], [["r0"], [], [], ["r0"]])
+        get_index.assert_called_once_with(sp, "a1")
+        # The index is authoritative: titles missing from it have no candidates, and nothing is searched
+        sp.search.assert_not_called()
+
+    @override_settings(PREVIEW_CATALOG_MIN_TRACKS=2, PREVIEW_SHARED_ARTIST_MIN_TRACKS=2)
+    def test_failed_crawl_falls_back_to_search(self):
+        sharing = SearchSharing(mock.Mock())
+        tracks = [{"original_name": f"Song {n}", "artists": ["Artist"], "artist_ids": ["a1"]} for n in range(2)]
+        sharing.plan(tracks)
+        with mock.patch("tasks.tasks.get_artist_index", side_effect=RuntimeError("crawl failed")), \
+                mock.patch("tasks.tasks.lookup_search", return_value=None), \
+                mock.patch("tasks.tasks.send_search", return_value=["items"]):
+            self.assertEqual(sharing.sources(tracks[0]), (None, ["items"]))
+
+    def test_artist_index_is_built_from_batched_album_fetches(self):
+        sp = mock.Mock()
+        sp.artist_albums.side_effect = [
+            {"items": [{"id": f"al{n}"} for n in range(50)], "next": "more"},
+            {"items": [{"id": "al50"}], "next": None},
+        ]
+
+        def albums(ids):
+            return {"albums": [{"images": [], "tracks": {"items": [
+                dict(self.item(f"{album_id}-r", "Song (DJ X Remix)"), artists=[{"id": "a1", "name": "Artist"}]),
+                dict(self.item(f"{album_id}-o", "Song"), artists=[{"id": "a1", "name": "Artist"}]),
+                dict(self.item(f"{album_id}-x", "Other (Remix)"), artists=[{"id": "zz", "name": "Someone"}]),
+            ]}} for album_id in ids]}
+
+        sp.albums.side_effect = albums
+        index = build_artist_index(sp, "a1")
+        self.assertEqual([len(c[0][0]) for c in sp.albums.call_args_list], [20, 20, 11])
+        # Only versioned tracks that credit the artist, keyed by base title
+        self.assertEqual(list(index), ["song"])
+        self.assertEqual(len(index["song"]), 51)
+
+    def test_confident_shared_items_skip_the_tracks_own_searches(self):
+        sp = mock.Mock()
+        track = {"original_name": "Song", "clean_name": "Song", "artists": ["Artist"]}
+        shared = [self.item(f"r{n}", f"Song (DJ {n} Remix)") for n in range(3)] + [self.item("o", "Other (Remix)")]
+        with mock.patch("tasks.tasks.lookup_search", return_value=None):
+            candidates = find_remix_candidates(sp, track, shared_items=shared)
+        sp.search.assert_not_called()
+        self.assertEqual(sorted(c["id"] for c in candidates), ["r0", "r1", "r2"])
+
+
+class ResolveTracksTestCase(TestCase):
+    def spotify_tracks(self, ids):
+        return {"tracks": [{"id": i, "name": f"Song {i}", "artists": [{"name": "A"}]} if i != "missing" else None
+                           for i in ids]}
+
+    def test_cache_hits_dedup_and_batches_of_50(self):
+        ids = [f"id{n}" for n in range(120)] + ["id0", "cached", "missing"]
+        sp = mock.Mock()
+        sp.tracks.side_effect = self.spotify_tracks
+        with mock.patch("tasks.tasks.get_cached_tracks", return_value={"cached": {"id": "cached"}}), \
+                mock.patch("tasks.tasks.cache_tracks") as cache:
+            resolved = resolve_tracks(ids, sp=sp)
+        self.assertEqual([len(c[0][0]) for c in sp.tracks.call_args_list], [50, 50, 21])
+        self.assertEqual(len(resolved), 121)
+        self.assertNotIn("missing", resolved)
+        self.assertEqual(len(cache.call_args[0][0]), 120)
+
+    def test_batch_endpoint_keeps_input_order(self):
+        track = {"id": "4uLU6hMCjMI75M1A2tKUQC", "name": "Song"}
+        with mock.patch("tasks.views.resolve_tracks", return_value={track["id"]: track}) as resolve:
+            response = self.client.post(
+                "/resolve-tracks/",
+                data=json.dumps({"urls": ["not a link", "spotify:track:4uLU6hMCjMI75M1A2tKUQC"]}),
+                content_type="application/json",
+            )
+        resolve.assert_called_once_with(["4uLU6hMCjMI75M1A2tKUQC"])
+        self.assertEqual(
+            response.json()["results"],
+            [{"input": "not a link", "track": None}, {"input": "spotify:track:4uLU6hMCjMI75M1A2tKUQC", "track": track}],
+        )
+
+    def test_batch_endpoint_drops_malformed_ids(self):
+        valid = "4uLU6hMCjMI75M1A2tKUQC"
+        urls = [f"https://open.spotify.com/track/{valid}?si=x", "spotify:track:bad-id", "https://open.spotify.com/track/short"]
+        with mock.patch("tasks.views.resolve_tracks", return_value={}) as resolve:
+            response = self.client.post("/resolve-tracks/", data=json.dumps({"urls": urls}),
+                                        content_type="application/json")
+        resolve.assert_called_once_with([valid])
+        self.assertEqual([r["track"] for r in response.json()["results"]], [None, None, None])
+
+    def test_batch_endpoint_rejects_non_object_body(self):
+        response = self.client.post("/resolve-tracks/", data=json.dumps(["4uLU6hMCjMI75M1A2tKUQC"]),
+                                    content_type="application/json")
+        self.assertEqual(response.status_code, 400)
+
+
+class RecentPlaylistsTestCase(TestCase):
+    playlist = {
+        "name": "Mix (Remixed)", "url": "https://open.spotify.com/playlist/x", "image": None,
+        "original_author": "", "track_count": 12, "created_at": 1700000000.0,
+    }
+
+    def setUp(self):
+        # Start every test without an in-process homepage cache
+        patcher = mock.patch.dict(homepage._local, {"data": None, "expires_at": 0.0})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_feed_is_served_without_a_db_query(self):
+        with mock.patch("tasks.homepage.get_cached_homepage", return_value=None), \
+                mock.patch("tasks.homepage.get_homepage_stats", return_value=(7, [self.playlist])), \
+                mock.patch("tasks.homepage.cache_homepage") as cache, \
+                self.assertNumQueries(0):
+            response = self.client.get("/recent-playlists/")
+            count = self.client.get("/playlist-count/")
+        self.assertEqual(response.json()["playlists"][0]["original_author"], "Unknown")
+        self.assertEqual(count.json(), {"count": 7})
+        # The second endpoint was served from the in-process copy
+        cache.assert_called_once()
+
+    def test_endpoints_are_cacheable_and_conditional(self):
+        with mock.patch("tasks.homepage.get_cached_homepage", return_value={"count": 7, "playlists": []}):
+            response = self.client.get("/playlist-count/")
+            self.assertIn("max-age=", response["Cache-Control"])
+            again = self.client.get("/playlist-count/", HTTP_IF_NONE_MATCH=response["ETag"])
+        self.assertEqual(again.status_code, 304)
+
+    def test_homepage_embeds_bootstrap_data(self):
+        with mock.patch("authentication.views.homepage_data", return_value={"count": 7, "playlists": []}):
+            response = self.client.get("/")
+        self.assertContains(response, '<script id="homepage-bootstrap" type="application/json">{"count": 7')
+
+    def test_archive_is_written_in_bulk(self):
+        batches = [[self.playlist, dict(self.playlist, name="Other")], []]
+        with mock.patch("tasks.tasks.pop_playlist_archive_batch", side_effect=batches), \
+                self.assertNumQueries(1):
+            self.assertEqual(archive_created_playlists(batch_size=5), 2)
+        self.assertEqual(CreatedPlaylist.objects.get(name="Other").created_at.timestamp(), 1700000000.0)
+
+    def test_failed_batch_is_requeued(self):
+        bad = [dict(self.playlist, track_count=-1)]
+        with mock.patch("tasks.tasks.pop_playlist_archive_batch", return_value=bad), \
+                mock.patch("tasks.tasks.CreatedPlaylist.objects.bulk_create", side_effect=RuntimeError), \
+                mock.patch("tasks.tasks.requeue_playlist_archive") as requeue:
+            with self.assertRaises(RuntimeError):
+                archive_created_playlists()
+        requeue.assert_called_once_with(bad)
+
+
+class CreateRemixPlaylistTestCase(TestCase):
+    tracks = [f"t{i}" for i in range(150)]
+
+    def setUp(self):
+        self.sp = mock.Mock()
+        self.sp.user_playlist_create.return_value = {"id": "p1"}
+        self.sp.current_user_playlists.return_value = {"items": []}
+        self.sp.playlist.side_effect = lambda playlist_id, fields: {
+            "tracks(total)": {"tracks": {"total": 100}},
+            "id": {"id": playlist_id},
+        }.get(fields, {"name": "Mix (Remixed)", "images": [], "external_urls": {"spotify": "https://spotify/p1"}})
+        self.saved = {}
+        patches = [
+            mock.patch("tasks.tasks.get_spotify_client", return_value=self.sp),
+            mock.patch("tasks.tasks.ProgressRecorder"),
+            mock.patch("tasks.tasks.get_playlist_details", return_value={"playlist_owner": "Owner"}),
+            mock.patch("tasks.tasks.find_reusable_playlist", return_value=None),
+            mock.patch("tasks.tasks.index_remix"),
+            mock.patch("tasks.tasks.save_create_checkpoint",
+                       side_effect=lambda task_id, **fields: self.saved.update(fields)),
+            mock.patch("tasks.tasks.record_created_playlist", return_value=(1, None)),
+        ]
+        for patcher in patches:
+            started = patcher.start()
+            self.addCleanup(patcher.stop)
+        self.record = started
+
+    def run_task(self, checkpoint):
+        with mock.patch("tasks.tasks.get_create_checkpoint", return_value=checkpoint):
+            return _create_remix_playlist(mock.Mock(request=mock.Mock(id="t1")), "Mix", self.tracks, "url")
+
+    def test_fresh_run(self):
+        result = self.run_task({})
+        self.sp.user_playlist_create.assert_called_once()
+        self.assertEqual(self.sp.playlist_add_items.call_count, 2)
+        self.record.assert_called_once()
+        self.assertEqual(result, {"url": "https://spotify/p1", "name": "Mix (Remixed)", "track_count": 150})
+        self.assertEqual(self.saved["creating"], 1)
+        self.assertEqual(self.saved["tracks_added"], 150)
+
+    def test_resumes_from_checkpoint(self):
+        self.run_task({"playlist_id": "p1", "original_author": "Owner", "tracks_added": "100"})
+        self.sp.user_playlist_create.assert_not_called()
+        # Only the tracks after the playlist's own count are added
+        self.sp.playlist_add_items.assert_called_once_with("p1", self.tracks[100:])
+        self.record.assert_called_once()
+
+    def test_adopts_playlist_tagged_by_interrupted_attempt(self):
+        # Someone else's empty playlist of the same name comes first, the tagged one on the second page
+        self.sp.current_user_playlists.side_effect = [
+            {"items": [{"id": "other", "name": "Mix (Remixed)", "description": "Curated by Remixify with your help. "
+                        "(ref t2)", "tracks": {"total": 0}}], "next": "page 2"},
+            {"items": [{"id": "p1", "name": "Mix (Remixed)", "description": "Curated by Remixify with your help. "
+                        "(ref t1)", "tracks": {"total": 0}}], "next": None},
+        ]
+        self.run_task({"creating": "1", "original_author": "Owner"})
+        self.sp.user_playlist_create.assert_not_called()
+        self.assertEqual(self.saved["playlist_id"], "p1")
+
+    def test_creates_playlist_when_interrupted_attempt_made_none(self):
+        self.sp.current_user_playlists.return_value = {"items": [], "next": None}
+        self.run_task({"creating": "1", "original_author": "Owner"})
+        self.sp.user_playlist_create.assert_called_once()
+        self.assertIn("(ref t1)", self.sp.user_playlist_create.call_args[1]["description"])
+
+    def test_recorded_playlist_is_not_counted_again(self):
+        self.run_task({"playlist_id": "p1", "tracks_added": "150", "recorded": "1"})
+        self.record.assert_not_called()
+
+    def test_returns_stored_result(self):
+        stored = {"url": "https://spotify/p1", "name": "Mix (Remixed)", "track_count": 150}
+        self.assertEqual(self.run_task({"result": json.dumps(stored)}), stored)
+        self.sp.user_playlist_create.assert_not_called()
+        self.sp.playlist_add_items.assert_not_called()
+
+    def test_only_transient_errors_are_retried(self):
+        self.assertTrue(is_transient_spotify_error(SpotifyException(429, -1, "rate limited")))
+        self.assertTrue(is_transient_spotify_error(SpotifyException(502, -1, "bad gateway")))
+        self.assertFalse(is_transient_spotify_error(SpotifyException(403, -1, "forbidden")))
+        self.assertFalse(is_transient_spotify_error(SpotifyException(404, -1, "not found")))
+
+
+class FindReusablePlaylistTestCase(TestCase):
+    indexed = {"playlist_id": "p1", "url": "https://spotify/p1", "name": "Mix (Remixed)", "track_count": 3}
+
+    def find(self, sp):
+        with mock.patch("tasks.tasks.get_indexed_remix", return_value=self.indexed), \
+                mock.patch("tasks.tasks.forget_remix") as forget:
+            return find_reusable_playlist("key", sp), forget
+
+    def test_hit(self):
+        result, forget = self.find(mock.Mock())
+        self.assertEqual(result, {"url": "https://spotify/p1", "name": "Mix (Remixed)", "track_count": 3})
+        forget.assert_not_called()
+
+    def test_deleted_playlist_is_dropped(self):
+        sp = mock.Mock()
+        sp.playlist.side_effect = SpotifyException(404, -1, "not found")
+        result, forget = self.find(sp)
+        self.assertIsNone(result)
+        forget.assert_called_once_with("key")
+
+    def test_miss(self):
+        with mock.patch("tasks.tasks.get_indexed_remix", return_value=None):
+            self.assertIsNone(find_reusable_playlist("key", mock.Mock()))
+
+    def test_any_lookup_error_means_no_reuse(self):
+        sp = mock.Mock()
+        sp.playlist.side_effect = ConnectionError("reset")
+        result, forget = self.find(sp)
+        self.assertIsNone(result)
+        forget.assert_not_called()
+
+
+def playlist_track(n):
+    return {"id": f"t{n}", "original_name": f"Song {n}", "clean_name": f"song {n}", "artists": [f"Artist {n}"],
+            "album_art": None, "spotify_url": f"https://open.spotify.com/track/t{n}"}
+
+
+@override_settings(TRACING_ENABLED=False, SPOTIFY_RATE_BUDGET=0, PREVIEW_FANOUT_ENABLED=False,
+                   PREVIEW_LATENCY_BUDGET=0, PREVIEW_VIEWPORT_TRACKS=0)
+class PreviewRemixesTestCase(TestCase):
+    """Runs preview_remixes eagerly against a fake playlist stream and fake searches."""
+
+    def setUp(self):
+        self.searched = []
+        self.signals = (False, None)
+        patches = [
+            mock.patch("tasks.tasks.get_spotify_client"),
+            mock.patch("tasks.tasks.search_track", side_effect=self.search_track),
+            mock.patch("tasks.tasks.record_queue_wait"),
+            mock.patch("tasks.scheduling.get_preview_signals", side_effect=lambda task_id: self.signals),
+            mock.patch("tasks.accounting.aggregate_hourly"),
+            mock.patch.object(metrics._buffer, "add"),
+            mock.patch.object(preview_remixes, "update_state"),
+        ]
+        for patcher in patches:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.release = mock.patch("tasks.tasks.release_preview").start()
+        self.addCleanup(mock.patch.stopall)
+
+    def search_track(self, sp, track, index, total_tracks, sharing=None):
+        self.searched.append(track["id"])
+        match = {"id": f"r{track['id']}", "confidence_level": "high"}
+        return {"original": {"id": track["id"]}, "candidates": [match], "best_match": match}, False
+
+    def stream(self, total, fail_at=None):
+        for n in range(total):
+            if n == fail_at:
+                raise requests.exceptions.ConnectionError("Connection reset by peer")
+            yield playlist_track(n)
+
+    def run_preview(self, total=250, fail_at=None, **kwargs):
+        playlist_info = {"playlist_name": "Mix", "playlist_image": None, "total_tracks": total}
+        with mock.patch("tasks.tasks.get_playlist",
+                        return_value=(playlist_info, self.stream(total, fail_at), mock.Mock())):
+            return preview_remixes.apply(args=["https://open.spotify.com/playlist/x"], kwargs=kwargs, task_id="task-1")
+
+    def test_searches_every_track(self):
+        result = self.run_preview(total=30).get()
+        self.assertEqual(len(result["tracks"]), 30)
+        self.assertEqual(result["summary"]["high_confidence"], 30)
+        self.release.assert_called_with("task-1")
+
+    def test_viewport_sends_the_first_screen_once_then_the_full_results(self):
+        without_viewport = self.run_preview(total=60).get()
+        preview_remixes.update_state.reset_mock()
+        self.searched = []
+        with override_settings(PREVIEW_VIEWPORT_TRACKS=20), \
+                mock.patch("tasks.tasks.find_remix_candidates", return_value=[]) as quick:
+            result = self.run_preview(total=60).get()
+
+        metas = [c[1]["meta"] for c in preview_remixes.update_state.call_args_list]
+        early = [meta for meta in metas if "early_result" in meta]
+        self.assertEqual(len(early), 1)
+        self.assertEqual(early[0]["current"], 0)
+        self.assertEqual([t["original"]["id"] for t in early[0]["early_result"]["tracks"]],
+                         [f"t{n}" for n in range(20)])
+        self.assertEqual(quick.call_count, 20)
+        # The full search still covers every track, first screen included
+        self.assertEqual(self.searched, [f"t{n}" for n in range(60)])
+        # Same results as without the viewport, apart from this run's resource usage
+        result.pop("usage")
+        without_viewport.pop("usage")
+        self.assertEqual(result, without_viewport)
+
+    def test_shared_work_is_planned_from_the_first_page(self):
+        with mock.patch("tasks.tasks.SearchSharing.plan") as plan:
+            self.run_preview(total=250).get()
+        self.assertEqual([t["id"] for t in plan.call_args[0][0]], [f"t{n}" for n in range(100)])
+        # Planning only looks ahead; every track is still searched in order
+        self.assertEqual(self.searched, [f"t{n}" for n in range(250)])
+
+    def test_cancel_stops_between_tracks_with_partial_results(self):
+        # The front end cancels once 40 tracks have been searched
+        with mock.patch("tasks.scheduling.get_preview_signals",
+                        side_effect=lambda task_id: (len(self.searched) >= 40, None)), \
+                mock.patch.object(PreviewCancellation, "CHECK_INTERVAL", 0):
+            result = self.run_preview(total=250).get()
+        self.assertTrue(result["cancelled"])
+        self.assertEqual(len(self.searched), 40)
+        self.assertEqual(result["total_tracks"], 40)
+        self.assertEqual(result["playlist_total_tracks"], 250)
+        self.assertEqual(len(result["tracks"]), 40)
+
+    def test_page_failure_midway_fails_with_a_generic_error(self):
+        result = self.run_preview(fail_at=100)
+        self.assertTrue(result.failed())
+        self.assertIsInstance(result.result, ValueError)
+        self.assertEqual(str(result.result), "Something went wrong. Please try again.")
+        # The tracks before the failed page were searched, but not returned
+        self.assertEqual(len(self.searched), 100)
+        self.release.assert_called_with("task-1")
+
+    def test_released_after_any_failure(self):
+        with mock.patch("tasks.tasks.search_tracks_until", side_effect=RuntimeError("boom")):
+            result = self.run_preview(total=30, latency_budget=30)
+        self.assertTrue(result.failed())
+        self.release.assert_called_once_with("task-1")
+
+    @override_settings(PREVIEW_FANOUT_ENABLED=True, PREVIEW_FANOUT_MIN_TRACKS=10)
+    def test_fan_out_leaves_release_to_the_chord(self):
+        with mock.patch.object(preview_remixes, "replace", side_effect=Ignore("Replaced by new task")), \
+                mock.patch("tasks.tasks.reset_preview_progress"):
+            self.run_preview(total=30)
+        self.release.assert_not_called()
+
+
+class MergePreviewChunksTestCase(TestCase):
+    def test_restores_playlist_order_and_summarizes(self):
+        match = {"confidence_level": "high"}
+        chunks = [
+            {"offset": 2, "tracks": [{"candidates": []}], "failed": 0, "usage": {"calls": 3, "calls:search": 3}},
+            {"offset": 0, "tracks": [{"candidates": [match]}, {"candidates": []}], "failed": 1,
+             "usage": {"calls": 4, "calls:search": 4}},
+        ]
+        preview = {"playlist_name": "Mix", "tracks": [], "usage": {"calls": 2, "calls:playlist_items": 2}}
+        with mock.patch("tasks.tasks.release_preview"), \
+                mock.patch("tasks.accounting.aggregate_hourly") as aggregate:
+            result = merge_preview_chunks.run(chunks, preview)
+        self.assertEqual([t["candidates"] for t in result["tracks"]], [[match], [], []])
+        self.assertEqual(result["total_tracks"], 3)
+        self.assertEqual(result["summary"]["high_confidence"], 1)
+        self.assertEqual(result["summary"]["no_match"], 2)
+        # The parent's and every chunk's usage add up in the final result...
+        self.assertEqual(result["usage"]["calls"], 9)
+        self.assertEqual(result["usage"]["calls:search"], 7)
+        self.assertEqual(result["usage"]["calls:playlist_items"], 2)
+        # ...but only the callback's own run goes into the hourly totals
+        aggregate.assert_called_once()
+        self.assertNotIn("calls", aggregate.call_args[0][1])
+
+
+
+class Throttled(Exception):
+    pass
+
+
+class FakeRateRedis:
+    """Just enough of a Redis client for RateBudget."""
+
+    def __init__(self):
+        self.counters = {}
+        self.sets = {}
+        self.round_trips = 0
+
+    def pipeline(self):
+        return FakeRatePipeline(self)
+
+
+class FakeRatePipeline:
+    def __init__(self, redis_client):
+        self.redis = redis_client
+        self.results = []
+
+    def incrby(self, key, amount):
+        self.redis.counters[key] = self.redis.counters.get(key, 0) + amount
+        self.results.append(self.redis.counters[key])
+
+    def decrby(self, key, amount):
+        self.incrby(key, -amount)
+
+    def sadd(self, key, member):
+        self.redis.sets.setdefault(key, set()).add(member)
+        self.results.append(1)
+
+    def scard(self, key):
+        self.results.append(len(self.redis.sets.get(key, ())))
+
+    def expire(self, key, seconds):
+        self.results.append(True)
+
+    def execute(self):
+        self.redis.round_trips += 1
+        return self.results
+
+
+class SchedulingTestCase(TestCase):
+    def test_chunks_are_served_round_robin(self):
+        self.assertEqual([chunk_priority(i) for i in range(12)], [1, 2, 3, 4, 5, 6, 7, 8, 9, 9, 9, 9])
+
+    def test_size_buckets(self):
+        self.assertEqual(size_bucket(20), "<=50")
+        self.assertEqual(size_bucket(200), "<=200")
+        self.assertEqual(size_bucket(5000), ">1000")
+
+    def test_disabled_budget_never_touches_redis(self):
+        with mock.patch("tasks.scheduling.get_redis_client") as get_client:
+            RateBudget("task", limit=0).acquire()
+        get_client.assert_not_called()
+
+    def test_budget_is_shared_fairly_between_requests(self):
+        redis_client = FakeRateRedis()
+        first, second = RateBudget("first", limit=20), RateBudget("second", limit=20)
+
+        def calls_until_throttled(budget):
+            calls = 0
+            with mock.patch("tasks.scheduling.accounting.sleep", side_effect=Throttled):
+                try:
+                    while True:
+                        budget.acquire()
+                        calls += 1
+                except Throttled:
+                    return calls
+
+        with mock.patch("tasks.scheduling.get_redis_client", return_value=redis_client), \
+                mock.patch("tasks.scheduling.time.time", return_value=1000.0):
+            second.acquire()
+            self.assertEqual(calls_until_throttled(first), 10)
+            self.assertEqual(calls_until_throttled(second), 9)
+        # Slots are taken a batch per round-trip, not one per call
+        self.assertLess(redis_client.round_trips, 10)
+
+    def test_waiting_for_the_next_window_does_not_hold_the_lock(self):
+        budget = RateBudget("task", limit=20)
+        lock_free_while_waiting = []
+
+        def sleep(delay, reason):
+            lock_free_while_waiting.append(budget._lock.acquire(blocking=False))
+            budget._lock.release()
+
+        with mock.patch.object(budget, "_try_acquire", side_effect=[0, 5]), \
+                mock.patch("tasks.scheduling.accounting.sleep", side_effect=sleep):
+            budget.acquire()
+        self.assertEqual(lock_free_while_waiting, [True])
+
+    def test_extra_calls_draw_from_the_current_calls_budget(self):
+        budget = RateBudget("task", limit=20)
+        sp = mock.Mock()
+        sp.search.side_effect = lambda q: try_acquire_extra_call()
+        with mock.patch.object(budget, "acquire"), \
+                mock.patch.object(budget, "try_acquire", return_value=False) as try_acquire:
+            self.assertFalse(BudgetedSpotifyClient(sp, budget).search("q"))
+        try_acquire.assert_called_once()
+        # Outside a budgeted call, extra requests aren't limited
+        self.assertTrue(try_acquire_extra_call())
+
+    @override_settings(SPOTIFY_RATE_BUDGET=100)
+    def test_admission_snapshot_is_one_round_trip(self):
+        redis_client = mock.Mock()
+        pipe = redis_client.pipeline.return_value
+        pipe.execute.return_value = [2] + [0] * 9 + [{b"a": b"30", b"old": b"500"}, [b"old"], b"40"]
+        with mock.patch("tasks.scheduling.get_redis_client", return_value=redis_client):
+            snapshot = admission_snapshot()
+        self.assertEqual(snapshot, {"queue_depth": 2, "pending_tracks": 30, "rate_remaining": 60})
+        # One read pipeline, plus one to drop the stale entry
+        self.assertEqual(pipe.execute.call_count, 2)
+        pipe.hdel.assert_called_once_with("remixify:admitted_work", b"old")
+
+
+@override_settings(
+    SPOTIFY_RATE_BUDGET=240, PREVIEW_MAX_QUEUE_DEPTH=50, PREVIEW_MAX_ESTIMATED_WAIT=900, PREVIEW_MAX_TRACKS=5000,
+)
+class AdmissionTestCase(TestCase):
+    def admit(self, total_tracks, queue_depth=0, pending_tracks=0):
+        snapshot = {"queue_depth": queue_depth, "pending_tracks": pending_tracks, "rate_remaining": None}
+        redis_client = mock.Mock()
+        with mock.patch("tasks.scheduling.admission_snapshot", return_value=snapshot), \
+                mock.patch("tasks.scheduling.get_redis_client", return_value=redis_client):
+            decision = admit_preview("task", total_tracks)
+        return decision, redis_client.pipeline.return_value
+
+    def test_admits_large_playlist_on_idle_system(self):
+        decision, pipe = self.admit(3000)
+        self.assertTrue(decision["admitted"])
+        self.assertEqual(decision["queue_position"], 1)
+        # 3000 tracks * 4 calls at 8 calls/s
+        self.assertEqual(decision["estimated_wait"], 1500)
+        pipe.hset.assert_called_once_with("remixify:admitted_work", "task", 3000)
+
+    def test_rejects_on_queue_depth(self):
+        decision, pipe = self.admit(10, queue_depth=50)
+        self.assertEqual((decision["admitted"], decision["reason"]), (False, "busy"))
+        pipe.hset.assert_not_called()
+
+    def test_rejects_on_backlog_wait(self):
+        decision, pipe = self.admit(10, pending_tracks=2000)
+        self.assertEqual((decision["admitted"], decision["reason"]), (False, "busy"))
+        self.assertEqual(decision["retry_after"], 1000)
+        pipe.hset.assert_not_called()
+
+    def test_rejects_oversized_playlist(self):
+        decision, pipe = self.admit(5001)
+        self.assertEqual((decision["admitted"], decision["reason"]), (False, "too_large"))
+        pipe.hset.assert_not_called()
+
+    @override_settings(PREVIEW_CLIENT_RATE_LIMIT=2)
+    def test_client_rate_limit(self):
+        redis_client = mock.Mock()
+        redis_client.pipeline.return_value.execute.side_effect = [[1, True], [2, True], [3, True]]
+        with mock.patch("tasks.scheduling.get_redis_client", return_value=redis_client):
+            results = [check_client_rate("1.2.3.4") for _ in range(3)]
+        self.assertEqual([allowed for allowed, _ in results], [True, True, False])
+        self.assertGreater(results[2][1], 0)
+
+
+class PreviewViewAdmissionTestCase(TestCase):
+    url = "https://open.spotify.com/playlist/37i9dQZF1DXcBWIGoYBM5M"
+    playlist_info = {"total_tracks": 6000}
+
+    def post(self, rate=(True, 0), decision=None, **extra):
+        with mock.patch("tasks.views.check_client_rate", return_value=rate) as check_rate, \
+                mock.patch("tasks.views.get_playlist_details", return_value=self.playlist_info), \
+                mock.patch("tasks.views.admit_preview", return_value=decision), \
+                mock.patch("tasks.views.preview_remixes") as task:
+            response = self.client.post("/preview/", {"url": self.url}, **extra)
+        return response, check_rate, task
+
+    def test_rate_limited_client_gets_429(self):
+        response, _, task = self.post(rate=(False, 12))
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response["Retry-After"], "12")
+        task.apply_async.assert_not_called()
+
+    def test_busy_gets_503_with_backlog_retry_after(self):
+        decision = {"admitted": False, "reason": "busy", "queue_position": 51, "estimated_wait": 4000,
+                    "retry_after": 1000}
+        response, _, task = self.post(decision=decision)
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response["Retry-After"], "1000")
+        self.assertIn("17 minutes", response.json()["error"])
+        task.apply_async.assert_not_called()
+
+    @override_settings(PREVIEW_MAX_TRACKS=5000)
+    def test_oversized_playlist_gets_400(self):
+        decision = {"admitted": False, "reason": "too_large", "queue_position": None, "estimated_wait": None}
+        response, _, task = self.post(decision=decision)
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("6,000 tracks", response.json()["error"])
+        task.apply_async.assert_not_called()
+
+    def test_client_ip_ignores_spoofed_forwarded_for(self):
+        decision = {"admitted": False, "reason": "busy", "queue_position": 1, "estimated_wait": 0, "retry_after": 0}
+        _, check_rate, _ = self.post(decision=decision, HTTP_X_FORWARDED_FOR="6.6.6.6, 10.0.0.1")
+        check_rate.assert_called_once_with("10.0.0.1")
+        _, check_rate, _ = self.post(decision=decision, HTTP_FLY_CLIENT_IP="9.9.9.9",
+                                     HTTP_X_FORWARDED_FOR="6.6.6.6, 10.0.0.1")
+        check_rate.assert_called_once_with("9.9.9.9")
+
+
+class HeartbeatTestCase(TestCase):
+    def setUp(self):
+        views._heartbeats.clear()
+
+    @override_settings(PREVIEW_ABANDON_AFTER=60)
+    def test_heartbeat_written_at_most_once_per_interval(self):
+        with mock.patch("tasks.views.touch_preview_heartbeat") as touch, \
+                mock.patch("tasks.views.time.monotonic", side_effect=[100.0, 101.0, 114.0, 116.0]):
+            for _ in range(4):
+                views._touch_heartbeat("task-1")
+        # Written on the first poll and again once 15s (a quarter of the timeout) had passed
+        self.assertEqual(touch.call_count, 2)
+
+
+class RedisClientTestCase(TestCase):
+    def test_client_and_pool_are_shared(self):
+        with mock.patch("tasks.redis_utils._client", None):
+            client = get_redis_client()
+            self.assertIs(get_redis_client(), client)
+        self.assertTrue(client.connection_pool.connection_kwargs["health_check_interval"])
+
+
+class PreviewCancellationTestCase(TestCase):
+    def test_stops_on_cancel_flag(self):
+        with mock.patch("tasks.scheduling.get_preview_signals", return_value=(True, None)):
+            cancellation = PreviewCancellation("task")
+            self.assertTrue(cancellation.should_stop())
+        self.assertEqual(cancellation.reason, "cancelled")
+
+    def test_stops_when_polling_stopped(self):
+        with mock.patch("tasks.scheduling.get_preview_signals", return_value=(False, 0.0001)):
+            cancellation = PreviewCancellation("task")
+            self.assertTrue(cancellation.should_stop())
+        self.assertEqual(cancellation.reason, "abandoned")
+
+    def test_keeps_going_while_polled(self):
+        with mock.patch("tasks.scheduling.get_preview_signals", return_value=(False, None)) as signals:
+            cancellation = PreviewCancellation("task")
+            self.assertFalse(cancellation.should_stop())
+            self.assertFalse(cancellation.should_stop())
+        # Redis is only consulted once per check interval
+        signals.assert_called_once()
+
+
+
+class DeadlineSearchTestCase(TestCase):
+    track = {"id": "t1", "original_name": "Song", "clean_name": "song", "artists": ["Artist"],
+             "album_art": None, "spotify_url": "https://open.spotify.com/track/t1"}
+
+    def test_cache_only_search_sends_nothing(self):
+        sp = mock.Mock()
+        info = {}
+        with mock.patch("tasks.tasks.get_cached_search", return_value=None):
+            self.assertEqual(find_remix_candidates(sp, self.track, cache_only=True, search_info=info), [])
+        sp.search.assert_not_called()
+        self.assertEqual(info, {"answered": 0, "complete": False})
+
+    def test_query_cap_limits_uncached_searches(self):
+        sp = mock.Mock()
+        sp.search.return_value = {"tracks": {"items": []}}
+        info = {}
+        with mock.patch("tasks.tasks.get_cached_search", return_value=None), \
+                mock.patch("tasks.tasks.cache_search"):
+            find_remix_candidates(sp, self.track, max_queries=1, search_info=info)
+        sp.search.assert_called_once()
+        self.assertEqual(info, {"answered": 1, "complete": False})
+
+    def test_marks_search_depth_when_out_of_time(self):
+        tracks = [dict(self.track, id=f"t{i}") for i in range(3)]
+
+        def fake_find(sp, track, original_track_id=None, search_info=None, **options):
+            full = track["id"] == "t0"
+            search_info.update(answered=1, complete=full)
+            return []
+
+        # Time runs out before the third track
+        should_stop = mock.Mock(side_effect=[False, False] + [True] * 5)
+        with mock.patch("tasks.tasks.find_remix_candidates", side_effect=fake_find):
+            results = search_tracks_until(mock.Mock(), tracks, time.time() + 60, should_stop=should_stop)
+        self.assertEqual([r["search_depth"] for r in results], ["full", "partial", "none"])
+
+
+class PreviewProgressRecorderTestCase(TestCase):
+    @override_settings(PREVIEW_PROGRESS_INTERVAL=0, PREVIEW_PROGRESS_MIN_PERCENT=0)
+    def test_early_result_is_sent_once(self):
+        task = mock.Mock()
+        recorder = PreviewProgressRecorder(task)
+        self.assertNotIn("early_result", recorder.set_progress(0, 40)[1])
+
+        recorder.early_result = {"tracks": []}
+        _, meta = recorder.set_progress(20, 40)
+        self.assertEqual(meta["early_result"], {"tracks": []})
+        self.assertEqual(meta["percent"], 50.0)
+        task.update_state.assert_called_with(state="PROGRESS", meta=meta)
+
+        # Held as the task state for a while, then later updates leave it out
+        self.assertIsNone(recorder.set_progress(21, 40))
+        with mock.patch("tasks.tasks.EARLY_RESULT_HOLD", 0):
+            recorder.early_result = {"tracks": []}
+            recorder.set_progress(22, 40)
+        _, meta = recorder.set_progress(23, 40)
+        self.assertNotIn("early_result", meta)
+        self.assertEqual(meta["current"], 23)
+
+    def test_final_update_is_not_held_back_by_the_early_result(self):
+        task = mock.Mock()
+        recorder = PreviewProgressRecorder(task)
+        recorder.early_result = {"tracks": []}
+        recorder.set_progress(0, 40)
+        _, meta = recorder.set_progress(40, 40)
+        self.assertNotIn("early_result", meta)
+        self.assertEqual(meta["percent"], 100.0)
+
+    def test_updates_are_coalesced_but_final_state_is_sent(self):
+        task = mock.Mock()
+        recorder = PreviewProgressRecorder(task)
+        for current in range(2001):
+            recorder.set_progress(current, 2000)
+        # The first and the final update; everything in between came too fast
+        self.assertEqual(task.update_state.call_count, 2)
+        self.assertEqual(task.update_state.call_args[1]["meta"]["current"], 2000)
+
+    @override_settings(PREVIEW_PROGRESS_INTERVAL=0)
+    def test_small_steps_wait_for_min_percent_and_flush_sends_the_last(self):
+        task = mock.Mock()
+        recorder = PreviewProgressRecorder(task)
+        for current in range(10):
+            recorder.set_progress(current, 2000)
+        self.assertEqual(task.update_state.call_count, 1)
+        recorder.flush()
+        self.assertEqual(task.update_state.call_args[1]["meta"]["current"], 9)
+
+    def test_parent_recorder_batches_counter_increments(self):
+        task = mock.Mock()
+        recorder = ParentProgressRecorder(task, "parent", 100)
+        with mock.patch("tasks.tasks.incr_preview_progress", side_effect=lambda parent_id, by: by) as incr:
+            for _ in range(5):
+                recorder.increment_progress()
+            recorder.flush()
+        self.assertEqual([c[0][1] for c in incr.call_args_list], [1, 4])
+        task.update_state.assert_called_with(
+            task_id="parent", state="PROGRESS", meta=mock.ANY
+        )
+
+
+class MetricsTestCase(TestCase):
+    def test_histogram_observation_fills_cumulative_buckets(self):
+        with mock.patch.object(metrics._buffer, "add") as add:
+            metrics.observe("spotify_call_duration_seconds", 0.3, method="search")
+        increments = add.call_args[0][0]
+        self.assertEqual(increments['spotify_call_duration_seconds_count{method="search"}'], 1)
+        self.assertIn('spotify_call_duration_seconds_bucket{le="0.5",method="search"}', increments)
+        self.assertIn('spotify_call_duration_seconds_bucket{le="+Inf",method="search"}', increments)
+        self.assertNotIn('spotify_call_duration_seconds_bucket{le="0.25",method="search"}', increments)
+
+    def test_render_groups_series_by_family(self):
+        redis_client = mock.Mock()
+        redis_client.hgetall.return_value = {
+            b'spotify_calls_total{client="0",method="search",status="429"}': b"3",
+            b'preview_stage_duration_seconds_sum{stage="search"}': b"1.5",
+        }
+        with mock.patch("tasks.metrics.get_redis_client", return_value=redis_client), \
+                mock.patch("tasks.metrics._queue_depths", return_value={"preview": 2}):
+            text = metrics.render()
+        self.assertIn('spotify_calls_total{client="0",method="search",status="429"} 3\n', text)
+        self.assertIn('preview_stage_duration_seconds_sum{stage="search"} 1.5\n', text)
+        self.assertIn('celery_queue_depth{queue="preview"} 2\n', text)
+        self.assertIn("# TYPE preview_stage_duration_seconds histogram", text)
+
+    @override_settings(METRICS_TOKEN="", DEBUG=False)
+    def test_endpoint_disabled_without_token_in_production(self):
+        self.assertEqual(self.client.get("/metrics").status_code, 403)
+
+    @override_settings(METRICS_TOKEN="secret", DEBUG=False)
+    def test_endpoint_requires_bearer_token(self):
+        self.assertEqual(self.client.get("/metrics", HTTP_AUTHORIZATION="Bearer wrong").status_code, 401)
+        with mock.patch("tasks.views.metrics.render", return_value="up 1\n"):
+            response = self.client.get("/metrics", HTTP_AUTHORIZATION="Bearer secret")
+        self.assertEqual(response.status_code, 200)
+
+
+@override_settings(TRACING_ENABLED=True)
+class TracingTestCase(TestCase):
+    def test_spans_nest_across_threads(self):
+        exported = []
+
+        def pages():
+            # Runs in prefetch's producer thread
+            with tracing.span("page"):
+                yield 1
+
+        with mock.patch("tasks.tracing.get_redis_client"), \
+                mock.patch.object(tracing._Trace, "flush", lambda t: exported.extend(t._pending)):
+            with tracing.trace("task-1", "preview_remixes"):
+                with tracing.span("get_playlist"):
+                    self.assertEqual(list(prefetch(pages(), maxsize=1)), [1])
+
+        by_name = {span["name"]: span for span in exported}
+        self.assertEqual(by_name["page"]["parent"], by_name["get_playlist"]["id"])
+        self.assertEqual(by_name["get_playlist"]["parent"], by_name["preview_remixes"]["id"])
+
+        rows = tracing.waterfall(exported)
+        self.assertEqual([r["depth"] for r in rows], [0, 1, 2])
+        self.assertTrue(all(0 <= r["left"] <= 100 for r in rows))
+
+    def test_span_outside_trace_is_a_no_op(self):
+        with tracing.span("search", query="q") as attrs:
+            tracing.annotate(cached=True)
+        self.assertEqual(attrs, {"query": "q"})
+
+
+class ProfilingTestCase(TestCase):
+    def run_task(self, request):
+        @profiling.profiled_task
+        def task(self):
+            return sorted(range(1000), key=lambda n: -n)[0]
+
+        # Mock(name=...) only names the mock's repr, so set the attribute itself
+        task_self = mock.Mock(request=request)
+        task_self.name = "tasks.tasks.preview_remixes"
+        return task(task_self)
+
+    def test_not_profiled_unless_asked(self):
+        with mock.patch("tasks.profiling.save_profile") as save:
+            self.assertEqual(self.run_task(mock.Mock(spec=["id"], id="t1")), 999)
+        save.assert_not_called()
+
+    def test_profile_is_stored_and_loadable(self):
+        redis_client = mock.Mock()
+        with mock.patch("tasks.profiling.get_redis_client", return_value=redis_client):
+            self.run_task(mock.Mock(spec=["id", "profile"], id="t1", profile="1"))
+            pipe = redis_client.pipeline.return_value
+            stored = pipe.set.call_args[0][1]
+            meta = json.loads(next(iter(pipe.zadd.call_args[0][1])))
+            redis_client.get.return_value = stored
+            stats = profiling.load_stats("t1")
+        self.assertTrue(any(func[2] == "task" for func in stats.stats))
+        self.assertEqual((meta["task_id"], meta["task"]), ("t1", "tasks.tasks.preview_remixes"))
+
+
+class AccountingTestCase(TestCase):
+    def test_usage_attached_to_result_and_aggregated(self):
+        @accounting.accounted_task
+        def task(self):
+            accounting.record_call("search", 200)
+            accounting.record_call("search", 429)
+            accounting.record_cache("search", hit=True)
+            accounting.record_tracks()
+            # Helper threads that carry the context count against the same task
+            list(prefetch((accounting.record_rotation() for _ in range(1)), maxsize=1))
+            return {"usage": {"calls": 3}}
+
+        task_self = mock.Mock()
+        task_self.name = "tasks.tasks.preview_remixes"
+        with mock.patch("tasks.accounting.aggregate_hourly") as aggregate:
+            result = task(task_self)
+
+        usage = result["usage"]
+        self.assertEqual(usage["calls"], 5)
+        self.assertEqual(usage["calls:search"], 2)
+        self.assertEqual(usage["rate_limited"], 1)
+        self.assertEqual(usage["rotations"], 1)
+        self.assertEqual(usage["cache:search:hit"], 1)
+        self.assertIn("cpu_seconds", usage)
+        # Only this run's own usage goes into the hourly totals
+        self.assertEqual(aggregate.call_args[0][0], "tasks.tasks.preview_remixes")
+        self.assertEqual(aggregate.call_args[0][1]["calls"], 2)
+
+    def test_outside_a_task_nothing_is_recorded(self):
+        accounting.record_call("search", 200)
+        self.assertIsNone(accounting.current_usage())
+
+
+class TaskLoggingTestCase(TestCase):
+    def run_task(self, body):
+        @task_logging.logged_task
+        def task(self):
+            return body()
+
+        return task(mock.Mock(request=mock.Mock(id="t1"), name="tasks.tasks.preview_remixes"))
+
+    def setUp(self):
+        self.detail_logger = mock.Mock()
+        self.detail_logger.name = "tasks.tasks"
+
+    def detail_and_return(self):
+        task_logging.detail(self.detail_logger, "Processing track %d", 1)
+        return {"total_tracks": 1}
+
+    @override_settings(LOG_DETAIL_SAMPLE_RATE=0)
+    def test_details_buffered_and_dropped_on_success(self):
+        with mock.patch("tasks.task_logging.logger") as logger:
+            self.run_task(self.detail_and_return)
+        self.detail_logger.info.assert_not_called()
+        logger.warning.assert_not_called()
+        summary = logger.info.call_args[1]["extra"]["summary"]
+        self.assertEqual(summary["outcome"], "succeeded")
+        self.assertEqual(summary["total_tracks"], 1)
+
+    @override_settings(LOG_DETAIL_SAMPLE_RATE=0)
+    def test_details_flushed_on_failure(self):
+        def fail():
+            self.detail_and_return()
+            raise RuntimeError("boom")
+
+        with mock.patch("tasks.task_logging.logger") as logger:
+            with self.assertRaises(RuntimeError):
+                self.run_task(fail)
+        self.assertEqual(len(logger.warning.call_args[1]["extra"]["details"]), 1)
+        self.assertIn("Processing track 1", logger.warning.call_args[1]["extra"]["details"][0])
+        self.assertEqual(logger.info.call_args[1]["extra"]["summary"]["outcome"], "failed")
+
+    @override_settings(LOG_DETAIL_SAMPLE_RATE=1)
+    def test_sampled_task_logs_details_as_they_happen(self):
+        with mock.patch("tasks.task_logging.logger"):
+            self.run_task(self.detail_and_return)
+        self.detail_logger.info.assert_called_once_with("Processing track %d", 1)
+
+    def test_json_formatter_includes_task_id_and_extras(self):
+        record = logging.LogRecord("tasks.tasks", logging.INFO, __file__, 1, "done %s", ("t1",), None)
+        record.summary = {"outcome": "succeeded"}
+        task_logging.TaskContextFilter().filter(record)
+        entry = json.loads(task_logging.JsonFormatter().format(record))
+        self.assertEqual(entry["message"], "done t1")
+        self.assertIsNone(entry["task_id"])
+        self.assertEqual(entry["summary"], {"outcome": "succeeded"})
         
 # class GetPlaylistIDUnhappyPath(TestCase):
 #     def test_get_playlist_id_if_throws_exception(self):
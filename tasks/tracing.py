@@ -0,0 +1,202 @@
+"""
+Lightweight tracing for preview and playlist tasks.
+
+A task opens a trace keyed by its Celery task ID; code inside it opens
+nested spans (get_playlist, find_remix_candidates, each Spotify call,
+rotations and sleeps). Spans are kept in a per-trace Redis list capped at
+MAX_SPANS (a ring buffer: the oldest spans drop off) and rendered as a
+waterfall by the staff-only traces view.
+
+The current trace and span live in context variables, so work handed to
+other threads must carry the context along (contextvars.copy_context().run),
+as prefetch, iter_playlist_pages and the hedged Spotify calls do. Outside a
+trace, span() does nothing.
+"""
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+
+from django.conf import settings
+
+from tasks.redis_utils import get_redis_client
+
+logger = logging.getLogger(__name__)
+
+TRACE_KEY = "remixify:trace:{trace_id}"
+TRACE_INDEX_KEY = "remixify:traces"
+TRACE_TTL = 60 * 60 * 24
+MAX_SPANS = 5000
+MAX_INDEXED_TRACES = 200
+FLUSH_EVERY = 100
+
+_trace = ContextVar("remixify_trace", default=None)
+_span = ContextVar("remixify_span", default=None)
+
+
+class _Trace:
+    """Spans of one trace waiting to be appended to its Redis list."""
+
+    def __init__(self, trace_id):
+        self.trace_id = trace_id
+        self._pending = []
+        self._lock = threading.Lock()
+
+    def add(self, span):
+        with self._lock:
+            self._pending.append(span)
+            due = len(self._pending) >= FLUSH_EVERY
+        if due:
+            self.flush()
+
+    def flush(self):
+        with self._lock:
+            pending, self._pending = self._pending, []
+        if not pending:
+            return
+        key = TRACE_KEY.format(trace_id=self.trace_id)
+        try:
+            pipe = get_redis_client().pipeline()
+            pipe.rpush(key, *[json.dumps(span) for span in pending])
+            pipe.ltrim(key, -MAX_SPANS, -1)
+            pipe.expire(key, TRACE_TTL)
+            pipe.execute()
+        except Exception as e:
+            logger.warning(f"Failed to export spans for {self.trace_id}: {type(e).__name__}: {str(e)[:100]}")
+
+
+@contextmanager
+def trace(trace_id, name, **attrs):
+    """Record the block as the root span of trace `trace_id` (a Celery task ID).
+
+    Fan-out subtasks pass their parent's ID so their spans join its trace.
+    """
+    if not getattr(settings, "TRACING_ENABLED", False) or not trace_id:
+        yield
+        return
+
+    current = _Trace(trace_id)
+    token = _trace.set(current)
+    try:
+        pipe = get_redis_client().pipeline()
+        pipe.zadd(TRACE_INDEX_KEY, {trace_id: time.time()}, nx=True)
+        pipe.zremrangebyrank(TRACE_INDEX_KEY, 0, -MAX_INDEXED_TRACES - 1)
+        pipe.execute()
+    except Exception as e:
+        logger.warning(f"Failed to index trace {trace_id}: {type(e).__name__}: {str(e)[:100]}")
+    try:
+        with span(name, **attrs):
+            yield
+    finally:
+        _trace.reset(token)
+        current.flush()
+
+
+@contextmanager
+def span(name, **attrs):
+    """Record the block as a span of the current trace. Yields the span's attributes."""
+    current = _trace.get()
+    if current is None:
+        yield attrs
+        return
+
+    parent = _span.get()
+    record = {
+        "id": os.urandom(8).hex(),
+        "parent": parent["id"] if parent else None,
+        "name": name,
+        "start": time.time(),
+        "thread": threading.current_thread().name,
+        "attrs": attrs,
+    }
+    token = _span.set(record)
+    started = time.perf_counter()
+    try:
+        yield attrs
+    except BaseException as e:
+        record["error"] = f"{type(e).__name__}: {str(e)[:200]}"
+        raise
+    finally:
+        record["duration"] = time.perf_counter() - started
+        _span.reset(token)
+        current.add(record)
+
+
+def traced(name):
+    """Decorator: run the function inside a span called `name`."""
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def traced_task(func):
+    """Decorator for bound Celery tasks: trace each run under the task's own ID."""
+    @wraps(func)
+    def wrapper(self, *args, **kwargs):
+        with trace(self.request.id, func.__name__):
+            return func(self, *args, **kwargs)
+    return wrapper
+
+
+def annotate(**attrs):
+    """Add attributes to the current span, if there is one."""
+    current = _span.get()
+    if current is not None:
+        current["attrs"].update(attrs)
+
+
+def get_trace(trace_id):
+    """All stored spans of a trace, ordered by start time."""
+    raw = get_redis_client().lrange(TRACE_KEY.format(trace_id=trace_id), 0, -1)
+    return sorted((json.loads(item) for item in raw), key=lambda s: s["start"])
+
+
+def recent_traces(limit=50):
+    """(trace_id, started_at) of the most recent traces, newest first."""
+    raw = get_redis_client().zrevrange(TRACE_INDEX_KEY, 0, limit - 1, withscores=True)
+    return [(trace_id.decode(), started_at) for trace_id, started_at in raw]
+
+
+def waterfall(spans):
+    """Lay spans out for the waterfall view.
+
+    Adds "depth", "offset" (seconds since the trace started) and "left"/"width"
+    percentages of the whole trace to each span, in tree order.
+    """
+    if not spans:
+        return []
+    trace_start = min(s["start"] for s in spans)
+    trace_end = max(s["start"] + s["duration"] for s in spans)
+    total = max(trace_end - trace_start, 1e-6)
+
+    children = {}
+    ids = {s["id"] for s in spans}
+    for s in spans:
+        # Spans whose parent fell out of the ring buffer are shown as roots
+        parent = s["parent"] if s["parent"] in ids else None
+        children.setdefault(parent, []).append(s)
+
+    rows = []
+
+    def visit(parent, depth):
+        for s in children.get(parent, []):
+            offset = s["start"] - trace_start
+            rows.append(dict(
+                s,
+                depth=depth,
+                offset=offset,
+                left=100 * offset / total,
+                width=max(100 * s["duration"] / total, 0.1),
+            ))
+            visit(s["id"], depth + 1)
+
+    visit(None, 0)
+    return rows
@@ -5,13 +5,21 @@ urlpatterns = [
     # New two-phase endpoints
     path('preview/', views.preview, name="preview"),
     path('preview/<str:task_id>/', views.get_preview_result, name="preview_result"),
+    path('preview/<str:task_id>/progress/', views.preview_progress, name="preview_progress"),
+    path('preview/<str:task_id>/cancel/', views.cancel_preview_task, name="cancel_preview"),
     path('create-playlist/', views.create_playlist, name="create_playlist"),
     path('create-playlist/<str:task_id>/', views.get_create_result, name="create_result"),
 
     # Manual curation
     path('resolve-track/', views.resolve_track, name="resolve_track"),
+    path('resolve-tracks/', views.resolve_tracks_batch, name="resolve_tracks"),
     
     # Stats & recent playlists
     path('recent-playlists/', views.recent_playlists, name="recent_playlists"),
     path('playlist-count/', views.playlist_count, name="playlist_count"),
+
+    # Monitoring
+    path('metrics', views.metrics_view, name="metrics"),
+    path('traces/', views.trace_list, name="trace_list"),
+    path('traces/<str:task_id>/', views.trace_waterfall, name="trace_waterfall"),
 ]
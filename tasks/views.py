@@ -1,19 +1,68 @@
+import hashlib
+import hmac
 import json
 import logging
-from django.http import JsonResponse
+import re
+import threading
+import time
+from datetime import datetime, timezone
+from django.conf import settings
+from django.contrib.admin.views.decorators import staff_member_required
+from django.http import HttpResponse, JsonResponse
+from django.shortcuts import render
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import quote_etag
 from django.views.decorators.http import require_http_methods
 from django.views.decorators.csrf import csrf_protect
-from tasks.tasks import preview_remixes, create_remix_playlist
-from tasks.models import CreatedPlaylist
-from tasks.helpers import get_playlist_id
+from celery_progress.views import get_progress
+from tasks.tasks import (
+    preview_remixes,
+    create_remix_playlist,
+    find_reusable_playlist,
+    get_playlist_details,
+    resolve_tracks,
+)
+from tasks.scheduling import admit_preview, check_client_rate, release_preview
+from tasks.redis_utils import cancel_preview, touch_preview_heartbeat
+from tasks import homepage, metrics, tracing
+from tasks.profiling import PROFILE_HEADER
+from tasks.helpers import get_playlist_id, selection_key
 from celery.result import AsyncResult
-from authentication.oauth import get_spotify_client
+from celery.utils import uuid
 
 logger = logging.getLogger(__name__)
 
 
+def _get_client_ip(request) -> str:
+    """Client IP as seen by Fly's proxy.
+
+    Fly sets Fly-Client-IP itself. Otherwise only the last X-Forwarded-For
+    entry is trusted: it was appended by our proxy, while earlier entries
+    come from the client and can be anything.
+    """
+    fly_ip = request.META.get("HTTP_FLY_CLIENT_IP", "").strip()
+    if fly_ip:
+        return fly_ip
+    forwarded = request.META.get("HTTP_X_FORWARDED_FOR", "")
+    if forwarded:
+        return forwarded.split(",")[-1].strip()
+    return request.META.get("REMOTE_ADDR", "unknown")
+
+
+def _profile_headers(request) -> dict:
+    """Celery headers asking for the task to be profiled, for staff requests sending X-Remixify-Profile."""
+    if request.user.is_staff and request.META.get("HTTP_X_REMIXIFY_PROFILE"):
+        logger.info(f"Profiling requested by {request.user}")
+        return {PROFILE_HEADER: "1"}
+    return {}
+
+
+# Spotify IDs are 22 characters of base62
+SPOTIFY_TRACK_ID_RE = re.compile(r"^[0-9A-Za-z]{22}$")
+
+
 def _extract_spotify_track_id(value: str) -> str | None:
-    """Extract a Spotify track ID from a URL/URI/ID string."""
+    """Extract a Spotify track ID from a URL/URI/ID string; None unless it's a well-formed ID."""
     if not value:
         return None
 
@@ -22,22 +71,16 @@ def _extract_spotify_track_id(value: str) -> str | None:
         return None
 
     if raw.startswith("spotify:track:"):
-        parts = raw.split(":")
-        return parts[-1] if parts else None
-
-    if "/track/" in raw:
+        track_id = raw.split(":")[-1]
+    elif "/track/" in raw:
         # e.g. https://open.spotify.com/track/<id>?si=...
-        try:
-            after = raw.split("/track/", 1)[1]
-        except Exception:
-            return None
-        return after.split("?", 1)[0].split("/", 1)[0]
-
-    # If it looks like a bare ID (Spotify IDs are 22 chars base62)
-    if len(raw) == 22 and raw.isalnum():
-        return raw
+        after = raw.split("/track/", 1)[1]
+        track_id = after.split("?", 1)[0].split("/", 1)[0]
+    else:
+        track_id = raw
 
-    return None
+    # A malformed ID would make Spotify reject the whole multi-ID batch with a 400
+    return track_id if SPOTIFY_TRACK_ID_RE.match(track_id) else None
 
 
 @csrf_protect
@@ -48,6 +91,8 @@ def resolve_track(request):
         data = json.loads(request.body or "{}")
     except json.JSONDecodeError:
         return JsonResponse({"error": "Invalid JSON"}, status=400)
+    if not isinstance(data, dict):
+        return JsonResponse({"error": "Please paste a Spotify track link"}, status=400)
 
     raw = (data.get("url") or data.get("value") or "").strip()
     track_id = _extract_spotify_track_id(raw)
@@ -55,21 +100,8 @@ def resolve_track(request):
         return JsonResponse({"error": "Please paste a Spotify track link"}, status=400)
 
     try:
-        sp = get_spotify_client()
-        t = sp.track(track_id)
-
-        track = {
-            "id": t.get("id"),
-            "name": t.get("name") or "",
-            "artists": [a.get("name", "") for a in (t.get("artists") or []) if a.get("name")],
-            "album_art": ((t.get("album") or {}).get("images") or [{}])[0].get("url"),
-            "preview_url": t.get("preview_url"),
-            "spotify_url": (t.get("external_urls") or {}).get("spotify", ""),
-            "duration_ms": t.get("duration_ms"),
-            "type": "track",
-        }
-
-        if not track.get("id"):
+        track = resolve_tracks([track_id]).get(track_id)
+        if not track:
             return JsonResponse({"error": "Track not found"}, status=404)
 
         return JsonResponse({"track": track})
@@ -78,6 +110,49 @@ def resolve_track(request):
         return JsonResponse({"error": "Failed to resolve track"}, status=500)
 
 
+MAX_RESOLVE_BATCH = 200
+
+
+@csrf_protect
+@require_http_methods(["POST"])
+def resolve_tracks_batch(request):
+    """Resolve many Spotify track links/URIs/IDs at once.
+
+    Expects {"urls": [...]}. Returns {"results": [{"input", "track"}]} in
+    input order; "track" is null for inputs that aren't track links or
+    weren't found.
+    """
+    try:
+        data = json.loads(request.body or "{}")
+    except json.JSONDecodeError:
+        return JsonResponse({"error": "Invalid JSON"}, status=400)
+    if not isinstance(data, dict):
+        return JsonResponse({"error": 'Expected {"urls": [...]}'}, status=400)
+
+    values = data.get("urls") or data.get("values") or []
+    if not isinstance(values, list) or not all(isinstance(v, str) for v in values):
+        return JsonResponse({"error": "Expected a list of Spotify track links"}, status=400)
+    if len(values) > MAX_RESOLVE_BATCH:
+        return JsonResponse({"error": f"At most {MAX_RESOLVE_BATCH} links per request"}, status=400)
+
+    track_ids = [_extract_spotify_track_id(v) for v in values]
+    try:
+        resolved = resolve_tracks([track_id for track_id in track_ids if track_id])
+    except Exception as e:
+        logger.error(f"Error resolving {len(values)} tracks: {str(e)}", exc_info=True)
+        return JsonResponse({"error": "Failed to resolve tracks"}, status=500)
+
+    results = [
+        {"input": value, "track": resolved.get(track_id) if track_id else None}
+        for value, track_id in zip(values, track_ids)
+    ]
+    return JsonResponse({"results": results})
+
+
+# A preview rejected only for queue depth still asks the client to back off this long.
+BUSY_MIN_RETRY_AFTER = 30
+
+
 @csrf_protect
 @require_http_methods(["POST"])
 def preview(request):
@@ -95,19 +170,142 @@ def preview(request):
     except ValueError as e:
         logger.warning(f"Invalid playlist URL from user {request.user}: {url}")
         return JsonResponse({"error": str(e)}, status=400)
+
+    # A follow-up pass only searches the tracks a deadline-limited preview left incomplete
+    track_ids = [t.strip() for t in request.POST.get("track_ids", "").split(",") if t.strip()]
+
+    client_ip = _get_client_ip(request)
+    try:
+        allowed, retry_after = check_client_rate(client_ip)
+    except Exception as e:
+        logger.warning(f"Client rate limit check failed: {type(e).__name__}: {str(e)[:100]}")
+        allowed, retry_after = True, 0
+    if not allowed:
+        logger.warning(f"Preview rate limit hit by {client_ip}")
+        response = JsonResponse({
+            "error": "You're starting previews too quickly. Please wait a moment and try again.",
+            "retry_after": retry_after,
+        }, status=429)
+        response["Retry-After"] = str(retry_after)
+        return response
+
+    # Fetch the playlist's size up front: it's a single small request, it lets
+    # us estimate the work, and private/missing playlists fail here instead of
+    # after waiting in the queue.
+    try:
+        playlist_info = get_playlist_details(url)
+    except ValueError as e:
+        return JsonResponse({"error": str(e)}, status=400)
+
+    task_id = uuid()
+    requested_tracks = len(track_ids) or playlist_info["total_tracks"]
+    try:
+        decision = admit_preview(task_id, requested_tracks)
+    except Exception as e:
+        logger.warning(f"Admission control unavailable, admitting preview: {type(e).__name__}: {str(e)[:100]}")
+        decision = {"admitted": True, "reason": None, "queue_position": None, "estimated_wait": None}
+    if not decision["admitted"] and decision["reason"] == "too_large":
+        logger.warning(f"Preview rejected as too large - tracks: {requested_tracks}")
+        return JsonResponse({
+            "error": (
+                f"This playlist has {requested_tracks:,} tracks. Remixify can preview up to "
+                f"{settings.PREVIEW_MAX_TRACKS:,} at a time; please try a smaller playlist."
+            ),
+        }, status=400)
+    if not decision["admitted"]:
+        logger.warning(
+            f"Preview rejected by admission control - tracks: {requested_tracks}, "
+            f"queue position: {decision['queue_position']}, backlog wait: {decision['retry_after']}s"
+        )
+        retry_after = max(BUSY_MIN_RETRY_AFTER, decision["retry_after"])
+        minutes = max(1, round(retry_after / 60))
+        response = JsonResponse({
+            "error": f"Remixify is busy right now. Please try again in about {minutes} minute{'s' if minutes != 1 else ''}.",
+            "retry_after": retry_after,
+            "queue_position": decision["queue_position"],
+        }, status=503)
+        response["Retry-After"] = str(retry_after)
+        return response
     
     try:
-        result = preview_remixes.delay(url)
+        result = preview_remixes.apply_async(
+            args=[url],
+            kwargs={
+                "enqueued_at": time.time(),
+                "latency_budget": settings.PREVIEW_LATENCY_BUDGET or None,
+                "track_ids": track_ids or None,
+            },
+            task_id=task_id,
+            headers=_profile_headers(request),
+        )
+        _touch_heartbeat(task_id)
         logger.info(f"Preview task started - Task ID: {result.task_id}, URL: {url}")
-        return JsonResponse({"task_id": result.task_id})
+        return JsonResponse({
+            "task_id": result.task_id,
+            "queue_position": decision["queue_position"],
+            "estimated_wait": decision["estimated_wait"],
+        })
     except Exception as e:
+        release_preview(task_id)
         logger.error(f"Error starting preview task for URL {url}: {str(e)}", exc_info=True)
         return JsonResponse({"error": "Failed to start preview task"}, status=500)
 
 
+# Tabs poll progress about twice a second, but the heartbeat only has to be
+# fresher than PREVIEW_ABANDON_AFTER: each process writes it at most once per
+# this fraction of the timeout.
+HEARTBEAT_INTERVAL_FRACTION = 0.25
+_heartbeats = {}
+_heartbeats_lock = threading.Lock()
+
+
+def _touch_heartbeat(task_id):
+    now = time.monotonic()
+    interval = getattr(settings, "PREVIEW_ABANDON_AFTER", 60) * HEARTBEAT_INTERVAL_FRACTION
+    with _heartbeats_lock:
+        last = _heartbeats.get(task_id)
+        if last is not None and now - last < interval:
+            return
+        # Forget previews nobody has polled for a while, so the map stays small
+        for stale in [t for t, sent in _heartbeats.items() if now - sent >= interval]:
+            del _heartbeats[stale]
+        _heartbeats[task_id] = now
+    try:
+        touch_preview_heartbeat(task_id)
+    except Exception as e:
+        with _heartbeats_lock:
+            _heartbeats.pop(task_id, None)
+        logger.warning(f"Failed to record heartbeat for {task_id}: {type(e).__name__}: {str(e)[:100]}")
+
+
+@require_http_methods(["GET"])
+def preview_progress(request, task_id):
+    """Progress of a preview task for the progress bar.
+
+    Every poll doubles as a heartbeat: a preview nobody polls for
+    PREVIEW_ABANDON_AFTER seconds is treated as abandoned and stops early.
+    """
+    _touch_heartbeat(task_id)
+    return get_progress(request, task_id)
+
+
+@csrf_protect
+@require_http_methods(["POST"])
+def cancel_preview_task(request, task_id):
+    """Ask a running preview to stop; it returns the results it has so far."""
+    try:
+        cancel_preview(task_id)
+    except Exception as e:
+        logger.error(f"Error cancelling preview {task_id}: {str(e)}", exc_info=True)
+        return JsonResponse({"error": "Failed to cancel preview"}, status=500)
+    logger.info(f"Preview cancellation requested - Task ID: {task_id}")
+    return JsonResponse({"status": "cancelling"})
+
+
 @require_http_methods(["GET"])
 def get_preview_result(request, task_id):
     """Get the result of a preview task."""
+    _touch_heartbeat(task_id)
     result = AsyncResult(task_id)
     
     if result.ready():
@@ -144,7 +342,16 @@ def create_playlist(request):
             logger.warning(f"Create playlist request with no tracks from user: {request.user}")
             return JsonResponse({"error": "No tracks selected"}, status=400)
         
-        result = create_remix_playlist.delay(playlist_name, selected_tracks, original_url)
+        # Identical selections (double clicks, shared links) reuse the playlist already made
+        existing = find_reusable_playlist(selection_key(playlist_name, selected_tracks))
+        if existing:
+            logger.info(f"Reusing existing playlist for identical selection - URL: {existing['url']}")
+            return JsonResponse({"status": "complete", "result": existing})
+        
+        result = create_remix_playlist.apply_async(
+            args=[playlist_name, selected_tracks, original_url],
+            headers=_profile_headers(request),
+        )
         logger.info(f"Playlist creation task started - Task ID: {result.task_id}, Name: {playlist_name}")
         return JsonResponse({"task_id": result.task_id})
     
@@ -179,27 +386,72 @@ def get_create_result(request, task_id):
 
 
 
+def _cacheable_json(request, data):
+    """JsonResponse with an ETag and a public max-age, answering 304 when the client's copy is current."""
+    response = JsonResponse(data)
+    etag = quote_etag(hashlib.md5(response.content).hexdigest())
+    response["ETag"] = etag
+    patch_cache_control(response, public=True, max_age=homepage.cache_ttl())
+    return get_conditional_response(request, etag=etag, response=response)
+
+
 @require_http_methods(["GET"])
 def recent_playlists(request):
     """Get the 3 most recently created playlists."""
-    playlists = CreatedPlaylist.objects.all()[:3]
-    
-    data = [
-        {
-            "name": p.name,
-            "url": p.spotify_url,
-            "image": p.image_url,
-            "original_author": p.original_author or "Unknown",
-        }
-        for p in playlists
-    ]
-    
-    return JsonResponse({"playlists": data})
+    try:
+        playlists = homepage.homepage_data()["playlists"]
+    except Exception as e:
+        logger.warning(f"Recent playlists feed unavailable, reading the archive: {type(e).__name__}: {str(e)[:100]}")
+        playlists = [homepage.public_playlist(p) for p in homepage.archived_playlists(homepage.RECENT_LIMIT)]
+    return _cacheable_json(request, {"playlists": playlists})
 
 
 @require_http_methods(["GET"])
 def playlist_count(request):
     """Get the total number of playlists created."""
-    from tasks.redis_utils import get_playlist_count
-    count = get_playlist_count()
-    return JsonResponse({"count": count})
+    return _cacheable_json(request, {"count": homepage.homepage_data()["count"]})
+
+
+@require_http_methods(["GET"])
+def metrics_view(request):
+    """Prometheus metrics for every web and worker process (see tasks.metrics).
+
+    Scrapers must send METRICS_TOKEN as a bearer token. Without a token the
+    endpoint is only open with DEBUG on; in production it is disabled.
+    """
+    token = settings.METRICS_TOKEN
+    if not token:
+        if not settings.DEBUG:
+            return HttpResponse(status=403)
+    elif not hmac.compare_digest(request.META.get("HTTP_AUTHORIZATION", ""), f"Bearer {token}"):
+        return HttpResponse(status=401)
+    try:
+        body = metrics.render()
+    except Exception as e:
+        logger.error(f"Error rendering metrics: {str(e)}", exc_info=True)
+        return HttpResponse(status=503)
+    return HttpResponse(body, content_type="text/plain; version=0.0.4; charset=utf-8")
+
+
+@staff_member_required
+def trace_list(request):
+    """Staff-only list of recently traced tasks."""
+    traces = [
+        {"task_id": task_id, "started_at": datetime.fromtimestamp(started_at, tz=timezone.utc)}
+        for task_id, started_at in tracing.recent_traces()
+    ]
+    return render(request, "traces/list.html", {"traces": traces})
+
+
+@staff_member_required
+def trace_waterfall(request, task_id):
+    """Staff-only waterfall of a task's trace spans."""
+    spans = tracing.get_trace(task_id)
+    rows = tracing.waterfall(spans)
+    total = max((s["start"] + s["duration"] for s in spans), default=0) - min((s["start"] for s in spans), default=0)
+    return render(request, "traces/waterfall.html", {
+        "task_id": task_id,
+        "spans": rows,
+        "total": total,
+        "truncated": len(spans) >= tracing.MAX_SPANS,
+    })